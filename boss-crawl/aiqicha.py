@@ -1,8 +1,16 @@
 import re
-import time
+import asyncio
 import random
 from openpyxl import load_workbook
-from playwright.sync_api import sync_playwright
+from crawl_engine import CrawlEngine
+from xlsx_writer import CellJournal
+from state_store import StateStore
+from session_vault import SessionVault
+from session_pool import load_pool
+
+TAB_COUNT = 3  # 同时并行的页签数量
+ACCOUNT_HOURLY_BUDGET = 100  # 多账号时每个账号每小时最多查询的公司数
+SEARCH_URL = "https://www.tianyancha.com/nsearch?key="
 
 def extract_contact_info(text):
     """从文本中提取手机号和邮箱"""
@@ -19,7 +27,47 @@ def extract_contact_info(text):
     email = emails[0] if emails else ""
     return phone, email
 
-def main():
+async def search_contact(page, job):
+    """单个公司的搜索和提取：返回(手机号, 邮箱)"""
+    row, company_name = job
+    print(f"\n处理第{row}行：{company_name}")
+    
+    # 定位搜索框并输入公司名称（清空后输入，避免残留内容）
+    search_input = await page.wait_for_selector(
+        ".tyc-header-suggest-content input",
+        timeout=10000
+    )
+    await search_input.fill('')
+    await search_input.fill(company_name)
+    await asyncio.sleep(random.uniform(0.5, 1.5))  # 模拟人工输入间隔
+    
+    # 点击搜索按钮
+    search_btn = await page.wait_for_selector(
+        ".tyc-header-suggest-button",
+        timeout=10000
+    )
+    await search_btn.click()
+    await asyncio.sleep(random.uniform(2, 4))  # 等待结果加载
+    
+    # 提取第一个结果的联系信息
+    contact_element = await page.wait_for_selector(
+        ".index_contact-row__iYUn6",
+        timeout=15000  # 最长等待15秒
+    )
+    contact_text = await contact_element.text_content() or ""
+    print(f"第{row}行提取到联系文本：{contact_text[:50]}...")  # 打印前50字符
+    
+    # 解析手机号和邮箱
+    phone, email = extract_contact_info(contact_text)
+    print(f"第{row}行匹配结果：手机号={phone}，邮箱={email}")
+    return phone, email
+
+async def main():
+    # 上次运行中断时遗留的旁路日志先合并回Excel；状态库提交前先落盘旁路日志，记为完成的行一定已经写出
+    store = StateStore()
+    journal = CellJournal("BOSSid.xlsx", store=store)
+    journal.merge()
+    
     # 加载Excel文件
     wb = load_workbook("BOSSid.xlsx")
     ws = wb.active  # 获取活动工作表
@@ -27,72 +75,73 @@ def main():
     print(f"共检测到 {max_row - 1} 条公司数据（跳过表头）")
     start_row_index = 2
 
-    with sync_playwright() as p:
-        # 启动浏览器（无头模式关闭，方便手动登录）
-        browser = p.chromium.launch(headless=False, slow_mo=50)
-        page = browser.new_page()
+    # 断点续爬：状态库中已完成的行直接跳过
+    done_rows = store.done_keys("aiqicha")
+    if done_rows:
+        print(f"状态库中已完成 {len(done_rows)} 行，本次跳过")
+
+    # 收集公司名称（从第2行开始，跳过表头）
+    jobs = []
+    for row in range(start_row_index, max_row + 1):
+        if str(row) in done_rows:
+            continue
+        company_name = ws.cell(row=row, column=3).value  # 第三列（索引2）
+        if not company_name:
+            print(f"第{row}行无公司名称，跳过")
+            continue
+        jobs.append((row, company_name))
+
+    def on_result(job, contact):
+        row, _ = job
+        phone, email = contact
+        # 写入旁路日志（第六列=手机号，第七列=邮箱），实时落盘
+        journal.set(row, 6, phone)
+        journal.set(row, 7, email)
+
+    def on_error(job, e):
+        # 失败时写入空值
+        print(f"第{job[0]}行处理失败：{str(e)}")
+        return "", ""
+
+    # 所有页签共用一个上下文，登录一次即可（保管库中有登录态时直接复用）；每个页签处理完随机等待，降低反爬风险
+    # 保管库中有多个账号时改用账号池，每个查询分给剩余预算最多的账号
+    vault = SessionVault()
+    pool = load_pool("tianyancha", vault, ACCOUNT_HOURLY_BUDGET)
+    storage_state = None if pool else vault.load("tianyancha")
+    engine = CrawlEngine(
+        search_contact,
+        tab_count=TAB_COUNT,
+        shared_context=True,
+        warmup_url=SEARCH_URL,  # 每个页签先打开天眼查搜索页
+        delay_range=(3, 6),
+        on_error=on_error,
+        store=store,
+        site="aiqicha",
+        job_key=lambda job: str(job[0]),  # 按行号记录进度
+        block_site="tianyancha",
+        on_block=vault.expiry_watcher("tianyancha"),
+        storage_state=storage_state,
+        session_pool=pool,
+        slow_mo=50,
+    )
+    try:
+        await engine.start()
         
-        # 打开天眼查搜索页
-        page.goto("https://www.tianyancha.com/nsearch?key=")
-        print("请在60秒内手动完成登录（扫码/账号密码）...")
-        time.sleep(60)  # 等待登录
+        # 没有可用登录态时在第一个页签中手动登录并保存
+        if not pool and not storage_state:
+            input("请在浏览器中手动完成登录（扫码/账号密码），登录后按回车键开始...")
+            await vault.save(engine.contexts[0], "tianyancha")
+            for page in engine.pages[1:]:
+                await page.reload()
         
-        # 遍历公司名称（从第2行开始，跳过表头）
-        for row in range(start_row_index, max_row + 1):
-            company_name = ws.cell(row=row, column=3).value  # 第三列（索引2）
-            if not company_name:
-                print(f"第{row}行无公司名称，跳过")
-                continue
-            
-            try:
-                print(f"\n处理第{row}行：{company_name}")
-                
-                # 定位搜索框并输入公司名称（清空后输入，避免残留内容）
-                search_input = page.wait_for_selector(
-                    ".tyc-header-suggest-content input",
-                    timeout=10000
-                )
-                search_input.fill('')
-                search_input.fill(company_name)
-                time.sleep(random.uniform(0.5, 1.5))  # 模拟人工输入间隔
-                
-                # 点击搜索按钮
-                search_btn = page.wait_for_selector(
-                    ".tyc-header-suggest-button",
-                    timeout=10000
-                )
-                search_btn.click()
-                time.sleep(random.uniform(2, 4))  # 等待结果加载
-                
-                # 提取第一个结果的联系信息
-                contact_element = page.wait_for_selector(
-                    ".index_contact-row__iYUn6",
-                    timeout=15000  # 最长等待15秒
-                )
-                contact_text = contact_element.text_content() or ""
-                print(f"提取到联系文本：{contact_text[:50]}...")  # 打印前50字符
-                
-                # 解析手机号和邮箱
-                phone, email = extract_contact_info(contact_text)
-                print(f"匹配结果：手机号={phone}，邮箱={email}")
-                
-                # 写入Excel（第六列=手机号，第七列=邮箱）
-                ws.cell(row=row, column=6).value = phone
-                ws.cell(row=row, column=7).value = email
-                wb.save("BOSSid.xlsx")  # 实时保存
-                
-            except Exception as e:
-                print(f"第{row}行处理失败：{str(e)}")
-                # 失败时写入空值
-                ws.cell(row=row, column=6).value = ""
-                ws.cell(row=row, column=7).value = ""
-                wb.save("BOSSid.xlsx")
-            
-            # 随机等待，降低反爬风险
-            time.sleep(random.uniform(3, 6))
+        await engine.run(jobs, on_result=on_result)
+    finally:
+        await engine.stop()
+        wb.close()
+        journal.merge()  # 一次性合并进Excel
+        store.close()
     
     print("\n所有公司处理完成，结果已写入BOSSid.xlsx")
-    wb.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -1,120 +1,253 @@
+import asyncio
 import csv
+import os
 import re
-import time
-from playwright.sync_api import sync_playwright
+import sys
+from urllib.parse import quote
+from crawl_engine import CrawlEngine
+from resource_policy import ResourcePolicy
+from state_store import StateStore
+from keyword_batch import read_keywords
+
+BLOCK_RESOURCES = False  # 改为True时拦截头像/封面/字体/媒体，只加载文本（默认关闭，确认页面能正常提取后再开启）
+KEYWORD = "说影"  # 搜索关键词
+PAGE_CONCURRENCY = 4  # 同时加载的结果页数量
+MAX_RETRIES = 2  # 单页加载失败后的最大重试次数
+SEARCH_URL = "https://search.bilibili.com/upuser?keyword={keyword}&page={page}&from_source=webtop_search&search_source=5"
+FIELDNAMES = ['用户名', '粉丝数量', '视频数量', '用户简介', '主页链接']
 
 def parse_intro(intro_text):
     """解析简介文本，提取粉丝数量、视频数量和用户简介"""
     if not intro_text:
         return "", "", ""
-    
+
     # 去除回车和空格
     intro_text = intro_text.replace('\n', '').replace(' ', '')
-    
+
     # 正则表达式，匹配粉丝和视频数量（保留单位）
     pattern = r'(\d+(?:\.\d+)?)(万|亿)?粉丝·(\d+(?:\.\d+)?)(万|亿)?个视频'
     match = re.search(pattern, intro_text)
-    
+
     if match:
         # 提取粉丝数量（保留单位）
         fans_num = match.group(1)
         fans_unit = match.group(2) or ""
         fans = f"{fans_num}{fans_unit}"
-        
+
         # 提取视频数量（保留单位）
         videos_num = match.group(3)
         videos_unit = match.group(4) or ""
         videos = f"{videos_num}{videos_unit}"
-        
+
         # 提取简介部分
         desc_start = match.end()
         description = intro_text[desc_start:] if desc_start < len(intro_text) else ""
-        
+
         return fans, videos, description
     else:
         # 如果没有匹配到粉丝和视频信息，整个文本作为简介
         return "", "", intro_text
 
+def search_url(keyword, page_no):
+    """第 page_no 页搜索结果的地址"""
+    return SEARCH_URL.format(keyword=quote(keyword), page=page_no)
+
+async def extract_users(page):
+    """提取当前结果页的所有用户信息"""
+    # 等待用户名和简介元素加载完成
+    await page.wait_for_selector('div.user-content.pr_md .text1.p_relative')
+    await page.wait_for_selector('div.user-content.pr_md .b_text.fs_5.text2.text_ellipsis')
+
+    rows = []
+    for user in await page.query_selector_all('div.user-content.pr_md'):
+        # 提取用户名和主页链接
+        username_element = await user.query_selector('.text1.p_relative')
+        username = await username_element.get_attribute('title') if username_element else ''
+        homepage_link = await username_element.get_attribute('href') if username_element else ''
+
+        # 提取并解析简介
+        intro_element = await user.query_selector('.b_text.fs_5.text2.text_ellipsis')
+        intro_text = await intro_element.get_attribute('title') if intro_element else ''
+        fans, videos, description = parse_intro(intro_text)
+
+        rows.append({
+            '用户名': username,
+            '粉丝数量': fans,
+            '视频数量': videos,
+            '用户简介': description,
+            '主页链接': homepage_link
+        })
+    return rows
+
+async def detect_total_pages(page):
+    """从分页按钮中读取总页数（最大的页码数字），没有分页时为1"""
+    numbers = []
+    for button in await page.query_selector_all('button'):
+        text = (await button.inner_text()).strip()
+        if text.isdigit():
+            numbers.append(int(text))
+    return max(numbers, default=1)
+
+def page_site(keyword):
+    """状态库中记录结果页进度的站点名（用户行以主页链接记在 bili:<关键词> 下）"""
+    return f"bili-page:{keyword}"
+
+class PageWriter:
+    """按页码顺序追加写入CSV：先完成的后续页暂存，等前面的页写完再写
+
+    传入状态库时每行以主页链接为key记入 bili:<关键词>，整页写完后页码记入 bili-page:<关键词>；
+    续爬时跳过 done_pages 中的页，已记录的用户不再重复写入。状态库提交前先把CSV落盘。
+    """
+
+    def __init__(self, filename, keyword, total_pages, store=None, done_pages=()):
+        new_file = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        self.file = open(filename, 'a', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDNAMES)
+        if new_file:
+            self.writer.writeheader()
+        self.filename = filename
+        self.keyword = keyword
+        self.total_pages = total_pages
+        self.store = store
+        self.done_pages = set(done_pages)
+        self.next_page = 1
+        self.buffer = {}
+        self.rows = 0
+        self.failed_pages = []
+        if store:
+            store.before_commit(self.flush)
+
+    def add(self, page_no, rows):
+        self.buffer[page_no] = rows
+        while self.next_page in self.buffer or self.next_page in self.done_pages:
+            if self.next_page not in self.buffer:
+                self.next_page += 1  # 上次运行已写入
+                continue
+            page_rows = self.buffer.pop(self.next_page)
+            if page_rows is None:
+                self.failed_pages.append(self.next_page)
+                if self.store:
+                    self.store.mark_failed(page_site(self.keyword), self.next_page, "加载失败")
+                print(f"[{self.keyword}] 第 {self.next_page} 页加载失败，跳过")
+            else:
+                written = 0
+                for row in page_rows:
+                    link = row['主页链接']
+                    if self.store and link and self.store.is_done(f"bili:{self.keyword}", link):
+                        continue  # 结果翻页后上次已写入的用户
+                    self.writer.writerow(row)
+                    written += 1
+                    if self.store and link:
+                        self.store.mark_done(f"bili:{self.keyword}", link, row)
+                    print(f"已爬取: {row['用户名']} - {row['粉丝数量']}粉丝 · {row['视频数量']}个视频 · {row['用户简介'][:30]}...")
+                self.rows += written
+                if self.store:
+                    self.store.mark_done(page_site(self.keyword), self.next_page, {'total_pages': self.total_pages})
+                print(f"[{self.keyword}] 第 {self.next_page}/{self.total_pages} 页已写入")
+            self.next_page += 1
+
+    def flush(self):
+        """CSV 落盘（状态库提交前调用）"""
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+async def fetch_page(page, job):
+    """打开某个关键词的第 N 页并提取用户；第1页同时读取总页数"""
+    keyword, page_no = job
+    await page.goto(search_url(keyword, page_no), wait_until="domcontentloaded")
+    rows = await extract_users(page)
+    total_pages = await detect_total_pages(page) if page_no == 1 else None
+    return {'rows': rows, 'total_pages': total_pages}
+
+def create_engine():
+    """创建爬取引擎：每个页签直接打开第 N 页的地址，无需逐页点击下一页"""
+    return CrawlEngine(
+        fetch_page,
+        tab_count=PAGE_CONCURRENCY,
+        shared_context=True,
+        delay_range=(1, 2),
+        max_retries=MAX_RETRIES,
+        retry_backoff=5,
+        default_timeout=20000,
+        resource_policy=ResourcePolicy("bili") if BLOCK_RESOURCES else None,
+    )
+
+async def crawl(keywords, output_name, store=None):
+    """爬取多个关键词：先并发打开各关键词第1页读取总页数，再把所有关键词的其余页放进同一个队列
+
+    output_name: def output_name(keyword) -> CSV 文件名
+    传入状态库时断点续爬：已写入的页跳过（第1页已完成时总页数取自状态库），结果追加到原CSV
+    """
+    engine = create_engine()
+    writers = {}
+    first_pages = []
+    for keyword in keywords:
+        done_pages = {int(page_no) for page_no in store.done_keys(page_site(keyword))} if store else set()
+        if 1 in done_pages:
+            total_pages = store.get_result(page_site(keyword), 1)['total_pages']
+            writers[keyword] = PageWriter(output_name(keyword), keyword, total_pages, store, done_pages)
+            print(f"关键词 {keyword} 共 {total_pages} 页结果，状态库中已完成 {len(done_pages)} 页")
+        else:
+            first_pages.append((keyword, 1))
+
+    def on_first_page(job, result):
+        keyword = job[0]
+        if not result:
+            print(f"[{keyword}] 第1页加载失败，跳过该关键词")
+            return
+        done_pages = {int(page_no) for page_no in store.done_keys(page_site(keyword))} if store else set()
+        writers[keyword] = PageWriter(output_name(keyword), keyword, result['total_pages'], store, done_pages)
+        writers[keyword].add(1, result['rows'])
+        print(f"关键词 {keyword} 共 {result['total_pages']} 页结果")
+
+    def on_page(job, result):
+        keyword, page_no = job
+        writers[keyword].add(page_no, result['rows'] if result else None)
+
+    try:
+        await engine.start()
+        await engine.run(first_pages, on_result=on_first_page)
+
+        # 其余未完成的页并发加载，按页码顺序合并写入
+        jobs = [
+            (keyword, page_no)
+            for keyword, page_writer in writers.items()
+            for page_no in range(2, page_writer.total_pages + 1)
+            if page_no not in page_writer.done_pages
+        ]
+        print(f"共 {len(jobs)} 个结果页待加载，{PAGE_CONCURRENCY} 页并发")
+        await engine.run(jobs, on_result=on_page)
+    finally:
+        await engine.stop()
+        if store:
+            store.commit()
+        for page_writer in writers.values():
+            page_writer.close()
+
+    for keyword in keywords:
+        page_writer = writers.get(keyword)
+        if not page_writer:
+            continue
+        print(f"[{keyword}] 爬取完成，共写入 {page_writer.rows} 个用户到 {page_writer.filename}")
+        if page_writer.failed_pages:
+            print(f"[{keyword}] 以下页面加载失败：{page_writer.failed_pages}")
+
 def main():
-    # 创建CSV文件并设置表头
-    with open('bilibili.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['用户名', '粉丝数量', '视频数量', '用户简介','主页链接']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # 启动浏览器
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            
-            # 打开目标网站（请替换为实际URL）
-            page.goto("https://search.bilibili.com/upuser?keyword=%E8%AF%B4%E5%BD%B1&from_source=webtop_search&spm_id_from=333.1007&search_source=5")
-            
-            # 等待页面加载完成
-            page.wait_for_selector('div.user-content.pr_md')
-            
-            while True:
-                # 等待用户名和简介元素加载完成
-                page.wait_for_selector('div.user-content.pr_md .text1.p_relative')
-                page.wait_for_selector('div.user-content.pr_md .b_text.fs_5.text2.text_ellipsis')
-                
-                # 提取所有用户信息
-                user_elements = page.query_selector_all('div.user-content.pr_md')
-                
-                for user in user_elements:
-                    # 提取用户名
-                    username_element = user.query_selector('.text1.p_relative')
-                    username = username_element.get_attribute('title') if username_element else ''
-
-                    # 提取主页链接
-                    homepage_link = username_element.get_attribute('href') if username_element else ''
-                    
-                    # 提取简介
-                    intro_element = user.query_selector('.b_text.fs_5.text2.text_ellipsis')
-                    intro_text = intro_element.get_attribute('title') if intro_element else ''
-                    
-                    # 解析简介
-                    fans, videos, description = parse_intro(intro_text)
-                    
-                    # 写入CSV文件
-                    writer.writerow({
-                        '用户名': username,
-                        '粉丝数量': fans,
-                        '视频数量': videos,
-                        '用户简介': description,
-                        '主页链接': homepage_link
-                    })
-                    print(f"已爬取: {username} - {fans}粉丝 · {videos}个视频 · {description[:30]}...")
-                
-                # 查找按钮文本为"下一页"且没有disabled属性的按钮
-                next_buttons = page.query_selector_all('button')
-                next_button = None
-                
-                for button in next_buttons:
-                    if button.inner_text().strip() == "下一页" and not button.get_attribute('disabled'):
-                        next_button = button
-                        break
-                
-                # 判断是否找到可点击的下一页按钮
-                if next_button:
-                    # 滚动到下一页按钮
-                    next_button.scroll_into_view_if_needed()
-                    
-                    # 点击下一页
-                    next_button.click()
-                    
-                    print("已点击下一页，等待2秒...")
-                    time.sleep(2)  # 等待2秒，确保页面完全加载
-                    
-                    # 等待页面加载新内容
-                    page.wait_for_load_state('networkidle')
-                    print("页面加载完成，继续爬取")
-                else:
-                    print("已到达最后一页，爬取完成")
-                    break
-            
-            # 关闭浏览器
-            browser.close()
+    store = StateStore()
+    try:
+        if len(sys.argv) > 2 and sys.argv[1] == "batch":
+            # 批量模式：python bili.py batch keywords.txt，每个关键词一个结果文件
+            keywords = read_keywords(sys.argv[2])
+            if keywords:
+                asyncio.run(crawl(keywords, lambda keyword: f'bilibili_{keyword}.csv', store))
+        else:
+            asyncio.run(crawl([KEYWORD], lambda keyword: 'bilibili.csv', store))
+    finally:
+        store.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,114 @@
+"""验证码/登录墙检测
+
+站点返回验证页或登录墙时，页面不会报错，只是找不到目标元素：以前的脚本会把同一页签上
+剩余的任务全部记为"超时"。这里按站点维护 URL 和页面内容特征，
+detect_block 是不依赖浏览器的纯函数，可以直接用保存下来的 HTML 验证特征是否有效；
+CrawlEngine 在任务失败时调用 check_page，命中后隔离该页签并把任务放回队列。
+"""
+
+# 各站点的拦截特征：kind -> {"url": URL 片段, "html": 页面内容片段}
+SITE_SIGNATURES = {
+    "zhipin": {
+        "captcha": {
+            "url": ["/web/passport/zp/verify", "/web/common/security-check"],
+            "html": ["当前IP地址可能存在异常访问行为", "请完成验证后继续访问"],
+        },
+        "login": {
+            "url": ["/web/user/?ka=", "/web/user/login"],
+            "html": [],
+        },
+    },
+    "douyin": {
+        "captcha": {
+            "url": ["verifycenter", "verify.snssdk.com"],
+            "html": ['id="captcha_container"', "captcha-verify-image", "验证码中间页"],
+        },
+        "login": {
+            "url": ["sso.douyin.com", "/passport/"],
+            "html": [],
+        },
+    },
+    "kuaishou": {
+        "captcha": {
+            "url": ["captcha.zt.kuaishou.com", "/captcha"],
+            "html": ["请完成安全验证"],
+        },
+        "login": {
+            "url": ["passport.kuaishou.com"],
+            "html": [],
+        },
+    },
+    "tianyancha": {
+        "captcha": {
+            "url": ["antirobot.tianyancha.com", "captcha.tianyancha.com"],
+            "html": ["我们只是确认一下你不是机器人", "请进行身份验证以继续使用"],
+        },
+        "login": {
+            "url": ["/login?", "/vipintro"],
+            "html": ["登录后查看更多信息"],
+        },
+    },
+    "chanmama": {
+        "captcha": {
+            "url": ["/captcha"],
+            "html": ["请完成安全验证"],
+        },
+        "login": {
+            "url": ["/login"],
+            "html": [],
+        },
+    },
+    "default": {
+        "captcha": {
+            # 只匹配验证码服务的路径/域名，不能用裸的 "verify"（会误伤 /verify-email、?verify= 等正常页面）
+            "url": ["/captcha", "captcha.", "/verifycenter"],
+            "html": ["geetest_", "nc_1_wrapper", "请完成安全验证"],
+        },
+        "login": {
+            "url": [],
+            "html": [],
+        },
+    },
+}
+
+
+class BlockedError(Exception):
+    """页面被验证码或登录墙拦截；handler 可直接抛出，由引擎隔离页签并重新排队"""
+
+    def __init__(self, reason, url=""):
+        super().__init__(f"{reason}: {url}")
+        self.reason = reason
+        self.url = url
+
+
+def detect_block(site, url, html=""):
+    """根据 URL 和页面内容判断是否被拦截，返回 "captcha" / "login"，未拦截返回 None"""
+    signatures = SITE_SIGNATURES.get(site, SITE_SIGNATURES["default"])
+    url = url or ""
+    html = html or ""
+    for kind, signature in signatures.items():
+        if any(pattern in url for pattern in signature["url"]):
+            return kind
+        if html and any(pattern in html for pattern in signature["html"]):
+            return kind
+    return None
+
+
+async def check_page(page, site):
+    """读取页面的 URL 和内容并检测是否被拦截"""
+    kind = detect_block(site, page.url)
+    if kind:
+        return kind
+    try:
+        html = await page.content()
+    except Exception:
+        # 页面正在跳转时无法读取内容，只按 URL 判断
+        return None
+    return detect_block(site, page.url, html)
+
+
+async def raise_if_blocked(page, site):
+    """被拦截时抛出 BlockedError（供自行捕获异常的 handler 在放弃前调用）"""
+    kind = await check_page(page, site)
+    if kind:
+        raise BlockedError(kind, page.url)
@@ -1,111 +1,197 @@
 import asyncio
+import os
 import random
-import time
+import sys
 import pandas as pd
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from crawl_engine import CrawlEngine
+from xlsx_writer import CellJournal
+from state_store import StateStore
+from resource_policy import ResourcePolicy
+from rate_limiter import AdaptiveRateLimiter
+from worker_client import CoordinatorClient, collect_results, run_worker
+from hybrid_fetcher import HybridFetcher, extract_class_text
 
 # 配置参数
 CONFIG = {
     "EXCEL_PATH": "boss.xlsx",  # 数据文件路径
-    "TAB_COUNT": 5,  # 同时并行的页签数量
-    "MAX_RETRIES": 2,  # 单个ID最大重试次数
-    "BATCH_SIZE": 10,  # 每个页签一次处理的ID数量
-    "PROCESS_BATCH": 50,  # 每批处理的ID总数
-    "REST_RANGE": (60, 180),  # 休息时间范围(秒)，1-3分钟
-    "START_ROW": 1,  # 起始处理行（Excel行号，1-based），如80表示从第80行开始
+    "TAB_COUNT": 5,  # 同时并行的页签数量（多进程模式下为每个进程的页签数）
+    "SHARD_COUNT": 4,  # 多进程模式（boss_shard.py）的进程数，每个进程独立启动一个浏览器
+    "MAX_RETRIES": 2,  # 单个ID最大重试次数（失败后按指数退避放回队尾）
+    "RETRY_BACKOFF": 30,  # 重试退避基数(秒)，第n次重试等待 30*2^(n-1) 秒
+    "BATCH_SIZE": 10,  # 每个页签一次处理的ID数量（之后回首页刷新）
+    "TARGET_RATE": 15,  # 目标速率(个ID/分钟，所有页签合计；多进程模式下为每个进程的速率)，响应正常时逐步提速
+    "MAX_RATE": 40,  # 速率上限(个ID/分钟)；遇到超时/429/403/验证码时速率减半并暂停冷却
+    "SAVE_EVERY": 1,  # 每完成多少个ID把结果落盘到旁路日志（结束时再一次性合并进xlsx）
+    "START_ROW": 1,  # 起始处理行（Excel行号，1-based）；断点续爬由状态库自动完成，一般无需修改
+    "STATE_DB": "crawl_state.db",  # 任务状态库（记录每个ID的状态、尝试次数、错误和结果）
     "USER_AGENTS": [
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36",
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Safari/605.1.15",
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/117.0"
     ],
+    "HYBRID": False,  # 改为True时启用混合模式：浏览器预热后导出Cookie，先用HTTP抓取公司页，被拦截或解析失败的ID再交给浏览器页签（默认关闭，先用少量ID确认HTTP能解析出公司名后再开启）
+    "HTTP_CONCURRENCY": 8,  # 混合模式的HTTP并发请求数
+    "HTTP_TARGET_RATE": 60,  # 混合模式HTTP请求的目标速率(个ID/分钟)
+    "HTTP_MAX_RATE": 180,  # 混合模式HTTP请求的速率上限(个ID/分钟)
+    "BLOCK_RESOURCES": False,  # 改为True时拦截图片/媒体/字体/样式表，只加载文本（默认关闭，确认页面能正常提取后再开启）
     "READ_COLUMN": 0,  # 读取ID的列号（0-based）
     "WRITE_COLUMN": 6,  # 写入结果的列号（0-based）
 }
 
 
-async def tab_worker(page, tab_id, ids, results):
-    """单个页签的工作函数：独立处理分配的ID列表"""
-    print(f"页签 {tab_id} 开始处理 {len(ids)} 个ID")
-    for i, id in enumerate(ids):
-        try:
-            # 导航到目标页面（仅等待DOM加载，加速）
-            await page.goto(f"https://www.zhipin.com/gongsi/{id}.html", wait_until="domcontentloaded", timeout=15000)
-            
-            # 随机滚动模拟用户行为
-            await page.mouse.wheel(0, random.randint(200, 500))
-            await asyncio.sleep(random.uniform(2, 5))
-            
-            # 提取目标文本
-            await page.wait_for_selector(".business-detail-name", timeout=8000)
-            name = await page.evaluate("""
-                () => {
-                    const el = document.querySelector('.business-detail-name');
-                    return Array.from(el.childNodes)
-                        .filter(n => n.nodeType === 3 && n.textContent.trim())
-                        .map(n => n.textContent.trim()).join('') || '无文本';
-                }
-            """)
-            
-            results.append((id, name))
-            print(f"页签 {tab_id} 完成 {i+1}/{len(ids)}：ID {id} -> {name[:20]}")
-            
-        except TimeoutError:
-            print(f"页签 {tab_id} ID {id} 超时")
-            results.append((id, "超时"))
-        except Exception as e:
-            print(f"页签 {tab_id} ID {id} 错误：{str(e)[:30]}")
-            results.append((id, "错误"))
-        
-        # 每处理BATCH_SIZE个ID，随机刷新页面（反反爬）
-        if (i + 1) % CONFIG["BATCH_SIZE"] == 0:
-            await page.goto("https://www.zhipin.com/", wait_until="domcontentloaded")
-            await asyncio.sleep(random.uniform(1, 2))
+def company_url(id):
+    return f"https://www.zhipin.com/gongsi/{id}.html"
+
+
+def parse_company_name(html, id):
+    """混合模式：从HTTP返回的公司页HTML中提取公司名称（只取元素自身的文本），页面不完整时返回None"""
+    name = extract_class_text(html, "business-detail-name", direct_only=True)
+    if name is None:
+        return None
+    name = name or "无文本"
+    print(f"ID {id} -> {name[:20]}（HTTP）")
+    return name
+
 
+def create_hybrid_fetcher():
+    """按CONFIG创建混合模式的HTTP抓取器（独立的限速器）"""
+    return HybridFetcher(
+        "zhipin",
+        concurrency=CONFIG["HTTP_CONCURRENCY"],
+        rate_limiter=AdaptiveRateLimiter(CONFIG["HTTP_TARGET_RATE"], CONFIG["HTTP_MAX_RATE"], name="zhipin-http"),
+    )
 
-async def process_batch(ids_batch):
-    """处理单个批次的ID"""
-    # 平均分配当前批次ID到多个页签
-    tab_ids = [ids_batch[i::CONFIG["TAB_COUNT"]] for i in range(CONFIG["TAB_COUNT"])]
+
+async def fetch_company_name(page, id):
+    """单个ID的导航和提取：返回公司名称"""
+    # 导航到目标页面（仅等待DOM加载，加速）
+    await page.goto(company_url(id), wait_until="domcontentloaded", timeout=15000)
     
-    async with async_playwright() as p:
-        # 启动浏览器
-        browser = await p.chromium.launch(
-            headless=False,
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        
-        # 创建页签和任务
-        pages = []
-        tasks = []
-        results = []
-        
-        for i in range(CONFIG["TAB_COUNT"]):
-            context = await browser.new_context(user_agent=random.choice(CONFIG["USER_AGENTS"]))
-            page = await context.new_page()
-            await page.goto("https://www.zhipin.com/")
-            pages.append(page)
-            
-            task = asyncio.create_task(tab_worker(page, i+1, tab_ids[i], results))
-            tasks.append(task)
-        
-        # 等待所有任务完成
-        await asyncio.gather(*tasks)
-        
-        # 关闭资源
-        for page in pages:
-            await page.close()
-        await browser.close()
+    # 随机滚动模拟用户行为
+    await page.mouse.wheel(0, random.randint(200, 500))
+    await asyncio.sleep(random.uniform(2, 5))
+    
+    # 提取目标文本
+    await page.wait_for_selector(".business-detail-name", timeout=8000)
+    name = await page.evaluate("""
+        () => {
+            const el = document.querySelector('.business-detail-name');
+            return Array.from(el.childNodes)
+                .filter(n => n.nodeType === 3 && n.textContent.trim())
+                .map(n => n.textContent.trim()).join('') || '无文本';
+        }
+    """)
+    print(f"ID {id} -> {name[:20]}")
+    return name
+
+
+def error_result(id, e):
+    """ID最终处理失败时写入的结果"""
+    return "超时" if isinstance(e, TimeoutError) else "错误"
+
+
+def create_engine(store=None):
+    """按CONFIG创建爬取引擎（每个页签独立上下文、随机UA，并预热zhipin首页）"""
+    return CrawlEngine(
+        fetch_company_name,
+        tab_count=CONFIG["TAB_COUNT"],
+        user_agents=CONFIG["USER_AGENTS"],
+        warmup_url="https://www.zhipin.com/",
+        refresh_every=CONFIG["BATCH_SIZE"],
+        refresh_url="https://www.zhipin.com/",
+        rate_limiter=AdaptiveRateLimiter(CONFIG["TARGET_RATE"], CONFIG["MAX_RATE"], name="zhipin"),
+        max_retries=CONFIG["MAX_RETRIES"],
+        retry_backoff=CONFIG["RETRY_BACKOFF"],
+        on_error=error_result,
+        store=store,
+        site="boss",
+        block_site="zhipin",
+        resource_policy=ResourcePolicy("zhipin") if CONFIG["BLOCK_RESOURCES"] else None,
+    )
+
+
+def group_rows(id_series):
+    """同一ID可能出现在多行，只爬取一次：返回 {ID: [DataFrame行索引, ...]}"""
+    rows_by_id = {}
+    for idx, id_val in id_series.items():  # idx是原始DataFrame中的iloc索引
+        rows_by_id.setdefault(str(id_val), []).append(idx)
+    return rows_by_id
+
+
+def get_pending_ids(store, rows_by_id):
+    """断点续爬：跳过状态库中已完成的ID，失败过的ID会重新爬取"""
+    pending_ids = store.pending("boss", list(rows_by_id))
+    skipped = len(rows_by_id) - len(pending_ids)
+    if skipped:
+        print(f"状态库中已完成 {skipped} 个ID，本次跳过")
+    return pending_ids
+
+
+def write_result(journal, rows_by_id, id, name):
+    """把一个ID的结果写入其所在的所有行"""
+    for idx in rows_by_id[id]:
+        # DataFrame索引 -> Excel行号（跳过表头，1-based）
+        journal.set(idx + 2, CONFIG["WRITE_COLUMN"] + 1, name)
+
+
+def is_failure(name):
+    """结果是否为用尽重试后的失败标记"""
+    return name in ("超时", "错误")
+
+
+async def crawl_ids(id_series):
+    """所有ID放入共享队列，页签空闲即领取；结果到达即写入旁路日志，结束时合并进xlsx"""
+    rows_by_id = group_rows(id_series)
+    store = StateStore(CONFIG["STATE_DB"])
+    pending_ids = get_pending_ids(store, rows_by_id)
+    if not pending_ids:
+        print("所有ID均已完成")
+        store.close()
+        return
+    total = len(pending_ids)
+    done = 0
+    journal = CellJournal(CONFIG["EXCEL_PATH"], flush_every=CONFIG["SAVE_EVERY"], store=store)
+
+    def on_result(id, name):
+        nonlocal done
+        write_result(journal, rows_by_id, id, name)
+        done += 1
+        print(f"已完成 {done}/{total} 个ID")
+
+    engine = create_engine(store)
+    hybrid = create_hybrid_fetcher() if CONFIG["HYBRID"] else None
+    try:
+        async with engine:
+            if hybrid:
+                results = await hybrid.run(engine, pending_ids, company_url, parse_company_name, on_result=on_result)
+            else:
+                results = await engine.run(pending_ids, on_result=on_result)
         
-        return results
+        # 统计重试情况：重试后成功的为临时性失败，用尽重试仍失败的写入"超时"/"错误"（HTTP完成的ID不在attempts中）
+        recovered = sum(1 for id, name in results if engine.attempts.get(id, 1) > 1 and not is_failure(name))
+        failed = sum(1 for id, name in results if is_failure(name))
+        print(f"重试后恢复 {recovered} 个ID，最终失败 {failed} 个ID")
+    finally:
+        if hybrid:
+            hybrid.close()
+        journal.merge()
+        store.close()
+        print(f"已保存结果（共完成 {done}/{total} 个ID）")
 
 
-def main():
+def load_id_series():
+    """读取boss.xlsx中起始行及之后的ID列（保留原始索引），出错时返回None"""
+    # 上次运行中断时遗留的旁路日志先合并回xlsx
+    if os.path.exists(CONFIG["EXCEL_PATH"]):
+        CellJournal(CONFIG["EXCEL_PATH"]).merge()
+    
     # 读取ID列表
     try:
         df = pd.read_excel(CONFIG["EXCEL_PATH"])
     except FileNotFoundError:
         print(f"错误：找不到文件 {CONFIG['EXCEL_PATH']}")
-        return
+        return None
     
     # 计算起始行的索引（Excel行号转iloc索引：1-based -> 0-based）
     start_row_excel = CONFIG["START_ROW"]
@@ -114,53 +200,81 @@ def main():
     # 校验起始行是否超出数据范围
     if start_row_idx >= len(df):
         print(f"错误：起始行 {start_row_excel} 超出数据总行数（共{len(df)}行）")
-        return
+        return None
     
     # 提取起始行及之后的ID列数据（保留原始索引，用于后续更新）
     id_series = df.iloc[start_row_idx:, CONFIG["READ_COLUMN"]].dropna().astype(str)
     if id_series.empty:
         print(f"从第{start_row_excel}行开始无有效ID数据（列索引：{CONFIG['READ_COLUMN']}）")
+        return None
+    return id_series
+
+
+async def run_as_worker(client):
+    """工作模式：从协调服务领取ID，用本机浏览器爬取后提交结果"""
+    async with create_engine() as engine:
+        await run_worker(
+            engine,
+            client,
+            "boss",
+            to_job=lambda job: job["key"],
+            job_key=lambda id: id,
+            is_failure=is_failure,
+        )
+
+
+def run_distributed(mode, url):
+    """多机模式：enqueue 把待处理ID提交到协调服务，worker 领取并爬取，collect 把结果写回xlsx"""
+    client = CoordinatorClient(url)
+    if mode == "worker":
+        asyncio.run(run_as_worker(client))
+        return
+    
+    id_series = load_id_series()
+    if id_series is None:
+        return
+    rows_by_id = group_rows(id_series)
+    store = StateStore(CONFIG["STATE_DB"])
+    try:
+        if mode == "enqueue":
+            pending_ids = get_pending_ids(store, rows_by_id)
+            added = client.enqueue("boss", [{"key": id} for id in pending_ids])
+            print(f"已提交 {added} 个ID到协调服务 {url}")
+        elif mode == "collect":
+            journal = CellJournal(CONFIG["EXCEL_PATH"], flush_every=100, store=store)
+
+            def write(id, name):
+                if id not in rows_by_id:
+                    return False
+                write_result(journal, rows_by_id, id, name)
+
+            collected = collect_results(client, "boss", store, write)
+            journal.merge()
+            print(f"已从协调服务取回 {collected} 个结果，写入第{CONFIG['WRITE_COLUMN']+1}列")
+        else:
+            print(f"未知模式：{mode}（可选 enqueue / worker / collect）")
+    finally:
+        store.close()
+
+
+def main():
+    # 多机模式：python boss.py enqueue|worker|collect http://协调服务地址:8765
+    if len(sys.argv) > 2:
+        run_distributed(sys.argv[1], sys.argv[2])
+        return
+    
+    id_series = load_id_series()
+    if id_series is None:
         return
     
     total_ids = len(id_series)
-    print(f"总ID数：{total_ids}，从第{start_row_excel}行开始处理，分为{CONFIG['TAB_COUNT']}个页签并行处理，每{CONFIG['PROCESS_BATCH']}个ID休息一次")
+    start_row_excel = CONFIG["START_ROW"]
+    print(f"总ID数：{total_ids}，从第{start_row_excel}行开始处理，{CONFIG['TAB_COUNT']}个页签从共享队列领取ID，目标速率{CONFIG['TARGET_RATE']}个/分钟（上限{CONFIG['MAX_RATE']}）")
     
-    # 按批次处理ID
-    for batch_idx in range(0, total_ids, CONFIG["PROCESS_BATCH"]):
-        # 获取当前批次的ID（包含原始索引）
-        batch_start = batch_idx
-        batch_end = min(batch_idx + CONFIG["PROCESS_BATCH"], total_ids)
-        current_batch = id_series.iloc[batch_start:batch_end]
-        current_ids = current_batch.tolist()
-        batch_num = (batch_idx // CONFIG["PROCESS_BATCH"]) + 1
-        
-        # 计算当前批次对应的Excel行号范围
-        first_row_in_batch = start_row_excel + batch_start
-        last_row_in_batch = start_row_excel + batch_end - 1
-        print(f"\n===== 开始处理第 {batch_num} 批：{first_row_in_batch}-{last_row_in_batch}行（共{batch_end - batch_start}个ID） =====")
-        
-        # 处理当前批次
-        batch_results = asyncio.run(process_batch(current_ids))
-        
-        # 映射ID到结果
-        id_to_name = {id: name for id, name in batch_results}
-        
-        # 更新当前批次的结果到DataFrame（使用原始索引定位行）
-        for idx, id_val in current_batch.items():  # idx是原始DataFrame中的iloc索引
-            df.iloc[idx, CONFIG["WRITE_COLUMN"]] = id_to_name.get(str(id_val), "未处理")
-        
-        # 保存当前批次结果
-        df.to_excel(CONFIG["EXCEL_PATH"], index=False)
-        print(f"第 {batch_num} 批处理完成，已保存结果（累计处理到第{last_row_in_batch}行）")
-        
-        # 如果不是最后一批，休息一段时间
-        if batch_end < total_ids:
-            rest_time = random.randint(*CONFIG["REST_RANGE"])
-            print(f"准备休息 {rest_time//60}分{rest_time%60}秒...")
-            time.sleep(rest_time)  # 使用同步休眠，确保休息生效
+    asyncio.run(crawl_ids(id_series))
     
     print(f"\n全部完成，所有结果已写入第{CONFIG['WRITE_COLUMN']+1}列，共处理{total_ids}个ID（从第{start_row_excel}行开始）")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,113 @@
+"""boss.py 多进程分片启动器
+
+把 boss.xlsx 中待处理的ID分成 N 片，启动 N 个工作进程（每个进程一个浏览器、
+CONFIG["TAB_COUNT"] 个页签）并行爬取。工作进程只负责爬取，结果通过队列发回主进程；
+主进程作为协调者统一写入状态库和旁路日志，最后合并进 WRITE_COLUMN，
+因此不需要手动拆分或复制表格。
+
+用法：python boss_shard.py [进程数]，不传时使用 CONFIG["SHARD_COUNT"]
+"""
+import asyncio
+import multiprocessing
+import queue
+import sys
+from boss import (
+    CONFIG,
+    create_engine,
+    get_pending_ids,
+    group_rows,
+    is_failure,
+    load_id_series,
+    write_result,
+)
+from state_store import StateStore
+from xlsx_writer import CellJournal
+
+
+def shard_worker(shard_no, ids, result_queue):
+    """工作进程：用独立的浏览器爬取一个分片，每个结果立即发回主进程"""
+    async def run():
+        async with create_engine() as engine:
+            await engine.run(ids, on_result=lambda id, name: result_queue.put((id, name)))
+
+    try:
+        print(f"进程 {shard_no} 开始处理 {len(ids)} 个ID")
+        asyncio.run(run())
+    finally:
+        # 结束标记
+        result_queue.put((None, shard_no))
+
+
+def split_shards(ids, shard_count):
+    """按轮询方式把ID分成 shard_count 片（去掉空片）"""
+    shards = [ids[i::shard_count] for i in range(shard_count)]
+    return [shard for shard in shards if shard]
+
+
+def main():
+    shard_count = int(sys.argv[1]) if len(sys.argv) > 1 else CONFIG["SHARD_COUNT"]
+
+    id_series = load_id_series()
+    if id_series is None:
+        return
+    rows_by_id = group_rows(id_series)
+
+    store = StateStore(CONFIG["STATE_DB"])
+    pending_ids = get_pending_ids(store, rows_by_id)
+    if not pending_ids:
+        print("所有ID均已完成")
+        store.close()
+        return
+
+    shards = split_shards(pending_ids, shard_count)
+    total = len(pending_ids)
+    print(f"待处理ID数：{total}，分为 {len(shards)} 个进程，每个进程 {CONFIG['TAB_COUNT']} 个页签")
+
+    # spawn 方式启动，保证每个进程拥有干净的 Playwright/事件循环
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    processes = [
+        ctx.Process(target=shard_worker, args=(i + 1, shard, result_queue), daemon=True)
+        for i, shard in enumerate(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    journal = CellJournal(CONFIG["EXCEL_PATH"], flush_every=CONFIG["SAVE_EVERY"], store=store)
+    finished = set()
+    done = 0
+    try:
+        # 协调者：汇总各进程的结果，直到所有进程结束
+        while len(finished) < len(processes):
+            try:
+                id, name = result_queue.get(timeout=5)
+            except queue.Empty:
+                # 进程异常退出时不会发送结束标记
+                for i, process in enumerate(processes):
+                    if not process.is_alive() and i + 1 not in finished:
+                        print(f"进程 {i+1} 已退出（退出码 {process.exitcode}）")
+                        finished.add(i + 1)
+                continue
+
+            if id is None:
+                finished.add(name)
+                print(f"进程 {name} 已完成")
+                continue
+
+            write_result(journal, rows_by_id, id, name)
+            if is_failure(name):
+                store.mark_failed("boss", id, name)
+            else:
+                store.mark_done("boss", id, name)
+            done += 1
+            print(f"已完成 {done}/{total} 个ID：{id} -> {name[:20]}")
+    finally:
+        for process in processes:
+            process.join(timeout=10)
+        journal.merge()
+        store.close()
+        print(f"\n全部完成，所有结果已写入第{CONFIG['WRITE_COLUMN']+1}列，共处理{done}/{total}个ID")
+
+
+if __name__ == "__main__":
+    main()
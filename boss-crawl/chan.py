@@ -2,10 +2,26 @@ import pandas as pd
 from openpyxl import load_workbook
 import random
 import re
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-import time
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import asyncio
 import os
 import sys
+from crawl_engine import CrawlEngine
+from xlsx_writer import CellJournal
+from state_store import StateStore
+from worker_client import CoordinatorClient, collect_results, run_worker
+from rate_limiter import AdaptiveRateLimiter
+from block_detector import BlockedError, raise_if_blocked
+from session_vault import SessionVault, login_once
+from hybrid_fetcher import HybridFetcher, extract_class_text
+
+TAB_COUNT = 3  # 同时并行的页签数量
+TARGET_RATE = 5  # 目标速率(行/分钟，所有页签合计)，响应正常时逐步提速
+MAX_RATE = 12  # 速率上限(行/分钟)；遇到超时/429/403/验证码时速率减半并暂停冷却
+HYBRID = False  # 改为True时启用混合模式：登录后导出Cookie，先用HTTP抓取介绍页，被拦截或找不到introduce的行再交给浏览器页签（默认关闭，先用少量行确认HTTP能取到介绍后再开启）
+HTTP_CONCURRENCY = 4  # 混合模式的HTTP并发请求数
+HTTP_TARGET_RATE = 20  # 混合模式HTTP请求的目标速率(行/分钟)
+HTTP_MAX_RATE = 60  # 混合模式HTTP请求的速率上限(行/分钟)
 
 def is_valid_url(url):
     """检查URL是否以http开头"""
@@ -50,67 +66,152 @@ def get_hyperlinks_from_excel(excel_file):
     wb.close()
     return hyperlinks
 
-def save_progress(df, excel_file):
-    """保存当前进度到Excel文件"""
+def save_progress(journal, df, row_idx):
+    """把一行的第五列写入旁路日志（DataFrame索引 -> Excel行号，跳过表头）"""
     try:
-        df.to_excel(excel_file, index=False)
-        print(f"\n已保存当前进度到 {excel_file}")
+        journal.set(row_idx + 2, 5, df.iloc[row_idx, 4])
+        print(f"\n已保存第{row_idx+1}行进度到 {journal.journal_path}")
     except Exception as e:
         print(f"\n保存进度时出错: {str(e)}")
+        raise  # 未写入日志的行不能在状态库中记为完成
 
-def find_introduce_element(page):
+async def find_introduce_element(page):
     """多种方式查找introduce元素"""
     # 方法1: 直接查找class
     locator = page.locator(".introduce")
-    if locator.count() > 0:
+    if await locator.count() > 0:
         return locator
     
     # 方法2: 查找包含该class的任何标签（可能有嵌套）
     locator = page.locator("*[class*='introduce']")
-    if locator.count() > 0:
+    if await locator.count() > 0:
         return locator
     
     # 方法3: 等待并尝试滚动到元素
     try:
         # 先滚动到页面底部触发可能的懒加载
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(1)
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        await asyncio.sleep(1)
         # 再滚动到顶部
-        page.evaluate("window.scrollTo(0, 0)")
-        time.sleep(1)
+        await page.evaluate("window.scrollTo(0, 0)")
+        await asyncio.sleep(1)
         
         # 再次尝试查找
         locator = page.locator(".introduce")
-        if locator.count() > 0:
+        if await locator.count() > 0:
             # 滚动到元素可见
-            locator.scroll_into_view_if_needed()
-            time.sleep(0.5)
+            await locator.scroll_into_view_if_needed()
+            await asyncio.sleep(0.5)
             return locator
     except:
         pass
     
     return None
 
-def process_links_from_excel(excel_file):
+async def fetch_introduce(page, job):
+    """单行链接的导航和提取：返回introduce内容"""
+    i, url = job
+    print(f"\n处理第{i+1}行链接: {url}")
+    content = ""
+    try:
+        await page.goto(url, timeout=30000)
+        await page.wait_for_load_state("load", timeout=30000)
+        await asyncio.sleep(2)  # 额外等待2秒
+        
+        locator = await find_introduce_element(page)
+        if locator:
+            content = await locator.inner_text()
+            print(f"第{i+1}行内容预览:\n{content[:200]}...\n")
+        else:
+            await raise_if_blocked(page, "chanmama")
+            print(f"第{i+1}行未找到class为'introduce'的元素")
+    
+    except PlaywrightTimeoutError:
+        # 超时交给引擎处理：限速器据此降速，结果由 timeout_result 生成
+        print(f"第{i+1}行页面加载超时")
+        raise
+    except BlockedError:
+        raise
+    except Exception as e:
+        print(f"第{i+1}行处理时出错: {str(e)}")
+        content = f"错误: {str(e)}"
+    
+    await asyncio.sleep(random.uniform(1, 3))
+    return content
+
+def parse_introduce(html, job):
+    """混合模式：从HTTP返回的HTML中提取introduce内容，找不到时返回None（交给浏览器）"""
+    i, _ = job
+    content = extract_class_text(html, "introduce")
+    if content:
+        print(f"第{i+1}行内容预览（HTTP）:\n{content[:200]}...\n")
+    return content or None
+
+def timeout_result(job, e):
+    """页面加载超时时写入的结果"""
+    return "错误: 页面加载超时" if isinstance(e, PlaywrightTimeoutError) else f"错误: {str(e)}"
+
+def load_sheet(excel_file):
+    """合并遗留的旁路日志后读取表格和超链接，返回 (journal, df, actual_urls)"""
+    # 上次运行中断时遗留的旁路日志先合并回Excel
+    journal = CellJournal(excel_file)
+    journal.merge()
+    
     # 读取Excel文件
     df = pd.read_excel(excel_file)
     actual_urls = get_hyperlinks_from_excel(excel_file)
     actual_urls = [url for url in actual_urls if url is not None]
+    return journal, df, actual_urls
+
+def collect_pending_rows(df, actual_urls, done_rows, start=1):
+    """收集未完成的待处理链接 [(行索引, URL), ...]"""
+    jobs = []
+    for i in range(start, len(actual_urls)):
+        # 跳过无效URL
+        if not is_valid_url(actual_urls[i]):
+            print(f"\n第{i+1}行URL无效，跳过")
+            continue
+        
+        # 跳过已处理的行（状态库中已完成，或第五列已有内容）
+        if str(i) in done_rows:
+            continue
+        if df.shape[1] > 4 and pd.notna(df.iloc[i, 4]) and str(df.iloc[i, 4]).strip() != "":
+            print(f"\n第{i+1}行已处理，跳过")
+            continue
+        
+        jobs.append((i, actual_urls[i]))
+    return jobs
+
+def create_engine(store=None, vault=None):
+    """创建爬取引擎（所有页签共用一个上下文，登录一次即可；保管库中有登录态时直接复用）"""
+    vault = vault or SessionVault()
+    return CrawlEngine(
+        fetch_introduce,
+        tab_count=TAB_COUNT,
+        shared_context=True,
+        rate_limiter=AdaptiveRateLimiter(TARGET_RATE, MAX_RATE, name="chanmama"),
+        on_error=timeout_result,
+        block_site="chanmama",
+        on_block=vault.expiry_watcher("chanmama"),
+        storage_state=vault.load("chanmama"),
+        store=store,
+        site="chan",
+        job_key=lambda job: str(job[0]),  # 以行号作为任务key
+    )
+
+async def process_links_from_excel(excel_file):
+    journal, df, actual_urls = load_sheet(excel_file)
     
     if not actual_urls:
         print("Excel文件中没有有效的超链接")
         return
     
-    # 让用户输入起始行（从1开始）
-    try:
-        start_row = input(f"请输入起始行（1-{len(df)}）: ").strip()
-        start_row = int(start_row) - 1  # 转换为0-based索引
-        if start_row < 0 or start_row >= len(df):
-            print(f"无效的起始行，将从第1行开始")
-            start_row = 0
-    except ValueError:
-        print("输入无效，将从第1行开始")
-        start_row = 0
+    # 断点续爬：从状态库读取已完成的行，无需手动输入起始行
+    store = StateStore()
+    store.before_commit(journal.flush)
+    done_rows = store.done_keys("chan")
+    if done_rows:
+        print(f"状态库中已完成 {len(done_rows)} 行，本次跳过")
     
     # 显示提取到的URL供检查
     print("\n提取到的URL列表（前5个）:")
@@ -123,6 +224,7 @@ def process_links_from_excel(excel_file):
     confirm = input("\n这些URL看起来正确吗？(y/n): ").strip().lower()
     if confirm != 'y':
         print("请检查Excel文件中的超链接格式")
+        store.close()
         return
     
     # 确保有第五列
@@ -130,6 +232,7 @@ def process_links_from_excel(excel_file):
         for i in range(df.shape[1], 5):
             df[f"Unnamed: {i}"] = ""
         df = df.rename(columns={df.columns[4]: "Content"})
+        journal.set(1, 5, "Content")
     
     # 查找第一个有效的URL（用于登录）
     valid_index = 0
@@ -137,93 +240,131 @@ def process_links_from_excel(excel_file):
         valid_index += 1
     if valid_index >= len(actual_urls):
         print("未找到有效的URL")
+        store.close()
         return
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context()
-        page = context.new_page()
+    def on_result(job, content):
+        i, _ = job
+        df.iloc[i, 4] = content
+        save_progress(journal, df, i)  # 每处理一行就保存一次
+    
+    vault = SessionVault()
+    engine = create_engine(store, vault)
+    try:
+        await engine.start()
+        page = engine.pages[0]
         
-        try:
-            # 处理第一个链接（登录用）
-            first_url = actual_urls[valid_index]
-            print(f"\n打开登录链接: {first_url}")
-            page.goto(first_url)
+        # 处理第一个链接（没有可用登录态时在此登录并保存）
+        first_url = actual_urls[valid_index]
+        print(f"\n打开第一个链接: {first_url}")
+        await page.goto(first_url)
+        if not vault.status("chanmama")[0]:
             input("请在浏览器中完成登录，登录完成后按Enter继续...")
+            await vault.save(engine.contexts[0], "chanmama")
+        
+        # 第1行尚未完成时，直接处理登录页面的内容
+        if "0" not in done_rows:
+            content = ""
+            # 增加等待时间并使用增强的查找方法
+            await page.wait_for_load_state("load", timeout=30000)
+            await asyncio.sleep(2)  # 额外等待2秒
             
-            # 如果起始行是0，处理第一个页面内容
-            if start_row == 0:
-                content = ""
-                # 增加等待时间并使用增强的查找方法
-                page.wait_for_load_state("load", timeout=30000)
-                time.sleep(2)  # 额外等待2秒
-                
-                locator = find_introduce_element(page)
+            locator = await find_introduce_element(page)
+            if locator:
+                content = await locator.inner_text()
+                print(f"\n第1行内容预览:\n{content[:200]}...\n")
+            else:
+                print("第1行页面中未找到class为'introduce'的元素，尝试手动检查...")
+                # 给用户时间手动确认
+                input("请确认页面中是否有introduce元素，确认后按Enter继续...")
+                # 再次尝试
+                locator = await find_introduce_element(page)
                 if locator:
-                    content = locator.inner_text()
-                    print(f"\n第1行内容预览:\n{content[:200]}...\n")
-                else:
-                    print("第1行页面中未找到class为'introduce'的元素，尝试手动检查...")
-                    # 给用户时间手动确认
-                    input("请确认页面中是否有introduce元素，确认后按Enter继续...")
-                    # 再次尝试
-                    locator = find_introduce_element(page)
-                    if locator:
-                        content = locator.inner_text()
-                        print(f"找到元素，内容预览:\n{content[:200]}...\n")
-                
-                df.iloc[0, 4] = content
-                save_progress(df, excel_file)  # 保存第一行结果
+                    content = await locator.inner_text()
+                    print(f"找到元素，内容预览:\n{content[:200]}...\n")
             
-            # 处理从起始行开始的链接
-            for i in range(start_row, len(actual_urls)):
-                # 跳过无效URL
-                if not is_valid_url(actual_urls[i]):
-                    print(f"\n第{i+1}行URL无效，跳过")
-                    continue
-                
-                # 跳过已处理的行（如果第五列已有内容）
-                if pd.notna(df.iloc[i, 4]) and str(df.iloc[i, 4]).strip() != "":
-                    print(f"\n第{i+1}行已处理，跳过")
-                    continue
-                
-                print(f"\n处理第{i+1}行链接: {actual_urls[i]}")
-                new_page = context.new_page()
-                content = ""
-                try:
-                    new_page.goto(actual_urls[i], timeout=30000)
-                    new_page.wait_for_load_state("load", timeout=30000)
-                    time.sleep(2)  # 额外等待2秒
-                    
-                    locator = find_introduce_element(new_page)
-                    if locator:
-                        content = locator.inner_text()
-                        print(f"内容预览:\n{content[:200]}...\n")
-                    else:
-                        print("未找到class为'introduce'的元素")
-                
-                except PlaywrightTimeoutError:
-                    print("页面加载超时")
-                    content = "错误: 页面加载超时"
-                except Exception as e:
-                    print(f"处理时出错: {str(e)}")
-                    content = f"错误: {str(e)}"
-                finally:
-                    df.iloc[i, 4] = content
-                    time.sleep(random.uniform(1, 3))
-                    new_page.close()
-                    save_progress(df, excel_file)  # 每处理一行就保存一次
-                
-                time.sleep(random.uniform(10, 40))
-            
-            print("\n所有指定行处理完成")
+            df.iloc[0, 4] = content
+            save_progress(journal, df, 0)  # 保存第一行结果
+            store.mark_done("chan", 0, content)
+        
+        # 收集未完成的待处理链接，多页签并发处理
+        jobs = collect_pending_rows(df, actual_urls, done_rows)
+        if HYBRID:
+            hybrid = HybridFetcher(
+                "chanmama",
+                concurrency=HTTP_CONCURRENCY,
+                rate_limiter=AdaptiveRateLimiter(HTTP_TARGET_RATE, HTTP_MAX_RATE, name="chanmama-http"),
+            )
+            try:
+                await hybrid.run(engine, jobs, lambda job: job[1], parse_introduce, on_result=on_result)
+            finally:
+                hybrid.close()
+        else:
+            await engine.run(jobs, on_result=on_result)
         
-        except Exception as e:
-            print(f"\n发生错误: {str(e)}")
-            save_progress(df, excel_file)  # 出错时保存当前进度
-        finally:
-            browser.close()
-            print(f"\n最终结果已保存到 {excel_file}")
+        print("\n所有指定行处理完成")
+    
+    except Exception as e:
+        print(f"\n发生错误: {str(e)}")
+        journal.flush()  # 出错时保存当前进度
+    finally:
+        await engine.stop()
+        journal.merge()  # 一次性合并进Excel
+        store.close()
+        print(f"\n最终结果已保存到 {excel_file}")
+
+async def run_as_worker(client):
+    """工作模式：用领到的第一个链接登录，然后从协调服务领取链接爬取并提交结果"""
+    async def login(jobs):
+        _, first_url = jobs[0]
+        await login_once(
+            vault, "chanmama", engine.contexts[0], engine.pages[0], first_url,
+            "请在浏览器中完成登录，登录完成后按Enter继续...",
+        )
+    
+    vault = SessionVault()
+    engine = create_engine(vault=vault)
+    try:
+        await run_worker(
+            engine,
+            client,
+            "chan",
+            to_job=lambda job: (int(job["key"]), job["data"]),
+            job_key=lambda job: str(job[0]),
+            is_failure=lambda content: str(content).startswith("错误"),
+            on_first_batch=login,
+        )
+    finally:
+        await engine.stop()
+
+def run_distributed(mode, url, excel_file):
+    """多机模式：enqueue 提交待处理的超链接，worker 领取并爬取，collect 把结果写回第五列"""
+    client = CoordinatorClient(url)
+    if mode == "worker":
+        asyncio.run(run_as_worker(client))
+        return
+    
+    journal, df, actual_urls = load_sheet(excel_file)
+    store = StateStore()
+    store.before_commit(journal.flush)
+    try:
+        if mode == "enqueue":
+            jobs = collect_pending_rows(df, actual_urls, store.done_keys("chan"), start=0)
+            added = client.enqueue("chan", [{"key": str(i), "data": link} for i, link in jobs])
+            print(f"已提交 {added} 个链接到协调服务 {url}")
+        elif mode == "collect":
+            # DataFrame索引 -> Excel行号
+            collected = collect_results(client, "chan", store, lambda key, content: journal.set(int(key) + 2, 5, content))
+            journal.merge()
+            print(f"已从协调服务取回 {collected} 行内容")
+        else:
+            print(f"未知模式：{mode}（可选 enqueue / worker / collect）")
+    finally:
+        store.close()
 
 if __name__ == "__main__":
-    process_links_from_excel("chan.xlsx")
\ No newline at end of file
+    if len(sys.argv) > 2:
+        # 多机模式：python chan.py enqueue|worker|collect http://协调服务地址:8765
+        run_distributed(sys.argv[1], sys.argv[2], "chan.xlsx")
+    else:
+        asyncio.run(process_links_from_excel("chan.xlsx"))
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""爬取任务协调服务
+
+多台机器上的爬虫共用同一个任务队列：协调服务通过本地 HTTP 接口分发带租约的任务
+（zhipin 公司ID、抖音主页链接、chan.xlsx 中的超链接等），并收集结果写入状态库。
+工作进程在租约到期前没有提交结果（机器宕机、脚本退出）时，任务会自动回到队列。
+
+接口（请求和响应均为 JSON）：
+    POST /enqueue   {"queue", "jobs": [{"key", "data"}, ...]}  -> {"added"}
+    POST /lease     {"queue", "worker", "count"}                -> {"jobs", "remaining"}
+    POST /complete  {"queue", "worker", "key", "result"}        -> {"ok"}
+    POST /fail      {"queue", "worker", "key", "error"}         -> {"ok", "requeued"}
+    GET  /status?queue=...                                      -> 各状态任务数
+    GET  /results?queue=...                                     -> {"results": [[key, result], ...]}
+
+用法：python coordinator.py [端口] [监听地址] [状态库]，默认 127.0.0.1:8765、coordinator_state.db
+
+协调服务使用独立的状态库：各脚本 collect 时按本机状态库（crawl_state.db）判断结果是否已写入输出文件，
+两者共用一个文件时协调服务收到的结果都会被当成已写入而跳过。
+
+待分发队列和租约只保存在内存中，状态库只记录结果和失败：协调服务重启后未完成的任务需要重新 enqueue
+（再次运行各脚本的 enqueue 命令即可，状态库中已完成的任务会被跳过）。
+"""
+import json
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from state_store import StateStore
+
+DEFAULT_PORT = 8765
+COORDINATOR_DB = "coordinator_state.db"  # 协调服务的状态库，不能与脚本的 crawl_state.db 共用
+LEASE_SECONDS = 900  # 租约时长(秒)，超时未提交的任务重新入队
+MAX_ATTEMPTS = 3  # 单个任务最多分发次数（工作进程报告失败或租约过期都计一次）
+
+
+class Coordinator:
+    """内存中的任务队列 + 租约表，结果持久化到状态库"""
+
+    def __init__(self, store, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.store = store
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.pending = {}  # queue -> deque[(key, data)]
+        self.leases = {}  # queue -> {key: (worker, deadline, data)}
+        self.attempts = {}  # (queue, key) -> 已分发次数
+
+    def enqueue(self, queue, jobs):
+        """登记任务；状态库中已完成或已在队列/租约中的任务会被忽略"""
+        with self.lock:
+            pending = self.pending.setdefault(queue, deque())
+            leases = self.leases.setdefault(queue, {})
+            known = {key for key, _ in pending} | set(leases) | self.store.done_keys(queue)
+            added = 0
+            for job in jobs:
+                key = str(job["key"])
+                if key in known:
+                    continue
+                pending.append((key, job.get("data")))
+                known.add(key)
+                added += 1
+            return added
+
+    def lease(self, queue, worker, count):
+        """为工作进程分配最多 count 个任务"""
+        with self.lock:
+            self._requeue_expired(queue)
+            pending = self.pending.setdefault(queue, deque())
+            leases = self.leases.setdefault(queue, {})
+            deadline = time.time() + self.lease_seconds
+            jobs = []
+            while pending and len(jobs) < count:
+                key, data = pending.popleft()
+                leases[key] = (worker, deadline, data)
+                self.attempts[(queue, key)] = self.attempts.get((queue, key), 0) + 1
+                jobs.append({"key": key, "data": data})
+            return jobs, len(pending) + len(leases)
+
+    def complete(self, queue, worker, key, result):
+        """提交结果；租约已过期并被重新分配时也接受（以先到的结果为准），返回结果是否被采用
+
+        只释放该工作进程自己的租约：重新分配给其他工作进程的租约保留到对方提交或过期
+        """
+        with self.lock:
+            self._release(queue, worker, key)
+            if self.store.is_done(queue, key):
+                return False
+            self._discard_pending(queue, key)
+            self.store.mark_done(queue, key, result)
+            self.store.commit()
+            return True
+
+    def fail(self, queue, worker, key, error):
+        """报告失败：未达分发上限时放回队尾，否则记为失败；返回任务是否重新入队
+
+        租约已不属于该工作进程（过期后重新入队或分配给了其他工作进程）时，报告已过时，直接忽略
+        """
+        with self.lock:
+            lease = self._release(queue, worker, key)
+            if lease is None or self.store.is_done(queue, key):
+                print(f"[{queue}] 忽略工作进程 {worker} 对任务 {key} 的过时失败报告")
+                return False
+            self.store.mark_failed(queue, key, error)
+            self.store.commit()
+            if self.attempts.get((queue, key), 0) < self.max_attempts:
+                self.pending.setdefault(queue, deque()).append((key, lease[2]))
+                return True
+            return False
+
+    def status(self, queue):
+        """返回队列各状态的任务数"""
+        with self.lock:
+            self._requeue_expired(queue)
+            summary = self.store.summary(queue)
+            return {
+                "pending": len(self.pending.get(queue, ())),
+                "leased": len(self.leases.get(queue, {})),
+                "done": summary.get("done", 0),
+                "failed": summary.get("failed", 0),
+            }
+
+    def results(self, queue):
+        """返回已完成任务的结果"""
+        with self.lock:
+            return self.store.results(queue)
+
+    def _release(self, queue, worker, key):
+        """移除并返回 worker 持有的租约，租约不存在或属于其他工作进程时返回 None（调用方已持有锁）"""
+        leases = self.leases.get(queue, {})
+        lease = leases.get(key)
+        if lease is None or lease[0] != worker:
+            return None
+        return leases.pop(key)
+
+    def _requeue_expired(self, queue):
+        """租约过期的任务重新入队（调用方已持有锁）"""
+        now = time.time()
+        leases = self.leases.get(queue, {})
+        for key, (worker, deadline, data) in list(leases.items()):
+            if deadline > now:
+                continue
+            del leases[key]
+            if self.store.is_done(queue, key):
+                continue  # 其他工作进程已经提交了结果
+            print(f"[{queue}] 工作进程 {worker} 的任务 {key} 租约过期")
+            if self.attempts.get((queue, key), 0) < self.max_attempts:
+                self.pending.setdefault(queue, deque()).append((key, data))
+            else:
+                self.store.mark_failed(queue, key, f"租约过期（工作进程 {worker}）")
+
+    def _discard_pending(self, queue, key):
+        """从待分发队列中移除任务（调用方已持有锁）"""
+        pending = self.pending.get(queue)
+        if pending and any(k == key for k, _ in pending):
+            self.pending[queue] = deque((k, d) for k, d in pending if k != key)
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    """把 HTTP 请求转发给 Coordinator"""
+
+    coordinator = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        queue = parse_qs(url.query).get("queue", [""])[0]
+        if url.path == "/status":
+            self._send(self.coordinator.status(queue))
+        elif url.path == "/results":
+            self._send({"results": self.coordinator.results(queue)})
+        else:
+            self._send({"error": "not found"}, 404)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send({"error": "invalid json"}, 400)
+            return
+
+        c = self.coordinator
+        queue = body.get("queue", "")
+        if self.path == "/enqueue":
+            self._send({"added": c.enqueue(queue, body.get("jobs", []))})
+        elif self.path == "/lease":
+            jobs, remaining = c.lease(queue, body.get("worker", "?"), int(body.get("count", 1)))
+            self._send({"jobs": jobs, "remaining": remaining})
+        elif self.path == "/complete":
+            self._send({"ok": c.complete(queue, body.get("worker", "?"), str(body["key"]), body.get("result"))})
+        elif self.path == "/fail":
+            requeued = c.fail(queue, body.get("worker", "?"), str(body["key"]), body.get("error", ""))
+            self._send({"ok": True, "requeued": requeued})
+        else:
+            self._send({"error": "not found"}, 404)
+
+    def _send(self, data, code=200):
+        payload = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # 不逐条打印请求日志
+        pass
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, db_path=COORDINATOR_DB):
+    """启动协调服务（阻塞）"""
+    store = StateStore(db_path)
+    CoordinatorHandler.coordinator = Coordinator(store)
+    server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+    print(f"协调服务已启动：http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n协调服务已停止")
+    finally:
+        server.server_close()
+        store.close()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    host = sys.argv[2] if len(sys.argv) > 2 else "127.0.0.1"
+    db_path = sys.argv[3] if len(sys.argv) > 3 else COORDINATOR_DB
+    serve(host, port, db_path)
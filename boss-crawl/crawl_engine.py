@@ -0,0 +1,443 @@
+"""通用异步爬取引擎
+
+由 boss.py 原来的 tab_worker 模式抽取而来：引擎负责启动浏览器、维护上下文/页签池，
+并把任务放进队列分发给各个页签；站点脚本只需要提供 handler(page, job) 这个
+"导航 + 提取" 协程，就能获得 N 路并发以及统一的节奏控制和重试逻辑。
+"""
+import asyncio
+import random
+from playwright.async_api import async_playwright
+from block_detector import BlockedError, check_page
+
+
+class CrawlEngine:
+    """浏览器上下文/页签池 + 任务队列"""
+
+    def __init__(
+        self,
+        handler,
+        tab_count=5,
+        shared_context=False,
+        user_agents=None,
+        warmup_url=None,
+        delay_range=(0, 0),
+        refresh_every=0,
+        refresh_url=None,
+        rest_every=0,
+        rest_range=(0, 0),
+        max_retries=0,
+        retry_backoff=0,
+        on_error=None,
+        store=None,
+        site=None,
+        job_key=str,
+        resource_policy=None,
+        rate_limiter=None,
+        block_site=None,
+        quarantine_seconds=300,
+        max_blocks=3,
+        on_block=None,
+        storage_state=None,
+        session_pool=None,
+        headless=False,
+        slow_mo=0,
+        launch_args=None,
+        default_timeout=None,
+    ):
+        """
+        handler: async def handler(page, job) -> result，负责单个任务的导航和提取
+        tab_count: 并行页签数量
+        shared_context: True 时所有页签共用一个上下文（共享登录态），否则每个页签独立上下文
+        user_agents: 每个上下文随机选择的 User-Agent 列表
+        warmup_url: 页签创建后先访问的预热页面
+        delay_range: 每个页签处理完一个任务后的随机等待时间范围(秒)
+        refresh_every / refresh_url: 每处理 N 个任务回到 refresh_url 刷新一次（反反爬）
+        rest_every / rest_range: 每个页签每处理 N 个任务单独休息一次，其他页签不受影响
+        max_retries: 单个任务失败后重新入队的最大次数
+        retry_backoff: 重试退避基数(秒)，第 n 次重试在 retry_backoff * 2**(n-1) 秒后放回队尾
+        on_error: def on_error(job, exc) -> result，任务最终失败时用于生成结果
+        store / site / job_key: 传入 StateStore 时，每次尝试的结果都以 (site, job_key(job)) 记录到状态库
+        resource_policy: ResourcePolicy，启用后每个上下文都会拦截图片/媒体/字体等无用资源
+        rate_limiter: AdaptiveRateLimiter，所有页签共用；每个任务开始前取令牌，按任务结果和页面状态码调整速率
+        block_site: block_detector 中的站点名；任务失败时检测验证码/登录墙，命中后隔离页签并把任务放回队列
+        quarantine_seconds: 被拦截页签的隔离时间(秒)；独立上下文的页签隔离后换用全新的上下文
+        max_blocks: 单个任务最多因拦截重新排队的次数（不计入 max_retries），超过后按普通失败处理
+        on_block: def on_block(reason)，页签被拦截时回调（例如遇到登录墙时把保存的登录态标记为失效）
+        storage_state: 登录态文件路径或字典（SessionVault.load 的返回值），每个新上下文都从该登录态启动
+        session_pool: SessionPool，启用后每个账号一个上下文（页签按需创建，每个账号最多 tab_count 个），
+            tab_count 路并发中的每个任务都交给剩余预算最多的账号；被拦截时只暂停该账号，不隔离页签
+        """
+        self.handler = handler
+        self.tab_count = tab_count
+        self.shared_context = shared_context
+        self.user_agents = user_agents
+        self.warmup_url = warmup_url
+        self.delay_range = delay_range
+        self.refresh_every = refresh_every
+        self.refresh_url = refresh_url
+        self.rest_every = rest_every
+        self.rest_range = rest_range
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.on_error = on_error
+        self.store = store
+        self.site = site
+        self.job_key = job_key
+        self.resource_policy = resource_policy
+        self.rate_limiter = rate_limiter
+        self.block_site = block_site
+        self.quarantine_seconds = quarantine_seconds
+        self.max_blocks = max_blocks
+        self.on_block = on_block
+        self.storage_state = storage_state
+        self.session_pool = session_pool
+        self.headless = headless
+        self.slow_mo = slow_mo
+        self.launch_args = launch_args or ["--disable-blink-features=AutomationControlled"]
+        self.default_timeout = default_timeout
+
+        self._playwright = None
+        self.browser = None
+        self.contexts = []
+        self.pages = []
+        self.attempts = {}  # 任务 -> 已尝试次数
+        self.blocks = {}  # 任务 -> 因拦截重新排队的次数
+        self._accounts = {}  # 账号 -> {"context", "idle": 空闲页签队列, "pages": 已创建页签数}
+        self._retry_tasks = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def start(self):
+        """启动浏览器并创建页签池（已启动时直接返回）"""
+        if self.browser:
+            return
+
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(
+            headless=self.headless, slow_mo=self.slow_mo, args=self.launch_args
+        )
+
+        if self.session_pool:
+            # 账号池模式：上下文和页签在任务分配到账号时按需创建
+            print(f"浏览器已启动，账号池共 {len(self.session_pool)} 个账号")
+            return
+
+        context = None
+        for i in range(self.tab_count):
+            if context is None or not self.shared_context:
+                context = await self._new_context()
+            self.pages.append(await self._new_page(context, i + 1))
+
+        print(f"浏览器已启动，共 {len(self.pages)} 个页签")
+
+    async def _new_page(self, context, tab_id):
+        """在上下文中创建页签，设置超时并预热"""
+        page = await context.new_page()
+        if self.default_timeout:
+            page.set_default_timeout(self.default_timeout)
+        if self.warmup_url:
+            try:
+                await page.goto(self.warmup_url, wait_until="domcontentloaded")
+            except Exception as e:
+                print(f"页签 {tab_id} 预热失败：{str(e)[:30]}")
+        return page
+
+    async def _new_context(self, storage_state=None):
+        """创建新的浏览器上下文（storage_state 为空时使用引擎的登录态）"""
+        options = {}
+        if self.user_agents:
+            options["user_agent"] = random.choice(self.user_agents)
+        storage_state = storage_state or self.storage_state
+        if storage_state:
+            options["storage_state"] = storage_state
+        context = await self.browser.new_context(**options)
+        if self.resource_policy:
+            await self.resource_policy.install(context)
+        if self.rate_limiter:
+            context.on("response", self._check_status)
+        self.contexts.append(context)
+        return context
+
+    def _check_status(self, response):
+        """页面主文档返回 429/403 时通知限速器降速"""
+        if response.status in (429, 403) and response.request.resource_type == "document":
+            self.rate_limiter.failure(str(response.status))
+
+    async def stop(self):
+        """关闭所有页签、上下文和浏览器"""
+        for context in self.contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        if self.browser:
+            await self.browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+        if self.resource_policy:
+            self.resource_policy.report()
+        if self.rate_limiter:
+            self.rate_limiter.report()
+        if self.session_pool:
+            self.session_pool.report()
+
+        self.contexts = []
+        self.pages = []
+        self._accounts = {}
+        self.browser = None
+        self._playwright = None
+
+    async def run(self, jobs, on_result=None):
+        """把任务放入队列，由所有页签并发处理
+
+        on_result: def on_result(job, result)，每完成一个任务立即回调（可用于实时保存）
+        返回 [(job, result), ...]，顺序为完成顺序
+        """
+        await self.start()
+
+        queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait((job, 0))
+
+        results = []
+        if self.session_pool:
+            tasks = [
+                asyncio.create_task(self._pool_worker(i + 1, queue, results, on_result))
+                for i in range(self.tab_count)
+            ]
+        else:
+            tasks = [
+                asyncio.create_task(self._tab_worker(page, i + 1, queue, results, on_result))
+                for i, page in enumerate(self.pages)
+            ]
+
+        # 等待队列中所有任务处理完毕；仍有退避中的重试时，等它们回到队列后继续
+        while True:
+            await queue.join()
+            if not self._retry_tasks:
+                break
+            await asyncio.gather(*list(self._retry_tasks))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.store:
+            self.store.commit()
+
+        return results
+
+    async def _tab_worker(self, page, tab_id, queue, results, on_result):
+        """单个页签的工作循环：不断从队列取任务，直到被取消"""
+        done = 0
+        while True:
+            job, attempt = await queue.get()
+            try:
+                if page is None or page.is_closed():
+                    # 上次隔离时重建失败，或页签在上一轮 run 中被关闭
+                    page = await self._replace_page(tab_id)
+                blocked = await self._handle_job(page, tab_id, queue, job, attempt, results, on_result)
+            except Exception as e:
+                # 页签无法重建：任务按最终失败处理，保证队列总能处理完，下个任务再尝试重建
+                page = None
+                blocked = None
+                self._finish_job(tab_id, job, e, results, on_result)
+            finally:
+                queue.task_done()
+            if blocked:
+                try:
+                    page = await self._quarantine(page, tab_id, blocked)
+                except Exception as e:
+                    print(f"页签 {tab_id} 重建上下文失败：{str(e)[:30]}")
+                    page = None
+                continue
+            done += 1
+
+            # 每处理refresh_every个任务，回到刷新页（反反爬）
+            if self.refresh_every and self.refresh_url and done % self.refresh_every == 0:
+                try:
+                    await page.goto(self.refresh_url, wait_until="domcontentloaded")
+                    await asyncio.sleep(random.uniform(1, 2))
+                except Exception as e:
+                    print(f"页签 {tab_id} 刷新失败：{str(e)[:30]}")
+
+            if self.delay_range[1] > 0:
+                await asyncio.sleep(random.uniform(*self.delay_range))
+
+            # 按页签独立休息，不阻塞其他页签
+            if self.rest_every and done % self.rest_every == 0 and not queue.empty():
+                rest_time = random.uniform(*self.rest_range)
+                print(f"页签 {tab_id} 已处理 {done} 个任务，休息 {int(rest_time)//60}分{int(rest_time)%60}秒...")
+                await asyncio.sleep(rest_time)
+
+    async def _pool_worker(self, worker_id, queue, results, on_result):
+        """账号池模式的工作循环：每个任务交给剩余预算最多的账号，用该账号上下文中的空闲页签处理"""
+        while True:
+            job, attempt = await queue.get()
+            try:
+                account = await self._choose_account()
+                if account is None:
+                    self._finish_job(worker_id, job, RuntimeError("账号池中没有可用账号"), results, on_result)
+                    continue
+                page = await self._checkout_page(account, worker_id)
+                self.session_pool.record_request(account)
+                try:
+                    blocked = await self._handle_job(page, worker_id, queue, job, attempt, results, on_result, account)
+                finally:
+                    self._accounts[account]["idle"].put_nowait(page)
+                if blocked:
+                    # 账号池自行处理登录态失效（不调用 on_block），其他账号继续处理队列
+                    if self.rate_limiter:
+                        self.rate_limiter.failure(blocked)
+                    print(f"账号 {account} 被拦截（{blocked}：{page.url[:60]}），任务已放回队列")
+                    self.session_pool.block(account, blocked, self.quarantine_seconds)
+                    continue
+            finally:
+                queue.task_done()
+
+            if self.delay_range[1] > 0:
+                await asyncio.sleep(random.uniform(*self.delay_range))
+
+    async def _choose_account(self):
+        """等待直到有账号还有剩余预算；所有账号都已失效时返回 None"""
+        while True:
+            account, wait = self.session_pool.choose()
+            if account or wait is None:
+                return account
+            print(f"所有账号预算已用完或暂停中，{wait:.0f}秒后重试")
+            await asyncio.sleep(wait)
+
+    async def _checkout_page(self, account, worker_id):
+        """取出账号上下文中的空闲页签；没有空闲页签且未达上限时新建"""
+        slot = self._accounts.get(account)
+        if slot is None:
+            # 上下文以任务形式创建，多个页签同时选中同一账号时只创建一次
+            context = asyncio.create_task(self._new_context(self.session_pool.storage_state(account)))
+            slot = self._accounts[account] = {"context": context, "idle": asyncio.Queue(), "pages": 0}
+        if slot["idle"].empty() and slot["pages"] < self.tab_count:
+            slot["pages"] += 1
+            page = await self._new_page(await slot["context"], worker_id)
+            self.pages.append(page)
+            return page
+        return await slot["idle"].get()
+
+    def _finish_job(self, tab_id, job, error, results, on_result):
+        """任务无法执行（没有可用账号、页签无法重建）：按最终失败处理"""
+        print(f"页签 {tab_id} 任务 {job} 失败：{str(error)[:30]}")
+        if self.store:
+            self.store.mark_failed(self.site, self.job_key(job), error)
+        self._emit_result(tab_id, job, self.on_error(job, error) if self.on_error else None, results, on_result)
+
+    def _emit_result(self, tab_id, job, result, results, on_result):
+        """收集任务结果并回调 on_result，返回结果是否已保存（on_result 未出错）"""
+        results.append((job, result))
+        if on_result:
+            try:
+                on_result(job, result)
+            except Exception as e:
+                print(f"页签 {tab_id} 保存任务 {job} 结果出错：{str(e)[:30]}")
+                return False
+        return True
+
+    async def _handle_job(self, page, tab_id, queue, job, attempt, results, on_result, account=None):
+        """执行单个任务；失败且未超过重试次数时按指数退避放回队尾
+
+        页面被拦截时任务立即放回队列（不计入尝试次数），返回拦截类型，由页签进入隔离
+        account: 账号池模式下处理该任务的账号，失败时计入该账号的出错率
+        """
+        self.attempts[job] = attempt + 1
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        error = None
+        try:
+            result = await self.handler(page, job)
+        except Exception as e:
+            result, error = None, e
+
+        blocked = error.reason if isinstance(error, BlockedError) else None
+        if not blocked and result is None and self.block_site:
+            blocked = await check_page(page, self.block_site)
+        if blocked and self.blocks.get(job, 0) < self.max_blocks:
+            self.blocks[job] = self.blocks.get(job, 0) + 1
+            self.attempts[job] = attempt
+            queue.put_nowait((job, attempt))
+            return blocked
+
+        if error is not None:
+            reason = "timeout" if "Timeout" in type(error).__name__ else "error"
+            if self.rate_limiter:
+                self.rate_limiter.failure(reason)
+            if account:
+                self.session_pool.record_error(account, reason)
+            if self.store:
+                self.store.mark_failed(self.site, self.job_key(job), error)
+            if attempt < self.max_retries:
+                delay = self.retry_backoff * 2 ** attempt
+                print(f"页签 {tab_id} 任务 {job} 失败（第{attempt+1}次），{delay:.0f}秒后重新入队：{str(error)[:30]}")
+                self._schedule_retry(queue, job, attempt + 1, delay)
+                return
+            print(f"页签 {tab_id} 任务 {job} 失败（共尝试{attempt+1}次）：{str(error)[:30]}")
+            result = self.on_error(job, error) if self.on_error else None
+        else:
+            if self.rate_limiter and result is not None:
+                self.rate_limiter.success()
+            if account and result is None:
+                self.session_pool.record_error(account, "无结果")
+            if self.store and result is None:
+                self.store.mark_failed(self.site, self.job_key(job), "无结果")
+
+        # 先由 on_result 写出结果，再在状态库中记为完成：两步之间崩溃时任务仍未完成，续爬时会重新处理
+        saved = self._emit_result(tab_id, job, result, results, on_result)
+        if self.store and error is None and result is not None and saved:
+            self.store.mark_done(self.site, self.job_key(job), result)
+
+    async def _quarantine(self, page, tab_id, reason):
+        """隔离被拦截的页签：暂停 quarantine_seconds 秒，期间其他页签继续处理队列
+
+        独立上下文的页签丢弃原上下文（Cookie、指纹），先换上全新的上下文再开始隔离：
+        队列在隔离期间处理完时 run() 会取消页签任务，self.pages 中留下的必须是可用的新页签；
+        共享上下文保存着登录态不能丢弃，只暂停该页签（登录墙需要在浏览器中重新登录）
+        """
+        if self.rate_limiter:
+            self.rate_limiter.failure(reason)
+        if self.on_block:
+            self.on_block(reason)
+        print(f"页签 {tab_id} 被拦截（{reason}：{page.url[:60]}），任务已放回队列，隔离 {self.quarantine_seconds} 秒")
+        if self.shared_context:
+            await asyncio.sleep(self.quarantine_seconds)
+            return page
+
+        context = page.context
+        if context in self.contexts:
+            self.contexts.remove(context)
+        try:
+            await context.close()
+        except Exception:
+            pass
+        page = await self._replace_page(tab_id)
+        await asyncio.sleep(self.quarantine_seconds)
+        print(f"页签 {tab_id} 隔离结束，已换用新的上下文")
+        return page
+
+    async def _replace_page(self, tab_id):
+        """为页签创建新页面并替换 self.pages 中的旧页面（独立上下文模式同时创建新上下文）"""
+        if self.shared_context and self.contexts:
+            context = self.contexts[0]
+        else:
+            context = await self._new_context()
+        page = await self._new_page(context, tab_id)
+        self.pages[tab_id - 1] = page
+        return page
+
+    def _schedule_retry(self, queue, job, attempt, delay):
+        """退避 delay 秒后把任务放回队尾，期间页签继续处理其他任务"""
+        async def put_later():
+            await asyncio.sleep(delay)
+            queue.put_nowait((job, attempt))
+
+        task = asyncio.create_task(put_later())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
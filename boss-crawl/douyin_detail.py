@@ -1,13 +1,30 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-import time
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import asyncio
 import random
 import csv
+import json
 import os
+import re
+import sys
 from typing import List, Dict
+from urllib.parse import unquote
+from crawl_engine import CrawlEngine
+from state_store import StateStore
+from resource_policy import ResourcePolicy
+from worker_client import CoordinatorClient, collect_results, run_worker
+from block_detector import BlockedError, raise_if_blocked
+from session_vault import SessionVault, login_once
+from session_pool import load_pool
+
+TAB_COUNT = 3  # 同时并行的页签数量
+ACCOUNT_HOURLY_BUDGET = 120  # 多账号时每个账号每小时最多处理的主页数
+BLOCK_RESOURCES = False  # 改为True时拦截头像/封面/字体/自动播放媒体，只加载文本（默认关闭，确认页面能正常提取后再开启）
+EXTRACT_MODE = "json"  # json: 从资料接口/SSR数据读取（失败时回退到页面元素）；dom: 逐个定位页面元素
+PROFILE_API = "/aweme/v1/web/user/profile/other/"  # 用户资料接口
 
 
 def load_existing_links(keyword: str) -> List[str]:
-    """加载已爬取的链接（用于断点续爬）"""
+    """加载结果CSV中已爬取的链接（仅用于把旧的结果导入状态库）"""
     result_csv = f"douyin_{keyword}.csv"
     existing_links = []
     if os.path.exists(result_csv):
@@ -83,7 +100,110 @@ def save_user_info(keyword: str, user_info: Dict[str, str]) -> None:
         f.flush()  # 立即写入磁盘
 
 
-def extract_user_info(page, target_url: str) -> Dict[str, str]:
+def format_count(value) -> str:
+    """把接口返回的数字格式化成页面上的显示形式（如 12.3万、1.5亿）"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return str(value)
+    if number >= 100000000:
+        return f"{number / 100000000:.1f}亿".replace(".0亿", "亿")
+    if number >= 10000:
+        return f"{number / 10000:.1f}万".replace(".0万", "万")
+    return str(number)
+
+
+def sec_uid_from_url(url: str):
+    """从主页链接（https://www.douyin.com/user/<sec_uid>?...）中取出 sec_uid，不是主页链接时返回 None"""
+    match = re.search(r"/user/([\w-]+)", url or "")
+    return match.group(1) if match else None
+
+
+def find_user_json(data, sec_uid):
+    """在 SSR 数据中递归查找 sec_uid 对应的用户资料对象
+
+    RENDER_DATA 里还有当前登录用户、推荐账号等资料对象，只接受 secUid 与正在爬取的主页一致的那个；
+    找不到时返回 None，任务按失败处理，不会记录成别人的资料
+    """
+    if isinstance(data, dict):
+        if "nickname" in data and sec_uid and sec_uid in (data.get("secUid"), data.get("sec_uid")):
+            return data
+        values = data.values()
+    elif isinstance(data, list):
+        values = data
+    else:
+        return None
+    for value in values:
+        found = find_user_json(value, sec_uid)
+        if found:
+            return found
+    return None
+
+
+def parse_profile_json(user: Dict, target_url: str) -> Dict[str, str]:
+    """把资料接口（snake_case）或 SSR 数据（camelCase）中的用户对象映射为结果字段"""
+    def pick(*keys):
+        for key in keys:
+            value = user.get(key)
+            if value not in (None, ""):
+                return value
+        return None
+
+    def count(field, *keys):
+        value = pick(*keys)
+        return format_count(value) if value is not None else f"未找到{field}"
+
+    douyin_id = pick("unique_id", "uniqueId") or pick("short_id", "shortId")
+    ip_text = pick("ip_location", "ipLocation")
+    return {
+        "用户主页链接": target_url,
+        "用户名": pick("nickname") or "未找到用户名",
+        "抖音号": str(douyin_id) if douyin_id else "未找到抖音号",
+        "IP属地": ip_text.replace("IP属地：", "").replace("IP属地:", "") if ip_text else "未找到IP属地",
+        "作品数量": count("作品数量", "aweme_count", "awemeCount"),
+        "关注数": count("关注数", "following_count", "followingCount"),
+        "粉丝数": count("粉丝数", "mplatform_followers_count", "mplatformFollowersCount", "follower_count", "followerCount"),
+        "获赞数": count("获赞数", "total_favorited", "totalFavorited"),
+        "简介": (pick("signature", "desc") or "未找到简介").strip(),
+    }
+
+
+async def extract_user_info_json(page, target_url: str):
+    """访问主页，从资料接口响应或 SSR 数据中一次性读取用户信息；都拿不到时返回None"""
+    user = None
+    sec_uid = sec_uid_from_url(target_url)
+    try:
+        # 在导航前开始监听资料接口，避免错过响应
+        async with page.expect_response(lambda r: PROFILE_API in r.url, timeout=10000) as response_info:
+            await page.goto(target_url, wait_until="domcontentloaded")
+        response = await response_info.value
+        user = (await response.json()).get("user")
+    except PlaywrightTimeoutError:
+        pass
+    except Exception as e:
+        print(f"  解析资料接口出错：{str(e)[:50]}")
+
+    # 短链接跳转后才能从页面地址中取到 sec_uid
+    sec_uid = sec_uid or sec_uid_from_url(page.url)
+    if user and user.get("sec_uid") != sec_uid:
+        # 页面上可能先请求了登录用户或推荐账号的资料
+        user = None
+
+    if not user:
+        # 接口没有出现时，读取页面内嵌的 SSR 数据（URL 编码的 JSON）
+        raw = await page.evaluate(
+            "() => { const el = document.getElementById('RENDER_DATA'); return el ? el.textContent : null; }"
+        )
+        if raw:
+            try:
+                user = find_user_json(json.loads(unquote(raw)), sec_uid)
+            except ValueError:
+                user = None
+
+    return parse_profile_json(user, target_url) if user else None
+
+
+async def extract_user_info(page, target_url: str) -> Dict[str, str]:
     """提取用户主页信息"""
     user_info = {
         "用户主页链接": target_url,
@@ -98,40 +218,23 @@ def extract_user_info(page, target_url: str) -> Dict[str, str]:
     }
 
     try:
-        # -------------------------- 修复：将locators()改为locator() --------------------------
         # 1. 关注/粉丝/获赞（div.C1cxu0Vq）
-        # 用locator()配合all()获取所有匹配元素（正确语法）
-        stats = page.locator("div.C1cxu0Vq").all()
+        stats = await page.locator("div.C1cxu0Vq").all()
         if len(stats) >= 3:
-            user_info["关注数"] = (
-                stats[0].text_content().strip()
-                if stats[0].text_content()
-                else "未找到关注数"
-            )
-            user_info["粉丝数"] = (
-                stats[1].text_content().strip()
-                if stats[1].text_content()
-                else "未找到粉丝数"
-            )
-            user_info["获赞数"] = (
-                stats[2].text_content().strip()
-                if stats[2].text_content()
-                else "未找到获赞数"
-            )
+            for stat, field in zip(stats, ["关注数", "粉丝数", "获赞数"]):
+                text = await stat.text_content()
+                user_info[field] = text.strip() if text else f"未找到{field}"
 
         # 2. 用户名（第一个 span.arnSiSbK）
         username = page.locator("span.arnSiSbK").nth(0)
-        if username.is_visible():
-            user_info["用户名"] = (
-                username.text_content().strip()
-                if username.text_content()
-                else "未找到用户名"
-            )
+        if await username.is_visible():
+            name_text = await username.text_content()
+            user_info["用户名"] = name_text.strip() if name_text else "未找到用户名"
 
         # 3. 抖音号（span.OcCvtZ2a，去除前缀）
         douyin_id = page.locator("span.OcCvtZ2a").first
-        if douyin_id.is_visible():
-            id_text = douyin_id.text_content()
+        if await douyin_id.is_visible():
+            id_text = await douyin_id.text_content()
             user_info["抖音号"] = (
                 id_text.strip().replace("抖音号：", "").replace("抖音号:", "")
                 if id_text
@@ -140,8 +243,8 @@ def extract_user_info(page, target_url: str) -> Dict[str, str]:
 
         # 4. IP属地（span.DtUnx4ER，去除前缀）
         ip = page.locator("span.DtUnx4ER").first
-        if ip.is_visible():
-            ip_text = ip.text_content()
+        if await ip.is_visible():
+            ip_text = await ip.text_content()
             user_info["IP属地"] = (
                 ip_text.strip().replace("IP属地：", "").replace("IP属地:", "")
                 if ip_text
@@ -150,29 +253,23 @@ def extract_user_info(page, target_url: str) -> Dict[str, str]:
 
         # 5. 作品数量（span.MNSB3oPV）
         works = page.locator("span.MNSB3oPV").first
-        if works.is_visible():
-            user_info["作品数量"] = (
-                works.text_content().strip()
-                if works.text_content()
-                else "未找到作品数量"
-            )
+        if await works.is_visible():
+            works_text = await works.text_content()
+            user_info["作品数量"] = works_text.strip() if works_text else "未找到作品数量"
 
         # 6. 简介（优先hover，其次备用元素）
         hover_bio = page.locator("div.DW9FqY4N").first
-        if hover_bio.is_visible():
-            hover_bio.hover()
-            dynamic_p = page.wait_for_selector(
+        if await hover_bio.is_visible():
+            await hover_bio.hover()
+            dynamic_p = await page.wait_for_selector(
                 selector="p.rOmiw4gg", state="visible", timeout=15000
             )
-            user_info["简介"] = dynamic_p.text_content().strip()
+            user_info["简介"] = (await dynamic_p.text_content()).strip()
         else:
             backup_bio = page.locator("span.arnSiSbK").nth(1)
-            if backup_bio.is_visible():
-                user_info["简介"] = (
-                    backup_bio.text_content().strip()
-                    if backup_bio.text_content()
-                    else "未找到简介"
-                )
+            if await backup_bio.is_visible():
+                bio_text = await backup_bio.text_content()
+                user_info["简介"] = bio_text.strip() if bio_text else "未找到简介"
 
     except Exception as e:
         print(f"  提取信息出错：{str(e)}")
@@ -180,101 +277,205 @@ def extract_user_info(page, target_url: str) -> Dict[str, str]:
     return user_info
 
 
-def crawl_douyin_users(keyword: str) -> None:
-    """核心爬取逻辑：读取链接→登录→循环爬取→保存结果"""
-    # 1. 预处理：读取链接、初始化文件
+async def crawl_user(page, link: str):
+    """单个链接的导航和提取：加载失败返回None（不保存，下次运行会重试）"""
+    try:
+        # 随机间隔1-3秒（防反爬）
+        await asyncio.sleep(random.uniform(1, 3))
+
+        if EXTRACT_MODE == "json":
+            # 资料JSON一步取齐所有字段，无需逐个定位元素和hover简介
+            user_info = await extract_user_info_json(page, link)
+            if user_info:
+                return user_info
+            print(f"  未获取到资料JSON，改用页面元素提取：{link}")
+        else:
+            # 访问链接（DOM加载完成即处理）
+            await page.goto(link, wait_until="domcontentloaded")
+        await asyncio.sleep(random.uniform(2, 3))  # 等待动态内容
+
+        # 验证页面加载（重试机制）
+        username_loc = page.locator("span.arnSiSbK").nth(0)
+        load_success = False
+        for _ in range(2):
+            if await username_loc.is_visible():
+                load_success = True
+                break
+            await asyncio.sleep(1)
+
+        if not load_success:
+            # 验证码/登录墙交给引擎隔离页签并重新排队，不再刷新跳过
+            await raise_if_blocked(page, "douyin")
+            print(f"  页面加载失败，刷新后跳过：{link}")
+            await page.reload(wait_until="domcontentloaded")
+            await asyncio.sleep(2)
+            return None
+
+        return await extract_user_info(page, link)
+
+    except BlockedError:
+        raise
+    except PlaywrightTimeoutError:
+        await raise_if_blocked(page, "douyin")
+        print(f"  超时错误：访问 {link} 超过25秒，跳过")
+        await page.reload(wait_until="domcontentloaded")
+        await asyncio.sleep(2)
+    except Exception as e:
+        await raise_if_blocked(page, "douyin")
+        print(f"  处理错误：{str(e)}，跳过该链接")
+        if page.url != "https://www.douyin.com/":
+            await page.goto("https://www.douyin.com/", wait_until="domcontentloaded")
+        await asyncio.sleep(2)
+    return None
+
+
+def create_engine(store=None, site=None, vault=None) -> CrawlEngine:
+    """创建爬取引擎（所有页签共用一个上下文，登录一次即可；保管库中有登录态时直接复用）
+
+    保管库中有多个账号时改用账号池：每个账号一个上下文，任务分给剩余预算最多的账号
+    """
+    vault = vault or SessionVault()
+    pool = load_pool("douyin", vault, ACCOUNT_HOURLY_BUDGET)
+    return CrawlEngine(
+        crawl_user,
+        tab_count=TAB_COUNT,
+        shared_context=True,
+        default_timeout=25000,  # 全局超时25秒
+        store=store,
+        site=site,
+        block_site="douyin",
+        on_block=vault.expiry_watcher("douyin"),
+        storage_state=None if pool else vault.load("douyin"),
+        session_pool=pool,
+        resource_policy=ResourcePolicy("douyin") if BLOCK_RESOURCES else None,
+        launch_args=[
+            "--start-maximized",
+            "--disable-blink-features=AutomationControlled",  # 防反爬识别
+            "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+        ],
+    )
+
+
+def load_pending_links(keyword: str, store: StateStore) -> List[str]:
+    """断点续爬：以状态库记录为准；状态库中还没有该关键字时，导入结果CSV中的旧记录"""
     all_links = read_link_csv(keyword)
     if not all_links:
-        return
-
-    existing_links = load_existing_links(keyword)
-    init_result_csv(keyword)
-    to_crawl = [link for link in all_links if link not in existing_links]
+        return []
 
+    site = f"douyin:{keyword}"
+    if not store.done_keys(site):
+        for link in load_existing_links(keyword):
+            store.mark_done(site, link)
+        store.commit()
+    to_crawl = store.pending(site, all_links)
     if not to_crawl:
         print(f"所有 {len(all_links)} 个链接已爬取完成！")
+    return to_crawl
+
+
+def print_saved(user_info: Dict[str, str]) -> None:
+    print(f"  保存成功！用户名：{user_info['用户名']} | 粉丝数：{user_info['粉丝数']}")
+
+
+async def crawl_douyin_users(keyword: str) -> None:
+    """核心爬取逻辑：读取链接→登录→多页签并发爬取→保存结果"""
+    # 1. 预处理：读取链接、初始化文件
+    site = f"douyin:{keyword}"
+    store = StateStore()
+    to_crawl = load_pending_links(keyword, store)
+    if not to_crawl:
+        store.close()
         return
+    init_result_csv(keyword)
     print(f"待处理链接数：{len(to_crawl)}")
 
+    def on_result(link, user_info):
+        if not user_info:
+            return
+        save_user_info(keyword, user_info)
+        print_saved(user_info)
+
     # 2. 启动浏览器
-    with sync_playwright() as p:
-        browser = None
-        try:
-            browser = p.chromium.launch(
-                headless=False,
-                args=[
-                    "--start-maximized",
-                    "--disable-blink-features=AutomationControlled",  # 防反爬识别
-                    "--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-                ],
+    vault = SessionVault()
+    engine = create_engine(store, site, vault)
+    try:
+        await engine.start()
+
+        # 3. 登录确认（没有可用登录态时访问第一个链接触发登录，登录后保存）
+        if not engine.session_pool:
+            await login_once(
+                vault, "douyin", engine.contexts[0], engine.pages[0], to_crawl[0],
+                "扫码/输入账号登录抖音后，按回车键开始爬取...",
             )
-            page = browser.new_page()
-            page.set_default_timeout(25000)  # 全局超时25秒
-
-            # 3. 登录确认（访问第一个链接触发登录）
-            print("\n请完成抖音登录：")
-            first_link = to_crawl[0]
-            page.goto(first_link, wait_until="domcontentloaded")
-            input("扫码/输入账号登录后，按回车键开始爬取...")
-
-            # 4. 循环爬取每个链接
-            for idx, link in enumerate(to_crawl, 1):
-                print(f"\n{'='*60}")
-                print(f"处理第 {idx}/{len(to_crawl)} 个链接：{link}")
-
-                try:
-                    # 随机间隔1-3秒（防反爬）
-                    time.sleep(random.uniform(1, 3))
-
-                    # 访问链接（DOM加载完成即处理）
-                    page.goto(link, wait_until="domcontentloaded")
-                    time.sleep(random.uniform(2, 3))  # 等待动态内容
-
-                    # 验证页面加载（重试机制）
-                    username_loc = page.locator("span.arnSiSbK").nth(0)
-                    load_success = False
-                    for _ in range(2):
-                        if username_loc.is_visible():
-                            load_success = True
-                            break
-                        time.sleep(1)
-
-                    if not load_success:
-                        print("  页面加载失败，刷新后跳过...")
-                        page.reload(wait_until="domcontentloaded")
-                        time.sleep(2)
-                        continue
-
-                    # 提取并保存信息
-                    user_info = extract_user_info(page, link)
-                    save_user_info(keyword, user_info)
-                    print(
-                        f"  保存成功！用户名：{user_info['用户名']} | 粉丝数：{user_info['粉丝数']}"
-                    )
-
-                except PlaywrightTimeoutError:
-                    print(f"  超时错误：访问 {link} 超过25秒，跳过")
-                    page.reload(wait_until="domcontentloaded")
-                    time.sleep(2)
-                except Exception as e:
-                    print(f"  处理错误：{str(e)}，跳过该链接")
-                    if page.url != "https://www.douyin.com/":
-                        page.goto(
-                            "https://www.douyin.com/", wait_until="domcontentloaded"
-                        )
-                    time.sleep(2)
-
-            # 爬取完成提示
-            print(f"\n{'='*60}")
-            print(f"爬取任务全部完成！")
-            print(f"结果文件路径：{os.path.abspath(f'douyin_{keyword}.csv')}")
-
-        except Exception as main_e:
-            print(f"\n爬取主流程异常：{str(main_e)}")
-        finally:
-            input("爬取结束，按回车键关闭浏览器...")
-            if browser:
-                browser.close()
+
+        # 4. 多页签并发爬取
+        await engine.run(to_crawl, on_result=on_result)
+
+        # 爬取完成提示
+        print(f"\n{'='*60}")
+        print(f"爬取任务全部完成！")
+        print(f"结果文件路径：{os.path.abspath(f'douyin_{keyword}.csv')}")
+
+    except Exception as main_e:
+        print(f"\n爬取主流程异常：{str(main_e)}")
+    finally:
+        input("爬取结束，按回车键关闭浏览器...")
+        await engine.stop()
+        store.close()
+
+
+async def run_as_worker(keyword: str, client: CoordinatorClient) -> None:
+    """工作模式：登录后从协调服务领取链接，用本机浏览器爬取后提交结果"""
+    vault = SessionVault()
+    engine = create_engine(vault=vault)
+    try:
+        await engine.start()
+        if not engine.session_pool:
+            await login_once(
+                vault, "douyin", engine.contexts[0], engine.pages[0], "https://www.douyin.com/",
+                "扫码/输入账号登录抖音后，按回车键开始领取任务...",
+            )
+
+        await run_worker(
+            engine,
+            client,
+            f"douyin:{keyword}",
+            to_job=lambda job: job["key"],
+            job_key=lambda link: link,
+        )
+    finally:
+        await engine.stop()
+
+
+def run_distributed(mode: str, url: str, keyword: str) -> None:
+    """多机模式：enqueue 提交待爬链接，worker 领取并爬取，collect 把结果追加到结果CSV"""
+    client = CoordinatorClient(url)
+    queue = f"douyin:{keyword}"
+    if mode == "worker":
+        asyncio.run(run_as_worker(keyword, client))
+        return
+
+    store = StateStore()
+    try:
+        if mode == "enqueue":
+            to_crawl = load_pending_links(keyword, store)
+            added = client.enqueue(queue, [{"key": link} for link in to_crawl])
+            print(f"已提交 {added} 个链接到协调服务 {url}")
+        elif mode == "collect":
+            init_result_csv(keyword)
+
+            def write(link, user_info):
+                if not user_info:
+                    return False
+                save_user_info(keyword, user_info)
+                print_saved(user_info)
+
+            collected = collect_results(client, queue, store, write)
+            print(f"已从协调服务取回 {collected} 个用户信息")
+        else:
+            print(f"未知模式：{mode}（可选 enqueue / worker / collect）")
+    finally:
+        store.close()
 
 
 if __name__ == "__main__":
@@ -283,5 +484,8 @@ if __name__ == "__main__":
     ).strip()
     if not keyword:
         print("关键字不能为空！")
+    elif len(sys.argv) > 2:
+        # 多机模式：python douyin_detail.py enqueue|worker|collect http://协调服务地址:8765
+        run_distributed(sys.argv[1], sys.argv[2], keyword)
     else:
-        crawl_douyin_users(keyword)
+        asyncio.run(crawl_douyin_users(keyword))
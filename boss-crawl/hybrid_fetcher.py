@@ -0,0 +1,209 @@
+"""混合模式：浏览器登录，HTTP 抓取
+
+zhipin 公司页、蝉妈妈介绍页这类页面的内容大多直接写在服务端返回的 HTML 里，用完整的 Chromium
+渲染每个页面既慢又占内存。混合模式由 CrawlEngine 的浏览器负责登录、预热和过验证，把上下文中的
+Cookie 和 User-Agent 导出到带连接池的 requests 会话，之后所有任务先走 HTTP 并用标准库
+html.parser 解析；只有响应看起来被拦截（block_detector）或内容不完整（解析结果为 None）的任务
+才交给浏览器页签重新处理。连续多个页面都需要回退时停用 HTTP，剩余任务全部交给浏览器。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+import requests
+from requests.adapters import HTTPAdapter
+from block_detector import detect_block
+
+HTTP_CONCURRENCY = 8  # HTTP 并发请求数
+MAX_FALLBACK_STREAK = 10  # 连续多少个页面需要回退浏览器时停用 HTTP
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+LINE_TAGS = {"br", "p", "div", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6"}  # 文本中换行的标签
+
+
+class ClassTextParser(HTMLParser):
+    """提取第一个 class 包含 class_name 的元素的文本"""
+
+    def __init__(self, class_name, direct_only=False):
+        super().__init__()
+        self.class_name = class_name
+        self.direct_only = direct_only
+        self.depth = 0  # 目标元素内的嵌套深度，0 表示不在目标元素内
+        self.found = False
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            if tag in LINE_TAGS:
+                self.parts.append("\n")
+            if tag not in VOID_TAGS:
+                self.depth += 1
+        elif not self.found and self.class_name in (dict(attrs).get("class") or "").split():
+            self.found = True
+            if tag not in VOID_TAGS:
+                self.depth = 1
+
+    def handle_endtag(self, tag):
+        # 自闭合写法（<br/>、<img .../>）也会调用 handle_endtag，空元素在 handle_starttag 中没有加深度
+        if self.depth and tag not in VOID_TAGS:
+            self.depth -= 1
+
+    def handle_data(self, data):
+        if self.depth and (not self.direct_only or self.depth == 1):
+            self.parts.append(data)
+
+
+def extract_class_text(html, class_name, direct_only=False):
+    """返回第一个 class 包含 class_name 的元素的文本，找不到该元素时返回 None
+
+    direct_only: 只取元素自身的文本节点（不含子元素），对应页面中按 nodeType === 3 过滤的写法
+    """
+    parser = ClassTextParser(class_name, direct_only)
+    parser.feed(html)
+    parser.close()
+    if not parser.found:
+        return None
+    if direct_only:
+        return "".join(part.strip() for part in parser.parts)
+    lines = (line.strip() for line in "".join(parser.parts).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class HybridFetcher:
+    """用浏览器导出的登录态通过 HTTP 抓取页面，失败的任务回退到 CrawlEngine 的浏览器页签"""
+
+    def __init__(
+        self,
+        site,
+        concurrency=HTTP_CONCURRENCY,
+        rate_limiter=None,
+        timeout=15,
+        max_fallback_streak=MAX_FALLBACK_STREAK,
+    ):
+        """
+        site: block_detector 中的站点名，用于判断 HTTP 响应是否被拦截
+        concurrency: HTTP 并发请求数（连接池大小）
+        rate_limiter: AdaptiveRateLimiter，HTTP 请求前取令牌，按响应调整速率
+        max_fallback_streak: 连续多少个页面需要回退浏览器时停用 HTTP
+        """
+        self.site = site
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.max_fallback_streak = max_fallback_streak
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.stats = {"http": 0, "fallback": 0, "blocked": 0}
+        self.streak = 0
+        self.disabled = False
+
+    async def sync_cookies(self, context):
+        """把浏览器上下文的 Cookie 和 User-Agent 导出到 HTTP 会话"""
+        cookies = await context.cookies()
+        for cookie in cookies:
+            self.session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"])
+        if context.pages:
+            user_agent = await context.pages[0].evaluate("navigator.userAgent")
+            self.session.headers["User-Agent"] = user_agent
+        self.session.headers.setdefault("Accept-Language", "zh-CN,zh;q=0.9")
+        print(f"[混合模式:{self.site}] 已从浏览器导出 {len(cookies)} 个Cookie")
+
+    def _get(self, url):
+        return self.session.get(url, timeout=self.timeout)
+
+    async def fetch(self, url):
+        """HTTP 获取页面，返回 HTML；请求失败、非 200 或被拦截时返回 None"""
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(self.executor, self._get, url)
+        except requests.RequestException as e:
+            if self.rate_limiter:
+                self.rate_limiter.failure("timeout" if isinstance(e, requests.Timeout) else "error")
+            return None
+        if response.status_code in (429, 403):
+            self.stats["blocked"] += 1
+            if self.rate_limiter:
+                self.rate_limiter.failure(str(response.status_code))
+            return None
+        if response.status_code != 200:
+            return None
+        kind = detect_block(self.site, response.url, response.text)
+        if kind:
+            self.stats["blocked"] += 1
+            if self.rate_limiter:
+                self.rate_limiter.failure(kind)
+            return None
+        return response.text
+
+    def _fallback(self, job, fallback):
+        """任务交给浏览器；连续回退过多时停用 HTTP"""
+        fallback.append(job)
+        self.stats["fallback"] += 1
+        self.streak += 1
+        if self.streak >= self.max_fallback_streak and not self.disabled:
+            self.disabled = True
+            print(f"[混合模式:{self.site}] 连续 {self.streak} 个页面需要回退浏览器，停用HTTP，剩余任务全部交给浏览器")
+
+    async def run(self, engine, jobs, url_of, parse, on_result=None):
+        """HTTP 优先处理所有任务，被拦截或内容不完整的任务交给引擎的浏览器页签
+
+        engine: 已登录的 CrawlEngine（Cookie 取自第一个上下文；状态库、限速器配置沿用引擎的）
+        url_of: def url_of(job) -> 页面URL
+        parse: def parse(html, job) -> result，内容不完整时返回 None
+        返回 [(job, result), ...]
+        """
+        await engine.start()
+        await self.sync_cookies(engine.contexts[0])
+        results = []
+        fallback = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run_one(job):
+            async with semaphore:
+                if self.disabled:
+                    fallback.append(job)
+                    self.stats["fallback"] += 1
+                    return
+                html = await self.fetch(url_of(job))
+                result = parse(html, job) if html else None
+            if result is None:
+                self._fallback(job, fallback)
+                return
+            self.streak = 0
+            self.stats["http"] += 1
+            if self.rate_limiter:
+                self.rate_limiter.success()
+            results.append((job, result))
+            if on_result:
+                try:
+                    on_result(job, result)
+                except Exception as e:
+                    print(f"保存任务 {job} 结果出错：{str(e)[:30]}")
+                    return
+            # 与引擎相同：结果写出后才在状态库中记为完成
+            if engine.store:
+                engine.store.mark_done(engine.site, engine.job_key(job), result)
+
+        await asyncio.gather(*(run_one(job) for job in jobs))
+        if engine.store:
+            engine.store.commit()
+        if fallback:
+            print(f"[混合模式:{self.site}] {len(fallback)} 个任务交给浏览器处理")
+            results += await engine.run(fallback, on_result=on_result)
+        self.report()
+        return results
+
+    def report(self):
+        """打印 HTTP/浏览器处理数量"""
+        print(
+            f"[混合模式:{self.site}] HTTP完成 {self.stats['http']} 个，回退浏览器 {self.stats['fallback']} 个，"
+            f"其中被拦截 {self.stats['blocked']} 个"
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,87 @@
+"""多关键词批量模式
+
+搜索类脚本（douyin.py / kuaishou.py）原来每个关键词单独运行一次：启动浏览器、手动登录、
+爬完退出。批量模式从关键词文件读取全部关键词，只启动一个浏览器，
+把登录态（storage_state）复制到每个关键词独立的上下文中并发爬取。
+登录态取自 SessionVault，保管库中没有可用登录态时才手动登录一次并保存。
+各关键词的结果由脚本写入状态库，按 (站点:关键词, key) 区分。
+"""
+import asyncio
+import os
+from playwright.async_api import async_playwright
+from session_vault import SessionVault
+
+BATCH_CONCURRENCY = 3  # 同时爬取的关键词数量
+
+
+def read_keywords(path):
+    """读取关键词文件（每行一个，忽略空行和 # 注释，去重并保持顺序）"""
+    if not os.path.exists(path):
+        print(f"错误：关键词文件 {path} 不存在！")
+        return []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        keywords = [line.split(",")[0].strip() for line in f]
+    keywords = [k for k in keywords if k and not k.startswith("#")]
+    return list(dict.fromkeys(keywords))
+
+
+async def run_keyword_batch(
+    keywords,
+    crawl_keyword,
+    login_url,
+    site,
+    concurrency=BATCH_CONCURRENCY,
+    launch_args=None,
+    resource_policy=None,
+    headless=False,
+):
+    """一个浏览器 + 一次登录，多个关键词各用独立上下文并发爬取
+
+    crawl_keyword: async def crawl_keyword(page, keyword) -> 结果摘要，在已登录的页面上爬取单个关键词
+    site: 保管库中的站点名，用于加载/保存登录态
+    返回 {关键词: 结果摘要}，出错的关键词对应异常信息
+    """
+    results = {}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless, args=launch_args)
+        try:
+            # 保管库中没有可用登录态时登录一次并保存，供所有关键词的上下文复用
+            vault = SessionVault()
+            storage_state = vault.load(site)
+            if not storage_state:
+                login_context = await browser.new_context()
+                login_page = await login_context.new_page()
+                await login_page.goto(login_url, wait_until="domcontentloaded")
+                input(f"请在浏览器中完成登录（共 {len(keywords)} 个关键词），登录后按回车键开始批量爬取...")
+                await vault.save(login_context, site)
+                storage_state = vault.path(site)
+                await login_context.close()
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def run_one(keyword):
+                async with semaphore:
+                    context = await browser.new_context(storage_state=storage_state)
+                    if resource_policy:
+                        await resource_policy.install(context)
+                    try:
+                        page = await context.new_page()
+                        print(f"\n[{keyword}] 开始爬取")
+                        results[keyword] = await crawl_keyword(page, keyword)
+                        print(f"[{keyword}] 完成：{results[keyword]}")
+                    except Exception as e:
+                        results[keyword] = f"出错：{str(e)[:80]}"
+                        print(f"[{keyword}] 爬取出错：{str(e)[:80]}")
+                    finally:
+                        await context.close()
+
+            await asyncio.gather(*(run_one(keyword) for keyword in keywords))
+        finally:
+            await browser.close()
+            if resource_policy:
+                resource_policy.report()
+
+    print(f"\n{'='*60}\n批量爬取完成：")
+    for keyword in keywords:
+        print(f"  {keyword}: {results.get(keyword)}")
+    return results
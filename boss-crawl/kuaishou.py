@@ -1,21 +1,64 @@
-import time
+import asyncio
 import random
 import csv
 import os
-from datetime import datetime
-from playwright.sync_api import sync_playwright
-
-
-def init_csv(keyword):
-    """初始化CSV文件并写入表头（包含主页链接字段）"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"kuaishou_authors_{keyword}_{timestamp}.csv"
-    # 新增"主页链接"字段
-    headers = ["序号", "名字", "作品数", "粉丝数", "关注数", "简介", "主页链接"]
-
+import sys
+from urllib.parse import quote, urljoin
+from playwright.async_api import async_playwright
+from state_store import StateStore
+from resource_policy import ResourcePolicy
+from keyword_batch import read_keywords, run_keyword_batch
+from session_vault import SessionVault, login_once
+
+BLOCK_RESOURCES = False  # 改为True时拦截头像/封面/字体/自动播放媒体，只加载文本（默认关闭，确认页面能正常提取后再开启）
+HARVEST_MODE = "api"  # api: 滚动时直接读取搜索接口返回的作者数据；dom: 滚动结束后从作者卡片读取主页链接
+SEARCH_API = "/graphql"  # 搜索页的作者数据通过 GraphQL 接口分页返回
+SEARCH_OPERATION = "SearchUser"  # 请求体中包含该关键字的 GraphQL 请求即作者搜索（visionSearchUser）
+PROFILE_URL = "https://www.kuaishou.com/profile/{}"
+MISSING = "未获取到"
+RESULT_FIELDS = ["主页链接", "名字", "作品数", "粉丝数", "关注数", "简介"]
+REQUIRED_FIELDS = tuple(RESULT_FIELDS[1:])  # 接口数据缺少任一字段时，交给 kuaishou_detail.py 打开主页补全
+EMPTY_VALUES = {"简介": "无简介"}  # 接口中字段存在但为空表示作者没有填写（与详情页写法一致），不算缺失
+BATCH_CONCURRENCY = 3  # 批量模式下同时爬取的关键词数量
+
+# 接口字段 -> CSV 字段，同一字段兼容下划线/驼峰两种命名
+API_FIELDS = {
+    "名字": ("user_name", "userName", "name"),
+    "作品数": ("photo_count", "photoCount", "photo_public_count"),
+    "粉丝数": ("fans_count", "fansCount", "fan"),
+    "关注数": ("follow_count", "followCount", "following_count", "follow"),
+    "简介": ("user_text", "userText", "description"),
+}
+
+
+def read_links(keyword):
+    """读取链接文件中已收集的作者主页链接（保持收集顺序）"""
+    link_csv = f"kuaishou_link_{keyword}.csv"
+    if not os.path.exists(link_csv):
+        return []
+    with open(link_csv, "r", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过表头"主页链接"
+        return list(dict.fromkeys(row[0].strip() for row in reader if row and row[0].strip()))
+
+
+def append_link(keyword, link):
+    """追加一个作者主页链接到链接文件（不存在则创建表头）"""
+    link_csv = f"kuaishou_link_{keyword}.csv"
+    is_new = not os.path.exists(link_csv)
+    with open(link_csv, "a", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(["主页链接"])
+        writer.writerow([link])
+
+
+def init_result_csv(keyword):
+    """初始化结果CSV（同一关键词的多次运行共用一个文件，不存在则创建表头）"""
+    filename = f"kuaishou_authors_{keyword}.csv"
     if not os.path.exists(filename):
         with open(filename, mode="w", newline="", encoding="utf-8-sig") as file:
-            writer = csv.DictWriter(file, fieldnames=headers)
+            writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
             writer.writeheader()
     return filename
 
@@ -24,171 +67,226 @@ def save_to_csv_realtime(data, filename):
     """实时追加单条数据到CSV文件"""
     try:
         with open(filename, mode="a", newline="", encoding="utf-8-sig") as file:
-            writer = csv.DictWriter(file, fieldnames=data.keys())
+            writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
             writer.writerow(data)
-        print(f"已实时保存第{data['序号']}条数据到 {filename}")
+        print(f"已实时保存 {data['名字']} 到 {filename}")
     except Exception as e:
         print(f"实时保存数据失败: {str(e)}")
 
 
-def main():
-    # 输入关键词和起始序列
+def is_search_response(response):
+    """是否为作者搜索的 GraphQL 响应"""
+    if SEARCH_API not in response.url:
+        return False
+    try:
+        return SEARCH_OPERATION in (response.request.post_data or "")
+    except Exception:
+        return False
+
+
+def parse_search_users(payload):
+    """从搜索接口响应中取出作者列表"""
+    data = (payload or {}).get("data") or {}
+    search = data.get("visionSearchUser") or {}
+    return search.get("users") or []
+
+
+def author_from_api(user):
+    """把接口中的作者数据转换为结果行，缺失字段记为 MISSING"""
+    user_id = user.get("user_id") or user.get("userId") or user.get("id")
+    item = {"主页链接": PROFILE_URL.format(user_id) if user_id else ""}
+    for column, keys in API_FIELDS.items():
+        value = next((user[k] for k in keys if user.get(k) not in (None, "")), None)
+        if value is None:
+            empty = column in EMPTY_VALUES and any(user.get(k) == "" for k in keys)
+            value = EMPTY_VALUES[column] if empty else MISSING
+        item[column] = str(value).strip().replace("\n", " ")
+    return item
+
+
+async def drain_search_responses(responses, seen_ids):
+    """解析已捕获的搜索响应，返回新出现的作者（按接口返回顺序去重）"""
+    users = []
+    while responses:
+        response = responses.pop(0)
+        try:
+            payload = await response.json()
+        except Exception as e:
+            print(f"解析搜索接口响应失败: {str(e)[:50]}")
+            continue
+        for user in parse_search_users(payload):
+            user_id = str(user.get("user_id") or user.get("userId") or user.get("id") or "")
+            if not user_id or user_id in seen_ids:
+                continue
+            seen_ids.add(user_id)
+            users.append(user)
+    return users
+
+
+async def collect_card_links(page):
+    """从已加载的作者卡片中读取主页链接"""
+    links = []
+    for anchor in await page.locator('div.card-item a[href*="/profile/"]').all():
+        href = await anchor.get_attribute("href")
+        if href:
+            links.append(urljoin("https://www.kuaishou.com", href.strip()).split("?")[0])
+    return list(dict.fromkeys(links))
+
+
+class LinkHarvester:
+    """把作者主页链接去重写入链接文件；接口数据完整的作者直接写入结果文件"""
+
+    def __init__(self, keyword, store):
+        self.keyword = keyword
+        self.site = f"kuaishou:{keyword}"
+        self.store = store
+        self.links = set(read_links(keyword))
+        self.done = store.done_keys(self.site)
+        self.csv_filename = init_result_csv(keyword)
+        self.new_links = 0
+        self.saved = 0
+        if self.links:
+            print(f"链接文件中已有 {len(self.links)} 个作者链接，状态库中已完成 {len(self.done)} 个")
+
+    def add_link(self, link):
+        if not link or link in self.links:
+            return
+        append_link(self.keyword, link)
+        self.links.add(link)
+        self.store.add_jobs(self.site, [link])
+        self.new_links += 1
+
+    def add_api_author(self, user):
+        item = author_from_api(user)
+        link = item["主页链接"]
+        self.add_link(link)
+        if not link or link in self.done:
+            return
+        if any(item[column] == MISSING for column in REQUIRED_FIELDS):
+            print(f"接口数据缺少必要字段，留给详情阶段补全: {link}")
+            return
+        save_to_csv_realtime(item, self.csv_filename)
+        self.store.mark_done(self.site, link, item)
+        self.done.add(link)
+        self.saved += 1
+
+
+async def harvest_keyword(page, keyword, store):
+    """在已登录的页面上滚动单个关键词的搜索页并收集作者链接，返回结果摘要"""
+    harvester = LinkHarvester(keyword, store)
+    search_url = f"https://www.kuaishou.com/search/author?searchKey={quote(keyword)}"
+
+    # 接口模式：在打开搜索页前注册监听，滚动过程中捕获每一页作者数据
+    search_responses = []
+    seen_ids = set()
+    if HARVEST_MODE == "api":
+        page.on(
+            "response",
+            lambda response: search_responses.append(response)
+            if is_search_response(response)
+            else None,
+        )
+
+    await page.goto(search_url, wait_until="networkidle")
+    print(f"[{keyword}] 已访问搜索页：{search_url}")
+
+    print(f"[{keyword}] 开始滚动加载内容...")
+    loading_selector = "div.spinning.search-loading div.text"
+    scroll_attempts = 0
+    max_attempts = 5
+
+    while scroll_attempts < max_attempts:
+        scroll_distance = random.randint(500, 800)
+        await page.evaluate(f"window.scrollBy(0, {scroll_distance})")
+        await asyncio.sleep(random.uniform(2, 3))
+
+        if HARVEST_MODE == "api":
+            for user in await drain_search_responses(search_responses, seen_ids):
+                harvester.add_api_author(user)
+
+        try:
+            await page.wait_for_selector(loading_selector, timeout=1000)
+            print(f"[{keyword}] 检测到加载状态，尝试次数：{scroll_attempts + 1}")
+            scroll_attempts += 1
+        except:
+            scroll_attempts = 0
+
+    print(f"[{keyword}] 已加载所有内容，停止滚动")
+
+    if HARVEST_MODE == "api":
+        for user in await drain_search_responses(search_responses, seen_ids):
+            harvester.add_api_author(user)
+        if not seen_ids:
+            print(f"[{keyword}] 未捕获到搜索接口数据，改为从作者卡片读取链接")
+    if HARVEST_MODE != "api" or not seen_ids:
+        for link in await collect_card_links(page):
+            harvester.add_link(link)
+
+    store.commit()
+    print(
+        f"\n[{keyword}] 链接收集完成！本次新增{harvester.new_links}个作者链接（累计{len(harvester.links)}个），"
+        f"其中{harvester.saved}个已直接从接口数据保存到 {harvester.csv_filename}"
+    )
+    return f"新增{harvester.new_links}个链接，直接保存{harvester.saved}个作者"
+
+
+async def main():
+    # 输入关键词
     search_keyword = input("请输入搜索关键词: ").strip()
     if not search_keyword:
         print("关键词不能为空！")
         return
 
-    try:
-        start_index = input("请输入起始序号（从1开始，默认1）: ").strip()
-        start_index = int(start_index) if start_index else 1
-        if start_index < 1:
-            print("起始序号不能小于1，已自动调整为1")
-            start_index = 1
-    except ValueError:
-        print("输入的起始序号无效，已自动调整为1")
-        start_index = 1
-
-    # 初始化CSV文件
-    csv_filename = init_csv(search_keyword)
-    authors_data = []
-    search_url = f"https://www.kuaishou.com/search/author?searchKey={search_keyword}"
-
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        page = browser.new_page()
+    # 第一阶段只收集作者主页链接：链接文件按主页链接去重，重复运行只追加新作者
+    store = StateStore()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        vault = SessionVault()
+        context = await browser.new_context(storage_state=vault.load("kuaishou"))
+        policy = ResourcePolicy("kuaishou") if BLOCK_RESOURCES else None
+        if policy:
+            await policy.install(context)
+        page = await context.new_page()
 
         try:
-            page.goto(search_url, wait_until="networkidle")
-            print(f"已访问搜索页：{search_url}")
-
-            input("请在浏览器中完成登录，登录后按回车键继续...")
-
-            print("开始滚动加载内容...")
-            loading_selector = "div.spinning.search-loading div.text"
-            scroll_attempts = 0
-            max_attempts = 5
-
-            while scroll_attempts < max_attempts:
-                scroll_distance = random.randint(500, 800)
-                page.evaluate(f"window.scrollBy(0, {scroll_distance})")
-                time.sleep(random.uniform(2, 3))
-
-                try:
-                    page.wait_for_selector(loading_selector, timeout=1000)
-                    print(f"检测到加载状态，尝试次数：{scroll_attempts + 1}")
-                    scroll_attempts += 1
-                except:
-                    scroll_attempts = 0
-
-            print("已加载所有内容，停止滚动")
-
-            # 获取所有作者卡片
-            card_items = page.locator("div.card-item").all()
-            total = len(card_items)
-            print(f"共找到{total}个作者卡片，从第{start_index}个开始提取...")
-
-            # 从起始序号开始遍历
-            for index in range(start_index - 1, total):
-                current_card_index = index + 1
-                card = card_items[index]
-                try:
-                    print(f"\n处理第{current_card_index}/{total}个作者...")
-                    time.sleep(random.uniform(1, 2))
-
-                    # 点击卡片前先获取链接（如果卡片本身是a标签）
-                    # 方法1: 尝试直接获取卡片的href属性
-                    author_url = ""
-                    try:
-                        # 检查卡片是否包含链接或自身是链接
-                        if card.locator("a").count() > 0:
-                            author_url = card.locator("a").first.get_attribute("href")
-                        else:
-                            # 如果卡片本身不是链接，尝试通过点击后获取新页面URL
-                            pass
-                    except Exception as e:
-                        print(f"提前获取链接失败: {str(e)}，将在页面打开后获取")
-
-                    # 点击卡片打开新页面
-                    with page.expect_popup() as popup_info:
-                        card.click()
-                    author_page = popup_info.value
-
-                    # 方法2: 从新页面获取URL（更可靠）
-                    author_url = author_page.url  # 获取当前页面的完整URL
-                    print(f"获取到主页链接: {author_url}")
-
-                    author_page.wait_for_selector("div.user-detail", timeout=10000)
-                    print("作者页面加载完成，开始读取信息...")
-                    time.sleep(random.uniform(2, 3))
-
-                    # 提取信息
-                    name = (
-                        author_page.locator(
-                            "div.profile-area p.user-name span"
-                        ).text_content()
-                        or "未获取到"
-                    )
-                    name = name.strip()
-
-                    info_h3s = author_page.locator("div.user-detail-info h3").all()
-                    works = (
-                        info_h3s[0].text_content().strip()
-                        if len(info_h3s) >= 1
-                        else "0"
-                    )
-                    fans = (
-                        info_h3s[1].text_content().strip()
-                        if len(info_h3s) >= 2
-                        else "0"
-                    )
-                    follows = (
-                        info_h3s[2].text_content().strip()
-                        if len(info_h3s) >= 3
-                        else "0"
-                    )
-
-                    desc = author_page.locator("p.user-desc").text_content() or "无简介"
-                    desc = desc.strip().replace("\n", " ")
-
-                    # 构建数据（包含主页链接）
-                    item_data = {
-                        "序号": current_card_index,
-                        "名字": name,
-                        "作品数": works,
-                        "粉丝数": fans,
-                        "关注数": follows,
-                        "简介": desc,
-                        "主页链接": author_url,  # 新增主页链接字段
-                    }
-                    authors_data.append(item_data)
-
-                    # 实时保存
-                    save_to_csv_realtime(item_data, csv_filename)
-
-                    # 打印结果
-                    print(f"【名字】: {name}")
-                    print(f"【作品】: {works} | 【粉丝】: {fans} | 【关注】: {follows}")
-                    print(f"【简介】: {desc}")
-                    print(f"【主页链接】: {author_url}")
-
-                    time.sleep(random.uniform(2, 3))
-                    author_page.close()
-
-                except Exception as e:
-                    print(f"处理第{current_card_index}个卡片时出错: {str(e)}")
-                    try:
-                        author_page.close()
-                    except:
-                        pass
-                    continue
-
-            print(
-                f"\n所有操作完成！共提取{len(authors_data)}条有效数据，已实时保存到 {csv_filename}"
+            await login_once(
+                vault, "kuaishou", context, page, "https://www.kuaishou.com/",
+                "请在浏览器中完成登录，登录后按回车键继续...",
             )
 
+            await harvest_keyword(page, search_keyword, store)
+            print("运行 python kuaishou_detail.py 爬取其余作者主页")
+
         finally:
-            browser.close()
+            await browser.close()
+            store.close()
+            if policy:
+                policy.report()
+
+
+async def main_batch(keyword_file):
+    """批量模式：一个浏览器登录一次，多个关键词在独立上下文中并发收集链接"""
+    keywords = read_keywords(keyword_file)
+    if not keywords:
+        return
+    print(f"共 {len(keywords)} 个关键词：{'、'.join(keywords)}")
+    store = StateStore()
+    try:
+        await run_keyword_batch(
+            keywords,
+            lambda page, keyword: harvest_keyword(page, keyword, store),
+            login_url="https://www.kuaishou.com/",
+            site="kuaishou",
+            concurrency=BATCH_CONCURRENCY,
+            resource_policy=ResourcePolicy("kuaishou") if BLOCK_RESOURCES else None,
+        )
+    finally:
+        store.close()
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 2 and sys.argv[1] == "batch":
+        # 批量模式：python kuaishou.py batch keywords.txt
+        asyncio.run(main_batch(sys.argv[2]))
+    else:
+        asyncio.run(main())
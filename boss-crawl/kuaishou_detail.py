@@ -0,0 +1,142 @@
+"""快手作者详情爬取（第二阶段）
+
+读取 kuaishou.py 收集的 kuaishou_link_{关键词}.csv，用多个页签并发打开作者主页，
+结果追加到 kuaishou_authors_{关键词}.csv。断点续爬以状态库中的主页链接为准，
+第一阶段已从搜索接口直接保存的作者不会再次打开。
+"""
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import asyncio
+import random
+import os
+from typing import Dict, List
+from crawl_engine import CrawlEngine
+from state_store import StateStore
+from resource_policy import ResourcePolicy
+from session_vault import SessionVault, login_once
+from session_pool import load_pool
+from kuaishou import MISSING, init_result_csv, read_links, save_to_csv_realtime
+
+TAB_COUNT = 3  # 同时并行的页签数量
+ACCOUNT_HOURLY_BUDGET = 120  # 多账号时每个账号每小时最多处理的主页数
+BLOCK_RESOURCES = False  # 改为True时拦截头像/封面/字体/自动播放媒体，只加载文本（默认关闭，确认页面能正常提取后再开启）
+
+
+async def extract_author_page(page, link: str) -> Dict[str, str]:
+    """从作者主页读取名字、作品数、粉丝数、关注数、简介"""
+    await page.wait_for_selector("div.user-detail", timeout=10000)
+    await asyncio.sleep(random.uniform(1, 2))  # 等待数字渲染
+
+    name = await page.locator("div.profile-area p.user-name span").first.text_content()
+    info_h3s = await page.locator("div.user-detail-info h3").all()
+    counts = [(await h3.text_content() or "").strip() for h3 in info_h3s[:3]]
+    counts += ["0"] * (3 - len(counts))
+    desc_loc = page.locator("p.user-desc")
+    desc = await desc_loc.first.text_content() if await desc_loc.count() else None
+
+    return {
+        "主页链接": link,
+        "名字": (name or MISSING).strip(),
+        "作品数": counts[0],
+        "粉丝数": counts[1],
+        "关注数": counts[2],
+        "简介": (desc or "无简介").strip().replace("\n", " "),
+    }
+
+
+async def crawl_author(page, link: str):
+    """单个作者主页的导航和提取：加载失败返回None（不保存，下次运行会重试）"""
+    try:
+        await asyncio.sleep(random.uniform(1, 3))  # 随机间隔（防反爬）
+        await page.goto(link, wait_until="domcontentloaded")
+        return await extract_author_page(page, link)
+    except PlaywrightTimeoutError:
+        print(f"  超时：作者主页未加载完成，跳过 {link}")
+    except Exception as e:
+        print(f"  处理错误：{str(e)[:50]}，跳过 {link}")
+    return None
+
+
+def create_engine(store=None, site=None, vault=None) -> CrawlEngine:
+    """创建爬取引擎（所有页签共用一个上下文，登录一次即可；保管库中有登录态时直接复用）
+
+    保管库中有多个账号时改用账号池：每个账号一个上下文，任务分给剩余预算最多的账号
+    """
+    vault = vault or SessionVault()
+    pool = load_pool("kuaishou", vault, ACCOUNT_HOURLY_BUDGET)
+    return CrawlEngine(
+        crawl_author,
+        tab_count=TAB_COUNT,
+        shared_context=True,
+        delay_range=(2, 3),
+        default_timeout=20000,
+        store=store,
+        site=site,
+        block_site="kuaishou",
+        on_block=vault.expiry_watcher("kuaishou"),
+        storage_state=None if pool else vault.load("kuaishou"),
+        session_pool=pool,
+        resource_policy=ResourcePolicy("kuaishou") if BLOCK_RESOURCES else None,
+    )
+
+
+def load_pending_links(keyword: str, store: StateStore) -> List[str]:
+    """链接文件中状态库尚未完成的作者主页"""
+    all_links = read_links(keyword)
+    if not all_links:
+        print(f"错误：链接文件 kuaishou_link_{keyword}.csv 不存在或为空，请先运行 kuaishou.py！")
+        return []
+    to_crawl = store.pending(f"kuaishou:{keyword}", all_links)
+    if not to_crawl:
+        print(f"所有 {len(all_links)} 个作者已爬取完成！")
+    return to_crawl
+
+
+async def crawl_kuaishou_authors(keyword: str) -> None:
+    """读取链接→登录→多页签并发爬取→实时保存"""
+    site = f"kuaishou:{keyword}"
+    store = StateStore()
+    to_crawl = load_pending_links(keyword, store)
+    if not to_crawl:
+        store.close()
+        return
+    csv_filename = init_result_csv(keyword)
+    print(f"待处理作者数：{len(to_crawl)}")
+
+    def on_result(link, item):
+        if item:
+            save_to_csv_realtime(item, csv_filename)
+            print(f"  【名字】: {item['名字']} | 【粉丝】: {item['粉丝数']} | 【作品】: {item['作品数']}")
+
+    vault = SessionVault()
+    engine = create_engine(store, site, vault)
+    try:
+        await engine.start()
+
+        # 没有可用登录态时访问第一个作者主页触发登录，登录后保存
+        if not engine.session_pool:
+            await login_once(
+                vault, "kuaishou", engine.contexts[0], engine.pages[0], to_crawl[0],
+                "在浏览器中完成快手登录后，按回车键开始爬取...",
+            )
+
+        results = await engine.run(to_crawl, on_result=on_result)
+        saved = sum(1 for _, item in results if item)
+
+        print(f"\n{'='*60}")
+        print(f"爬取完成！本次保存 {saved} 个作者，失败 {len(to_crawl) - saved} 个（下次运行会重试）")
+        print(f"结果文件路径：{os.path.abspath(csv_filename)}")
+    except Exception as main_e:
+        print(f"\n爬取主流程异常：{str(main_e)}")
+    finally:
+        await engine.stop()
+        store.close()
+
+
+if __name__ == "__main__":
+    keyword = input(
+        "请输入搜索关键词（需与 kuaishou_link_XXX.csv 中的 XXX 一致）："
+    ).strip()
+    if not keyword:
+        print("关键词不能为空！")
+    else:
+        asyncio.run(crawl_kuaishou_authors(keyword))
@@ -1,12 +1,20 @@
 from playwright.sync_api import sync_playwright
 import csv
 import time
-import random
 import os
+from state_store import StateStore
+from rate_limiter import AdaptiveRateLimiter
+from session_vault import SessionVault
+
+TARGET_RATE = 3  # 目标速率(个用户/分钟)，响应正常时逐步提速
+MAX_RATE = 6  # 速率上限(个用户/分钟)；遇到超时/验证码时速率减半并暂停冷却
 
 with sync_playwright() as p:
     browser = p.chromium.launch(headless=False)
-    context = browser.new_context()
+    # 保管库中有登录态时直接复用，不再每次输入账号密码
+    vault = SessionVault()
+    storage_state = vault.load("mcn")
+    context = browser.new_context(storage_state=storage_state)
     page = context.new_page()
     page_total = 50  # 假设总页数为50
     cur_page = 1  # 当前页数从1开始
@@ -14,19 +22,24 @@ with sync_playwright() as p:
     username = "18219514598"
     password = "246587"
 
-    # 计算CSV文件已有行数（已爬取数量）
     csv_path = 'mcn.csv'
-    start_index = 0
+    rate_limiter = AdaptiveRateLimiter(TARGET_RATE, MAX_RATE, name="mcn")
+
+    # 断点续爬：从状态库读取已完成的用户（key为"页码-序号"），从第一个还有未完成（未处理或失败）用户的页继续，
+    # 该页及之后页中已完成的用户在 get_user_info 中逐个跳过
+    store = StateStore()
+    done_keys = store.done_keys("mcn")
+    if done_keys:
+        cur_page = next(
+            (
+                page_no for page_no in range(1, page_total + 1)
+                if any(f"{page_no}-{i+1}" not in done_keys for i in range(page_size))
+            ),
+            page_total,
+        )
+        print(f"状态库中已完成 {len(done_keys)} 个用户，将从第 {cur_page} 页继续爬取")
     
-    if os.path.exists(csv_path):
-        with open(csv_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            existing_rows = sum(1 for row in reader)  # 计算行数
-            start_index = existing_rows - 1  # 减去表头行
-            print(f"发现已有 {start_index} 条数据，将从第 {start_index+1} 条开始爬取")
-            cur_page = start_index // page_size + 1  
-            start_index = start_index % page_size 
-    else:
+    if not os.path.exists(csv_path):
         # 创建CSV文件并写入表头
         with open(csv_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
             fieldnames = ['综合']
@@ -41,26 +54,31 @@ with sync_playwright() as p:
     page.wait_for_load_state("load")
     print("已打开初始页面")
 
-    # 2. 输入手机号和密码
-    try:
-        phone_input = page.locator('input[placeholder="手机号"]')
-        phone_input.wait_for(timeout=10000)
-        phone_input.fill(username)
-        
-        pwd_input = page.locator('input[placeholder="密码"]')
-        pwd_input.wait_for(timeout=10000)
-        pwd_input.fill(password)
-        print("已输入登录信息")
-        login_btn = page.locator('.login-btn')  # 定位ID为loginbtn的按钮
-        login_btn.click()
-    except Exception as e:
-        print(f"输入登录信息失败：{e}")
-        browser.close()
-        exit()
+    # 2. 登录态失效时页面仍显示登录表单：标记失效后重新输入手机号和密码
+    phone_input = page.locator('input[placeholder="手机号"]')
+    if storage_state and phone_input.count() and phone_input.first.is_visible():
+        vault.mark_expired("mcn", reason="页面显示登录表单")
+        storage_state = None
+    if not storage_state:
+        try:
+            phone_input.wait_for(timeout=10000)
+            phone_input.fill(username)
+            
+            pwd_input = page.locator('input[placeholder="密码"]')
+            pwd_input.wait_for(timeout=10000)
+            pwd_input.fill(password)
+            print("已输入登录信息")
+            login_btn = page.locator('.login-btn')  # 定位ID为loginbtn的按钮
+            login_btn.click()
+        except Exception as e:
+            print(f"输入登录信息失败：{e}")
+            browser.close()
+            exit()
 
-    # 3. 等待10秒
-    print("等待10秒...")
-    time.sleep(3)
+        # 3. 等待登录完成后保存登录态
+        print("等待登录完成...")
+        time.sleep(3)
+        vault.save_sync(context, "mcn")
 
     # 4. 点击第一个按钮
     # try:
@@ -187,14 +205,17 @@ with sync_playwright() as p:
 
     def get_user_info(new_window, first_run=False):
         global cur_page
-        global start_index
         
         # 6. 循环点击每个用户信息，处理新页签
         for i in range(page_size):
-            if i < start_index and  not first_run:
-                print(f"跳过已处理的用户 {i+1}（索引：{start_index}）")
+            job_key = f"{cur_page}-{i+1}"
+            if job_key in done_keys:
+                print(f"跳过已处理的用户 {i+1}（第{cur_page}页）")
                 continue
             
+            # 由限速器决定何时打开下一个用户，取代固定的随机等待
+            rate_limiter.wait()
+            
             # 重新定位元素（避免DOM刷新导致的失效）
             current_user = new_window.locator(".mcn-name").nth(i)
             
@@ -209,9 +230,8 @@ with sync_playwright() as p:
             
             # 7. 在新页签中提取数据
             try:
-                random_sleep = random.uniform(10, 20)
-                time.sleep(random_sleep)  # 等待页面加载
                 top_wrapper = profile_page.locator(".mcn-top-wrapper").nth(0)
+                top_wrapper.wait_for(timeout=30000)  # 等待页面加载
                 full_text = top_wrapper.text_content()  # 返回所有文本，按DOM顺序拼接
 
                 # 分割并清理文本
@@ -224,20 +244,20 @@ with sync_playwright() as p:
                     writer.writerow({
                         '综合': all_texts[0] if all_texts else '无文本'
                     })
+                store.mark_done("mcn", job_key, all_texts[0] if all_texts else '无文本')
+                rate_limiter.success()
                     
             except Exception as e:
                 print(f"提取数据失败：{e}")
+                store.mark_failed("mcn", job_key, e)
+                rate_limiter.failure("timeout" if "Timeout" in type(e).__name__ else "error")
             
             # 8. 关闭当前页签并切换回主页面
             profile_page.close()
             print(f"已关闭用户 {i+1} 的页签")
             new_window.bring_to_front()  # 切换回主页面
-            time.sleep(random.uniform(2, 5))  # 等待2-5秒，避免操作过快
             
-        # 可选：添加间隔时间避免操作过快
-        time.sleep(random.uniform(60, 120))
-
-        start_index = 0  # 重置起始索引
+        store.commit()
         cur_page += 1
         jump_to_page(new_window, cur_page)  # 跳转到指定页数
 
@@ -246,4 +266,6 @@ with sync_playwright() as p:
         jump_to_page(new_window, cur_page)
     else:
         get_user_info(new_window, True)
+    rate_limiter.report()
+    store.close()
     browser.close()
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""Playwright 资源拦截策略
+
+爬虫只读取文本，图片、视频封面、字体、自动播放的媒体都是无用流量。ResourcePolicy 通过
+context.route 按资源类型（以及可选的 URL 关键字）拦截请求，只放行 document/xhr/fetch/script
+等必要资源，并统计拦截数量和节省的流量。
+
+被拦截的请求没有真正下载，无法得知实际大小，节省流量按各类型的典型大小估算；
+放行请求的流量按响应头 Content-Length 统计。
+"""
+from collections import Counter
+
+# 各站点默认拦截的资源类型：需要 hover/点击/可见性判断的站点保留 stylesheet
+SITE_BLOCK_TYPES = {
+    "zhipin": {"image", "media", "font", "stylesheet"},
+    "douyin": {"image", "media", "font"},
+    "kuaishou": {"image", "media", "font"},
+    "bili": {"image", "media", "font"},
+    "tianyancha": {"image", "media", "font"},
+    "default": {"image", "media", "font"},
+}
+
+# 各站点额外拦截的 URL 关键字（统计/广告等与数据无关的请求）
+SITE_BLOCK_PATTERNS = {
+    "douyin": ["/web/report", "mcs.zijieapi.com"],
+    "bili": ["data.bilibili.com", "cm.bilibili.com"],
+}
+
+# 被拦截资源的估算大小(字节)
+ESTIMATED_BYTES = {
+    "image": 40 * 1024,
+    "media": 500 * 1024,
+    "font": 60 * 1024,
+    "stylesheet": 30 * 1024,
+    "other": 5 * 1024,
+}
+
+
+class ResourcePolicy:
+    """按站点拦截无用资源并统计节省的流量"""
+
+    def __init__(self, site="default", block_types=None, block_patterns=None):
+        self.site = site
+        self.block_types = set(block_types if block_types is not None else SITE_BLOCK_TYPES.get(site, SITE_BLOCK_TYPES["default"]))
+        self.block_patterns = list(block_patterns if block_patterns is not None else SITE_BLOCK_PATTERNS.get(site, []))
+        self.blocked = Counter()
+        self.allowed_bytes = 0
+
+    def should_block(self, resource_type, url):
+        """判断请求是否应被拦截"""
+        if resource_type in self.block_types:
+            return True
+        return any(pattern in url for pattern in self.block_patterns)
+
+    def _record_block(self, resource_type):
+        self.blocked[resource_type if resource_type in ESTIMATED_BYTES else "other"] += 1
+
+    def _record_response(self, response):
+        try:
+            self.allowed_bytes += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    async def install(self, context):
+        """在异步 API 的上下文（或页面）上启用拦截"""
+        async def handle(route):
+            request = route.request
+            if self.should_block(request.resource_type, request.url):
+                self._record_block(request.resource_type)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        await context.route("**/*", handle)
+        context.on("response", self._record_response)
+
+    def saved_bytes(self):
+        """估算节省的流量(字节)"""
+        return sum(ESTIMATED_BYTES[t] * n for t, n in self.blocked.items())
+
+    def report(self):
+        """打印拦截统计"""
+        total = sum(self.blocked.values())
+        if not total:
+            return
+        detail = "，".join(f"{t} {n}个" for t, n in self.blocked.most_common())
+        print(
+            f"[资源拦截:{self.site}] 共拦截 {total} 个请求（{detail}），"
+            f"估算节省 {self.saved_bytes() / 1024 / 1024:.1f}MB；"
+            f"放行流量 {self.allowed_bytes / 1024 / 1024:.1f}MB"
+        )
@@ -0,0 +1,209 @@
+"""多账号登录态池
+
+单个账号每小时能发出的请求有限，超过后就会被限流、弹验证码，只能整体停下来休息。
+账号池把保管库（SessionVault）中同一站点的多个账号组织起来：按滑动一小时窗口统计每个账号的
+请求数和出错率，每个任务分给剩余预算最多的账号；出错率过高或遇到验证码的账号暂停一段时间，
+遇到登录墙的账号标记登录态失效并移出账号池。总吞吐量随账号数量增长。
+
+添加账号（每个账号登录一次，登录态保存到 sessions/<站点>/<账号>.json）：
+    python session_pool.py add douyin 账号A https://www.douyin.com/
+查看账号状态：
+    python session_pool.py list douyin
+"""
+import asyncio
+import sys
+import time
+from collections import deque
+from playwright.async_api import async_playwright
+from session_vault import SessionVault, login_once
+
+ACCOUNT_HOURLY_BUDGET = 120  # 每个账号每小时的请求预算
+MAX_ERROR_RATE = 0.3  # 一小时窗口内出错率超过该值（且请求数不少于 MIN_SAMPLES）时暂停账号
+MIN_SAMPLES = 5
+ERROR_COOLDOWN = 600  # 出错率过高时账号暂停的秒数
+WINDOW = 3600  # 预算统计窗口(秒)
+
+
+class AccountUsage:
+    """单个账号在统计窗口内的请求和出错记录"""
+
+    def __init__(self, name):
+        self.name = name
+        self.requests = deque()  # 请求时间戳
+        self.errors = deque()  # 出错时间戳
+        self.paused_until = 0.0
+        self.total_requests = 0
+        self.total_errors = 0
+
+    def prune(self, now):
+        """丢弃统计窗口之外的记录"""
+        for records in (self.requests, self.errors):
+            while records and records[0] <= now - WINDOW:
+                records.popleft()
+
+    def error_rate(self):
+        return len(self.errors) / len(self.requests) if self.requests else 0.0
+
+
+class SessionPool:
+    """同一站点多个账号的登录态 + 每小时请求预算"""
+
+    def __init__(
+        self,
+        site,
+        vault=None,
+        accounts=None,
+        hourly_budget=ACCOUNT_HOURLY_BUDGET,
+        max_error_rate=MAX_ERROR_RATE,
+        error_cooldown=ERROR_COOLDOWN,
+    ):
+        """
+        site: 保管库中的站点名
+        accounts: 使用的账号列表，默认为保管库中该站点所有登录态可用的账号
+        hourly_budget: 每个账号每小时的请求预算
+        max_error_rate / error_cooldown: 出错率超过 max_error_rate 时暂停账号 error_cooldown 秒
+        """
+        self.site = site
+        self.vault = vault or SessionVault()
+        self.hourly_budget = hourly_budget
+        self.max_error_rate = max_error_rate
+        self.error_cooldown = error_cooldown
+        names = accounts if accounts is not None else self.vault.accounts(site)
+        self.accounts = {name: AccountUsage(name) for name in names if self.vault.status(site, name)[0]}
+        self.expired = []
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def storage_state(self, account):
+        """账号的登录态文件路径"""
+        return self.vault.path(self.site, account)
+
+    def remaining(self, account, now=None):
+        """账号在当前窗口内剩余的请求预算"""
+        usage = self.accounts[account]
+        usage.prune(now or time.time())
+        return self.hourly_budget - len(usage.requests)
+
+    def choose(self, now=None):
+        """选出剩余预算最多的可用账号
+
+        返回 (账号, 0)；暂时没有可用账号时返回 (None, 需要等待的秒数)；
+        所有账号都已失效时返回 (None, None)
+        """
+        if not self.accounts:
+            return None, None
+        now = now or time.time()
+        best, best_remaining = None, 0
+        next_free = None
+        for name, usage in self.accounts.items():
+            remaining = self.remaining(name, now)
+            if usage.paused_until > now:
+                free_at = usage.paused_until
+            elif remaining <= 0:
+                free_at = usage.requests[0] + WINDOW
+            else:
+                if remaining > best_remaining:
+                    best, best_remaining = name, remaining
+                continue
+            next_free = free_at if next_free is None else min(next_free, free_at)
+        if best:
+            return best, 0
+        return None, max(next_free - now, 1)
+
+    def record_request(self, account):
+        """记录账号发出的一次请求（占用一次预算）"""
+        usage = self.accounts.get(account)
+        if usage:
+            usage.requests.append(time.time())
+            usage.total_requests += 1
+
+    def record_error(self, account, reason="error"):
+        """记录账号的一次失败；出错率过高时暂停该账号"""
+        usage = self.accounts.get(account)
+        if not usage:
+            return
+        now = time.time()
+        usage.errors.append(now)
+        usage.total_errors += 1
+        usage.prune(now)
+        if len(usage.requests) >= MIN_SAMPLES and usage.error_rate() > self.max_error_rate:
+            self.pause(account, self.error_cooldown, f"出错率 {usage.error_rate():.0%}")
+
+    def pause(self, account, seconds, reason):
+        """暂停账号 seconds 秒，期间任务分给其他账号"""
+        usage = self.accounts.get(account)
+        if not usage:
+            return
+        usage.paused_until = max(usage.paused_until, time.time() + seconds)
+        print(f"[账号池:{self.site}] 账号 {account} 暂停 {seconds} 秒（{reason}）")
+
+    def block(self, account, reason, seconds):
+        """账号被拦截：登录墙时标记登录态失效并移出账号池，验证码等暂停 seconds 秒"""
+        self.record_error(account, reason)
+        if reason == "login":
+            self.vault.mark_expired(self.site, account)
+            if self.accounts.pop(account, None):
+                self.expired.append(account)
+            print(f"[账号池:{self.site}] 账号 {account} 已移出账号池，剩余 {len(self.accounts)} 个账号")
+        else:
+            self.pause(account, seconds, reason)
+
+    def report(self):
+        """打印每个账号的用量统计"""
+        now = time.time()
+        print(f"[账号池:{self.site}] 每账号每小时预算 {self.hourly_budget} 次")
+        for name, usage in self.accounts.items():
+            paused = "，暂停中" if usage.paused_until > now else ""
+            print(
+                f"  {name}: 共请求 {usage.total_requests} 次，失败 {usage.total_errors} 次，"
+                f"本小时剩余预算 {self.remaining(name, now)}{paused}"
+            )
+        for name in self.expired:
+            print(f"  {name}: 登录态已失效，需要重新登录（python session_pool.py add {self.site} {name} <登录页>）")
+
+
+def load_pool(site, vault=None, hourly_budget=ACCOUNT_HOURLY_BUDGET):
+    """保管库中有至少两个可用账号时返回账号池，否则返回 None（沿用单账号登录流程）"""
+    pool = SessionPool(site, vault, hourly_budget=hourly_budget)
+    if len(pool) < 2:
+        return None
+    print(f"[账号池:{site}] 使用 {len(pool)} 个账号：{'、'.join(pool.accounts)}")
+    return pool
+
+
+async def add_account(site, account, login_url):
+    """打开浏览器登录一个账号并保存登录态"""
+    vault = SessionVault()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        context = await browser.new_context()
+        page = await context.new_page()
+        try:
+            if not await login_once(
+                vault, site, context, page, login_url,
+                f"请在浏览器中登录账号 {account}，登录后按回车键保存登录态...", account,
+            ):
+                print(f"账号 {site}/{account} 的登录态仍然可用，无需重新登录")
+        finally:
+            await browser.close()
+
+
+def list_accounts(site):
+    """打印站点下所有账号的登录态状态"""
+    vault = SessionVault()
+    accounts = vault.accounts(site)
+    if not accounts:
+        print(f"站点 {site} 还没有保存任何账号")
+    for account in accounts:
+        ok, reason = vault.status(site, account)
+        print(f"  {account}: {'可用' if ok else reason}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5 and sys.argv[1] == "add":
+        asyncio.run(add_account(sys.argv[2], sys.argv[3], sys.argv[4]))
+    elif len(sys.argv) == 3 and sys.argv[1] == "list":
+        list_accounts(sys.argv[2])
+    else:
+        print("用法：python session_pool.py add <站点> <账号> <登录页URL> | list <站点>")
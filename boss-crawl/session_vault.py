@@ -0,0 +1,148 @@
+"""登录态保管库
+
+第一次手动登录后把 Playwright 的 storage_state（Cookie + localStorage）按 站点/账号
+保存到 sessions/ 目录，之后的运行以及引擎中的每个上下文都直接从保存的登录态启动，
+不必每次扫码或输入密码。
+
+登录态失效有两种判断方式：
+- 离线：保存的登录 Cookie 缺失或已过期（SESSION_COOKIES）
+- 在线：爬取中遇到登录墙（block_detector 返回 "login"）时调用 mark_expired 标记
+被标记失效的登录态不会再被加载，下次运行会重新提示登录。
+"""
+import json
+import os
+import time
+
+SESSION_DIR = "sessions"
+
+# 各站点表示已登录的 Cookie（任意一个有效即视为已登录）；未列出的站点只按在线检测判断
+SESSION_COOKIES = {
+    "douyin": ["sessionid", "sessionid_ss"],
+    "kuaishou": ["kuaishou.server.web_st", "userId"],
+    "tianyancha": ["auth_token"],
+}
+
+
+def cookies_valid(site, state, now=None):
+    """检查 storage_state 中的登录 Cookie 是否存在且未过期"""
+    names = SESSION_COOKIES.get(site)
+    if not names:
+        return True
+    now = now or time.time()
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") in names and cookie.get("value"):
+            expires = cookie.get("expires", -1)
+            if expires == -1 or expires > now:
+                return True
+    return False
+
+
+class SessionVault:
+    """按 站点/账号 保存和加载登录态"""
+
+    def __init__(self, root=SESSION_DIR):
+        self.root = root
+
+    def path(self, site, account="default"):
+        """登录态文件路径"""
+        return os.path.join(self.root, site, f"{account}.json")
+
+    def _meta_path(self, site, account):
+        return os.path.join(self.root, site, f"{account}.meta.json")
+
+    def _read_meta(self, site, account):
+        try:
+            with open(self._meta_path(site, account), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, site, account, meta):
+        with open(self._meta_path(site, account), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    def accounts(self, site):
+        """站点下所有保存过登录态的账号"""
+        site_dir = os.path.join(self.root, site)
+        if not os.path.isdir(site_dir):
+            return []
+        return sorted(
+            name[: -len(".json")]
+            for name in os.listdir(site_dir)
+            if name.endswith(".json") and not name.endswith(".meta.json")
+        )
+
+    def status(self, site, account="default"):
+        """返回 (是否可用, 原因)"""
+        path = self.path(site, account)
+        if not os.path.exists(path):
+            return False, "未保存登录态"
+        meta = self._read_meta(site, account)
+        if meta.get("status") == "expired":
+            return False, f"已标记失效：{meta.get('reason', '')}"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False, "登录态文件损坏"
+        if not cookies_valid(site, state):
+            return False, "登录Cookie已过期"
+        return True, ""
+
+    def load(self, site, account="default"):
+        """返回可用的登录态文件路径（可直接传给 new_context(storage_state=...)），不可用时返回 None"""
+        ok, reason = self.status(site, account)
+        if not ok:
+            if reason != "未保存登录态":
+                print(f"[登录态] {site}/{account} 不可用（{reason}），需要重新登录")
+            return None
+        print(f"[登录态] 已加载 {site}/{account}")
+        return self.path(site, account)
+
+    def _after_save(self, site, account):
+        self._write_meta(site, account, {"status": "ok", "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        print(f"[登录态] 已保存 {site}/{account} -> {self.path(site, account)}")
+
+    async def save(self, context, site, account="default"):
+        """保存异步 API 上下文的登录态"""
+        os.makedirs(os.path.join(self.root, site), exist_ok=True)
+        await context.storage_state(path=self.path(site, account))
+        self._after_save(site, account)
+
+    def save_sync(self, context, site, account="default"):
+        """保存同步 API 上下文的登录态"""
+        os.makedirs(os.path.join(self.root, site), exist_ok=True)
+        context.storage_state(path=self.path(site, account))
+        self._after_save(site, account)
+
+    def expiry_watcher(self, site, account="default"):
+        """返回 on_block 回调：页签遇到登录墙时把该账号的登录态标记为失效"""
+        def on_block(reason):
+            if reason == "login":
+                self.mark_expired(site, account)
+        return on_block
+
+    def mark_expired(self, site, account="default", reason="遇到登录墙"):
+        """标记登录态失效，下次运行会重新提示登录"""
+        if not os.path.exists(self.path(site, account)):
+            return
+        meta = self._read_meta(site, account)
+        if meta.get("status") == "expired":
+            return
+        meta.update({"status": "expired", "reason": reason, "expired_at": time.strftime("%Y-%m-%d %H:%M:%S")})
+        self._write_meta(site, account, meta)
+        print(f"[登录态] {site}/{account} 已失效（{reason}），下次运行需要重新登录")
+
+
+async def login_once(vault, site, context, page, login_url, prompt, account="default"):
+    """保管库中有可用登录态时直接返回（上下文应已用 vault.load 的结果创建）；
+    否则打开登录页等待手动登录，并保存登录态
+
+    返回 True 表示本次进行了手动登录
+    """
+    if vault.status(site, account)[0]:
+        return False
+    await page.goto(login_url, wait_until="domcontentloaded")
+    input(prompt)
+    await vault.save(context, site, account)
+    return True
@@ -0,0 +1,170 @@
+"""SQLite 爬取状态库
+
+所有脚本共用一个 SQLite 文件记录每个任务的状态（pending/done/failed）、尝试次数、
+最后一次错误和结果，按 (site, key) 唯一定位。脚本启动时直接从库里取出未完成的任务，
+不必再手动填写起始行或重新扫描输出文件。
+
+写入采用分组提交：多次写入累积在同一个事务里，达到条数或时间阈值才 commit，
+避免每条结果一次磁盘同步。崩溃时最多丢失最后一组未提交的状态，这些任务下次会被重新爬取。
+
+写入顺序：任务的结果先写到输出文件（CellJournal 日志、CSV），再在状态库中记为完成；
+输出有缓冲时用 before_commit 注册其落盘方法，保证状态库提交的"已完成"都已经落盘。
+"""
+import json
+import sqlite3
+import time
+
+DEFAULT_DB_PATH = "crawl_state.db"
+
+
+class StateStore:
+    """任务状态库"""
+
+    def __init__(self, path=DEFAULT_DB_PATH, commit_every=50, commit_interval=5):
+        """
+        path: SQLite 文件路径
+        commit_every: 累积多少次写入提交一次
+        commit_interval: 距上次提交超过多少秒时，下一次写入会触发提交
+        """
+        self.path = path
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        # 允许在其他线程中使用（如协调服务），调用方自行加锁保证串行
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                site TEXT NOT NULL,
+                key TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                result TEXT,
+                updated_at REAL,
+                PRIMARY KEY (site, key)
+            )
+            """
+        )
+        self.conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.time()
+        self._before_commit = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, sql, params):
+        """执行一次写入，按阈值分组提交"""
+        self.conn.execute(sql, params)
+        self._uncommitted += 1
+        if (
+            self._uncommitted >= self.commit_every
+            or time.time() - self._last_commit >= self.commit_interval
+        ):
+            self.commit()
+
+    def before_commit(self, callback):
+        """注册每次提交前调用的回调（如 CellJournal.flush），输出先落盘，状态才提交"""
+        self._before_commit.append(callback)
+
+    def commit(self):
+        """提交累积的写入"""
+        if self._uncommitted:
+            for callback in self._before_commit:
+                callback()
+            self.conn.commit()
+            self._uncommitted = 0
+        self._last_commit = time.time()
+
+    def close(self):
+        """提交并关闭"""
+        self.commit()
+        self.conn.close()
+
+    def add_jobs(self, site, keys):
+        """登记任务（已存在的保持原状态）"""
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO jobs (site, key, updated_at) VALUES (?, ?, ?)",
+            [(site, str(key), time.time()) for key in keys],
+        )
+        self.conn.commit()
+
+    def pending(self, site, keys=None):
+        """返回未完成的任务 key；传入 keys 时只在其中筛选并保持原顺序"""
+        done = self.done_keys(site)
+        if keys is None:
+            rows = self.conn.execute(
+                "SELECT key FROM jobs WHERE site = ? AND status != 'done' ORDER BY rowid",
+                (site,),
+            )
+            return [row[0] for row in rows]
+        return [key for key in keys if str(key) not in done]
+
+    def done_keys(self, site):
+        """返回已完成任务的 key 集合"""
+        rows = self.conn.execute(
+            "SELECT key FROM jobs WHERE site = ? AND status = 'done'", (site,)
+        )
+        return {row[0] for row in rows}
+
+    def is_done(self, site, key):
+        """任务是否已完成"""
+        row = self.conn.execute(
+            "SELECT 1 FROM jobs WHERE site = ? AND key = ? AND status = 'done'",
+            (site, str(key)),
+        ).fetchone()
+        return row is not None
+
+    def mark_done(self, site, key, result=None, attempts=1):
+        """记录任务完成及其结果（结果以 JSON 保存）"""
+        self._write(
+            """
+            INSERT INTO jobs (site, key, status, attempts, last_error, result, updated_at)
+            VALUES (?, ?, 'done', ?, NULL, ?, ?)
+            ON CONFLICT (site, key) DO UPDATE SET
+                status = 'done', attempts = jobs.attempts + excluded.attempts,
+                result = excluded.result, updated_at = excluded.updated_at
+            """,
+            (site, str(key), attempts, json.dumps(result, ensure_ascii=False), time.time()),
+        )
+
+    def mark_failed(self, site, key, error, attempts=1):
+        """记录任务失败及最后一次错误（下次运行仍会被 pending 返回）"""
+        self._write(
+            """
+            INSERT INTO jobs (site, key, status, attempts, last_error, updated_at)
+            VALUES (?, ?, 'failed', ?, ?, ?)
+            ON CONFLICT (site, key) DO UPDATE SET
+                status = 'failed', attempts = jobs.attempts + excluded.attempts,
+                last_error = excluded.last_error, updated_at = excluded.updated_at
+            """,
+            (site, str(key), attempts, str(error)[:500], time.time()),
+        )
+
+    def get_result(self, site, key):
+        """读取已完成任务的结果，没有则返回 None"""
+        row = self.conn.execute(
+            "SELECT result FROM jobs WHERE site = ? AND key = ? AND status = 'done'",
+            (site, str(key)),
+        ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def results(self, site):
+        """返回所有已完成任务的 [(key, result), ...]，按首次登记顺序"""
+        rows = self.conn.execute(
+            "SELECT key, result FROM jobs WHERE site = ? AND status = 'done' ORDER BY rowid",
+            (site,),
+        )
+        return [(key, json.loads(result) if result is not None else None) for key, result in rows]
+
+    def summary(self, site):
+        """按状态统计任务数"""
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE site = ? GROUP BY status", (site,)
+        )
+        return dict(rows.fetchall())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 脚本以平铺模块的方式互相导入（from crawl_engine import ...），测试时把 boss-crawl 目录加入导入路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
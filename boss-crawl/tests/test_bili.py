@@ -0,0 +1,41 @@
+import csv
+
+import pytest
+
+pytest.importorskip("playwright")
+from bili import PageWriter, page_site
+from state_store import StateStore
+
+
+def user(name):
+    return {'用户名': name, '粉丝数量': '1万', '视频数量': '10', '用户简介': '', '主页链接': f'//space.bilibili.com/{name}'}
+
+
+def read_names(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['用户名'] for row in csv.DictReader(f)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    with StateStore(str(tmp_path / "state.db")) as store:
+        yield store
+
+
+def test_resume_appends_only_pending_pages(tmp_path, store):
+    path = str(tmp_path / "bili.csv")
+    writer = PageWriter(path, "说影", 3, store)
+    writer.add(1, [user("a"), user("b")])
+    writer.add(3, [user("e")])
+    writer.add(2, None)  # 第2页加载失败，第3页随之写入
+    writer.close()
+    assert store.done_keys(page_site("说影")) == {"1", "3"}
+    assert store.get_result(page_site("说影"), 1) == {'total_pages': 3}
+
+    done_pages = {int(page_no) for page_no in store.done_keys(page_site("说影"))}
+    writer = PageWriter(path, "说影", 3, store, done_pages)
+    writer.add(2, [user("b"), user("c")])  # 结果翻页后 b 出现在第2页，不重复写入
+    writer.close()
+    assert writer.next_page == 4
+    assert read_names(path) == ["a", "b", "e", "c"]
+    assert store.done_keys(page_site("说影")) == {"1", "2", "3"}
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from block_detector import SITE_SIGNATURES, detect_block
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "blocks")
+
+
+def load(name):
+    if name is None:
+        return ""
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+# (站点, 页面URL, 保存的页面, 期望结果)
+POSITIVE = [
+    ("zhipin", "https://www.zhipin.com/web/passport/zp/verify?callbackUrl=%2Fgongsi%2Fabc.html", None, "captcha"),
+    ("zhipin", "https://www.zhipin.com/web/common/security-check.html?seed=x", None, "captcha"),
+    ("zhipin", "https://www.zhipin.com/gongsi/abc.html", "zhipin_captcha.html", "captcha"),
+    ("zhipin", "https://www.zhipin.com/web/user/?ka=header-login", None, "login"),
+    ("zhipin", "https://www.zhipin.com/web/user/login?intent=1", None, "login"),
+    ("douyin", "https://www.douyin.com/verifycenter/captcha?from=profile", None, "captcha"),
+    ("douyin", "https://verify.snssdk.com/view?aid=6383", None, "captcha"),
+    ("douyin", "https://www.douyin.com/user/MS4wLjABAAAA", "douyin_captcha.html", "captcha"),
+    ("douyin", "https://sso.douyin.com/login/?service=https%3A%2F%2Fwww.douyin.com", None, "login"),
+    ("douyin", "https://www.douyin.com/passport/web/login/", None, "login"),
+    ("kuaishou", "https://captcha.zt.kuaishou.com/iframe/index.html?captchaSession=x", None, "captcha"),
+    ("kuaishou", "https://www.kuaishou.com/captcha?redirect=%2Fprofile%2Fx", None, "captcha"),
+    ("kuaishou", "https://www.kuaishou.com/profile/3xabc", "kuaishou_captcha.html", "captcha"),
+    ("kuaishou", "https://passport.kuaishou.com/pc/account/login/", None, "login"),
+    ("tianyancha", "https://antirobot.tianyancha.com/captcha/verify?return_url=x", None, "captcha"),
+    ("tianyancha", "https://captcha.tianyancha.com/?rtnURL=x", None, "captcha"),
+    ("tianyancha", "https://www.tianyancha.com/company/9519792", "tianyancha_captcha.html", "captcha"),
+    ("tianyancha", "https://www.tianyancha.com/login?from=https%3A%2F%2Fwww.tianyancha.com", None, "login"),
+    ("tianyancha", "https://www.tianyancha.com/vipintro/?jsid=SEM", None, "login"),
+    ("tianyancha", "https://www.tianyancha.com/company/9519792", "tianyancha_login.html", "login"),
+    ("chanmama", "https://www.chanmama.com/captcha?redirect=x", None, "captcha"),
+    ("chanmama", "https://www.chanmama.com/authorDetail/123", "chanmama_captcha.html", "captcha"),
+    ("chanmama", "https://www.chanmama.com/login?redirect=%2FauthorDetail%2F123", None, "login"),
+    ("aiqicha", "https://aiqicha.baidu.com/captcha/index?from=detail", None, "captcha"),
+    ("aiqicha", "https://wappass.baidu.com/static/captcha/tuxing.html?ak=x", None, "captcha"),
+    ("aiqicha", "https://captcha.example.com/check", None, "captcha"),
+    ("aiqicha", "https://example.com/verifycenter/index", None, "captcha"),
+    ("aiqicha", "https://aiqicha.baidu.com/company_detail_1", "default_geetest.html", "captcha"),
+    ("aiqicha", "https://aiqicha.baidu.com/company_detail_1", "default_nc.html", "captcha"),
+    ("aiqicha", "https://aiqicha.baidu.com/company_detail_1", "kuaishou_captcha.html", "captcha"),
+]
+
+NEGATIVE = [
+    ("zhipin", "https://www.zhipin.com/gongsi/abc.html", "zhipin_company.html"),
+    ("douyin", "https://www.douyin.com/user/MS4wLjABAAAA?from_tab_name=main", "douyin_profile.html"),
+    ("kuaishou", "https://www.kuaishou.com/profile/3xabc", "kuaishou_profile.html"),
+    ("tianyancha", "https://www.tianyancha.com/company/9519792", "tianyancha_company.html"),
+    ("chanmama", "https://www.chanmama.com/authorDetail/123", "chanmama_introduce.html"),
+    ("aiqicha", "https://example.com/account/verify-email", "default_verify_email.html"),
+    ("aiqicha", "https://example.com/orders?verify=1", None),
+    ("aiqicha", "https://aiqicha.baidu.com/company_detail_1", "tianyancha_company.html"),
+    ("aiqicha", "", None),
+]
+
+
+@pytest.mark.parametrize("site, url, fixture, expected", POSITIVE)
+def test_detects_block(site, url, fixture, expected):
+    assert detect_block(site, url, load(fixture)) == expected
+
+
+@pytest.mark.parametrize("site, url, fixture", NEGATIVE)
+def test_normal_pages_are_not_blocked(site, url, fixture):
+    assert detect_block(site, url, load(fixture)) is None
+
+
+def test_url_check_does_not_need_html():
+    assert detect_block("douyin", "https://www.douyin.com/verifycenter/captcha") == "captcha"
+    assert detect_block("douyin", None, None) is None
+
+
+def test_every_signature_has_a_positive_fixture():
+    for site, signatures in SITE_SIGNATURES.items():
+        # 未登记的站点使用 default 特征
+        cases = [
+            (url, load(fixture))
+            for s, url, fixture, _ in POSITIVE
+            if s == site or (site == "default" and s not in SITE_SIGNATURES)
+        ]
+        for kind, signature in signatures.items():
+            for pattern in signature["url"]:
+                assert any(pattern in url for url, _ in cases), (site, kind, pattern)
+            for pattern in signature["html"]:
+                assert any(pattern in html for _, html in cases), (site, kind, pattern)
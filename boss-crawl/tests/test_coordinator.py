@@ -0,0 +1,142 @@
+import asyncio
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from coordinator import COORDINATOR_DB, Coordinator, CoordinatorHandler
+from state_store import DEFAULT_DB_PATH, StateStore
+from worker_client import CoordinatorClient, collect_results, run_worker
+
+
+class FakeEngine:
+    """按顺序处理任务的引擎替身，结果为 name-<key>"""
+
+    tab_count = 2
+
+    async def start(self):
+        pass
+
+    async def run(self, jobs, on_result=None):
+        for job in jobs:
+            on_result(job, f"name-{job}")
+
+
+@pytest.fixture
+def coordinator_url(tmp_path, monkeypatch):
+    # 与脚本在同一目录下运行，各自使用默认状态库
+    monkeypatch.chdir(tmp_path)
+    store = StateStore(COORDINATOR_DB)
+    CoordinatorHandler.coordinator = Coordinator(store)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CoordinatorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    store.close()
+
+
+def test_enqueue_worker_collect_writes_rows(coordinator_url):
+    assert COORDINATOR_DB != DEFAULT_DB_PATH
+    client = CoordinatorClient(coordinator_url, worker="test")
+    assert client.enqueue("boss", [{"key": "1"}, {"key": "2"}, {"key": "3"}]) == 3
+
+    asyncio.run(run_worker(FakeEngine(), client, "boss", to_job=lambda job: job["key"], job_key=lambda id: id))
+    assert client.status("boss") == {"pending": 0, "leased": 0, "done": 3, "failed": 0}
+
+    rows = {}
+    with StateStore() as local:
+        assert collect_results(client, "boss", local, rows.__setitem__) == 3
+        # 再次 collect 不重复写入
+        assert collect_results(client, "boss", local, rows.__setitem__) == 0
+    assert rows == {"1": "name-1", "2": "name-2", "3": "name-3"}
+
+
+def test_collect_skips_results_rejected_by_writer(coordinator_url):
+    client = CoordinatorClient(coordinator_url, worker="test")
+    client.enqueue("boss", [{"key": "1"}, {"key": "2"}])
+    asyncio.run(run_worker(FakeEngine(), client, "boss", to_job=lambda job: job["key"], job_key=lambda id: id))
+
+    rows = {}
+
+    def write(key, result):
+        if key != "1":
+            return False
+        rows[key] = result
+
+    with StateStore() as local:
+        assert collect_results(client, "boss", local, write) == 1
+        assert local.is_done("boss", "1")
+        assert not local.is_done("boss", "2")
+    assert rows == {"1": "name-1"}
+
+
+def test_worker_reports_failures(coordinator_url):
+    client = CoordinatorClient(coordinator_url, worker="test")
+    client.enqueue("boss", [{"key": "1"}])
+    CoordinatorHandler.coordinator.max_attempts = 1
+    asyncio.run(
+        run_worker(
+            FakeEngine(), client, "boss",
+            to_job=lambda job: job["key"], job_key=lambda id: id, is_failure=lambda result: True,
+        )
+    )
+    assert client.status("boss")["failed"] == 1
+    assert client.results("boss") == []
+
+
+def test_expired_lease_is_requeued(tmp_path):
+    with StateStore(str(tmp_path / COORDINATOR_DB)) as store:
+        coordinator = Coordinator(store, lease_seconds=0, max_attempts=2)
+        coordinator.enqueue("q", [{"key": "a", "data": 1}])
+        jobs, _ = coordinator.lease("q", "w1", 5)
+        assert jobs == [{"key": "a", "data": 1}]
+        # 租约立即过期，重新分配给其他工作进程
+        jobs, _ = coordinator.lease("q", "w2", 5)
+        assert jobs == [{"key": "a", "data": 1}]
+        # 达到分发上限后记为失败
+        jobs, remaining = coordinator.lease("q", "w3", 5)
+        assert jobs == [] and remaining == 0
+        assert coordinator.status("q")["failed"] == 1
+
+
+def test_enqueue_ignores_done_and_queued_keys(tmp_path):
+    with StateStore(str(tmp_path / COORDINATOR_DB)) as store:
+        coordinator = Coordinator(store)
+        coordinator.complete("q", "w", "a", "done")
+        assert coordinator.enqueue("q", [{"key": "a"}, {"key": "b"}, {"key": "b"}]) == 1
+
+
+def test_stale_reports_do_not_touch_other_workers_lease(tmp_path):
+    with StateStore(str(tmp_path / COORDINATOR_DB)) as store:
+        coordinator = Coordinator(store, lease_seconds=0, max_attempts=3)
+        coordinator.enqueue("q", [{"key": "a", "data": 1}])
+        coordinator.lease("q", "w1", 1)
+        coordinator.lease_seconds = 60
+        # w1 的租约过期，任务重新分配给 w2
+        assert coordinator.lease("q", "w2", 1)[0] == [{"key": "a", "data": 1}]
+        # w1 迟到的失败报告被忽略：w2 的租约保留，任务不会重复入队
+        assert coordinator.fail("q", "w1", "a", "超时") is False
+        assert coordinator.status("q") == {"pending": 0, "leased": 1, "done": 0, "failed": 0}
+        # w1 迟到的结果以先到为准被采用，但不释放 w2 的租约；w2 之后的提交和失败报告都被忽略
+        assert coordinator.complete("q", "w1", "a", "name-a") is True
+        assert coordinator.leases["q"]["a"][0] == "w2"
+        assert coordinator.complete("q", "w2", "a", "other") is False
+        assert coordinator.fail("q", "w2", "a", "超时") is False
+        assert coordinator.status("q") == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+        assert store.get_result("q", "a") == "name-a"
+
+
+def test_restart_recovers_by_enqueueing_again(tmp_path):
+    path = str(tmp_path / COORDINATOR_DB)
+    with StateStore(path) as store:
+        coordinator = Coordinator(store)
+        coordinator.enqueue("q", [{"key": "a"}, {"key": "b"}])
+        coordinator.lease("q", "w1", 2)
+        coordinator.complete("q", "w1", "a", "name-a")
+    # 重启后队列和租约为空，重新 enqueue 时跳过已完成的任务
+    with StateStore(path) as store:
+        coordinator = Coordinator(store)
+        assert coordinator.enqueue("q", [{"key": "a"}, {"key": "b"}]) == 1
+        assert coordinator.lease("q", "w2", 5)[0] == [{"key": "b", "data": None}]
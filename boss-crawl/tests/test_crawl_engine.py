@@ -0,0 +1,223 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+from block_detector import BlockedError
+from crawl_engine import CrawlEngine
+from state_store import StateStore
+
+
+class FakePage:
+    """页签替身：只提供引擎和 block_detector 用到的 url / content() / is_closed()"""
+
+    def __init__(self, url="https://www.zhipin.com/gongsi/abc.html", html="<html></html>", context=None):
+        self.url = url
+        self.html = html
+        self.context = context
+        self.closed = False
+
+    async def content(self):
+        return self.html
+
+    def is_closed(self):
+        return self.closed
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage(context=self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        for page in self.pages:
+            page.closed = True
+
+
+class FakeBrowser:
+    """new_context() 的前 fail_after 次正常返回，之后抛出异常（模拟浏览器崩溃）"""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.created = 0
+
+    async def new_context(self, **options):
+        if self.fail_after is not None and self.created >= self.fail_after:
+            raise RuntimeError("浏览器已关闭")
+        self.created += 1
+        return FakeContext()
+
+
+def make_engine(handler, tab_count=2, **kwargs):
+    """不启动浏览器的引擎：预先放入页签替身，start() 直接返回"""
+    engine = CrawlEngine(handler, tab_count=tab_count, shared_context=True, **kwargs)
+    engine.browser = object()
+    engine.pages = [FakePage() for _ in range(tab_count)]
+    return engine
+
+
+def flaky(failures):
+    """前 failures[job] 次调用抛出异常，之后返回 name-<job>"""
+    calls = {}
+
+    async def handler(page, job):
+        calls[job] = calls.get(job, 0) + 1
+        if calls[job] <= failures.get(job, 0):
+            raise RuntimeError(f"{job} 第{calls[job]}次失败")
+        return f"name-{job}"
+
+    handler.calls = calls
+    return handler
+
+
+@pytest.fixture
+def store(tmp_path):
+    with StateStore(str(tmp_path / "state.db")) as store:
+        yield store
+
+
+def test_all_jobs_complete_once(store):
+    handler = flaky({})
+    engine = make_engine(handler, store=store, site="boss")
+    results = asyncio.run(engine.run(["1", "2", "3"]))
+    assert sorted(results) == [("1", "name-1"), ("2", "name-2"), ("3", "name-3")]
+    assert handler.calls == {"1": 1, "2": 1, "3": 1}
+    assert store.done_keys("boss") == {"1", "2", "3"}
+
+
+def test_failed_job_is_retried_until_success(store):
+    handler = flaky({"1": 2})
+    engine = make_engine(handler, max_retries=2, retry_backoff=0.01, store=store, site="boss")
+    results = asyncio.run(engine.run(["1", "2"]))
+    assert sorted(results) == [("1", "name-1"), ("2", "name-2")]
+    assert engine.attempts["1"] == 3
+    row = store.conn.execute("SELECT status, attempts FROM jobs WHERE key = '1'").fetchone()
+    assert row == ("done", 3)
+
+
+def test_exhausted_retries_use_on_error(store):
+    handler = flaky({"1": 10})
+    engine = make_engine(
+        handler, max_retries=1, retry_backoff=0, on_error=lambda job, e: "错误", store=store, site="boss"
+    )
+    results = asyncio.run(engine.run(["1"]))
+    assert results == [("1", "错误")]
+    assert handler.calls["1"] == 2
+    assert store.summary("boss") == {"failed": 1}
+    assert store.pending("boss", ["1"]) == ["1"]
+
+
+def test_on_result_sees_every_job():
+    seen = []
+    engine = make_engine(flaky({"2": 1}), max_retries=1, retry_backoff=0)
+    asyncio.run(engine.run(["1", "2"], on_result=lambda job, result: seen.append((job, result))))
+    assert sorted(seen) == [("1", "name-1"), ("2", "name-2")]
+
+
+def test_blocked_job_is_requeued_and_tab_quarantined():
+    calls = {}
+    reasons = []
+
+    async def handler(page, job):
+        calls[job] = calls.get(job, 0) + 1
+        if job == "1" and calls[job] == 1:
+            raise BlockedError("captcha", page.url)
+        return f"name-{job}"
+
+    engine = make_engine(handler, quarantine_seconds=0, on_block=reasons.append)
+    results = asyncio.run(engine.run(["1", "2"]))
+    assert sorted(results) == [("1", "name-1"), ("2", "name-2")]
+    assert reasons == ["captcha"]
+    assert engine.attempts["1"] == 1  # 拦截不计入尝试次数
+
+
+def test_empty_result_on_captcha_page_is_detected():
+    calls = {}
+
+    async def handler(page, job):
+        calls[job] = calls.get(job, 0) + 1
+        if calls[job] == 1:
+            page.url = "https://www.zhipin.com/web/passport/zp/verify?callbackUrl=x"
+            return None
+        page.url = "https://www.zhipin.com/gongsi/abc.html"
+        return f"name-{job}"
+
+    engine = make_engine(handler, tab_count=1, block_site="zhipin", quarantine_seconds=0)
+    assert asyncio.run(engine.run(["1"])) == [("1", "name-1")]
+    assert engine.blocks == {"1": 1}
+
+
+def test_repeated_blocks_fall_back_to_failure():
+    async def handler(page, job):
+        raise BlockedError("login", page.url)
+
+    engine = make_engine(handler, tab_count=1, max_blocks=2, quarantine_seconds=0, on_error=lambda job, e: "错误")
+    assert asyncio.run(engine.run(["1"])) == [("1", "错误")]
+    assert engine.blocks == {"1": 2}
+
+
+def test_job_is_marked_done_only_after_on_result(store):
+    done_when_saved = []
+
+    def on_result(job, result):
+        done_when_saved.append(store.is_done("boss", job))
+        if job == "2":
+            raise OSError("磁盘已满")
+
+    engine = make_engine(flaky({}), store=store, site="boss")
+    asyncio.run(engine.run(["1", "2"], on_result=on_result))
+    assert done_when_saved == [False, False]
+    # 保存失败的任务不记为完成，续爬时重新处理
+    assert store.done_keys("boss") == {"1"}
+    assert store.pending("boss", ["1", "2"]) == ["2"]
+
+
+def make_isolated_engine(handler, browser, tab_count=2, **kwargs):
+    """每个页签独立上下文的引擎，上下文由 FakeBrowser 创建"""
+    engine = CrawlEngine(handler, tab_count=tab_count, shared_context=False, **kwargs)
+    engine.browser = browser
+
+    async def open_tabs():
+        for i in range(tab_count):
+            engine.pages.append(await engine._new_page(await engine._new_context(), i + 1))
+
+    asyncio.run(open_tabs())
+    return engine
+
+
+def test_tab_is_usable_after_run_ends_during_quarantine():
+    async def handler(page, job):
+        assert not page.is_closed(), "任务分配到了已关闭的页签"
+        if job == "blocked":
+            raise BlockedError("captcha", page.url)
+        return f"name-{job}"
+
+    engine = make_isolated_engine(handler, FakeBrowser(), quarantine_seconds=0.5, max_blocks=1, on_error=lambda job, e: "错误")
+    # 第一轮：页签被拦截后进入隔离，另一个页签处理完队列，run() 在隔离期间结束
+    asyncio.run(engine.run(["blocked"]))
+    assert not any(page.is_closed() for page in engine.pages)
+    # 第二轮：两个页签都能正常处理任务
+    results = asyncio.run(engine.run(["1", "2", "3", "4"]))
+    assert sorted(results) == [("1", "name-1"), ("2", "name-2"), ("3", "name-3"), ("4", "name-4")]
+
+
+def test_failed_context_rebuild_does_not_hang_queue():
+    async def handler(page, job):
+        if job == "blocked":
+            raise BlockedError("captcha", page.url)
+        return f"name-{job}"
+
+    # 初始上下文创建成功，隔离时重建上下文失败
+    engine = make_isolated_engine(handler, FakeBrowser(fail_after=1), tab_count=1, quarantine_seconds=0, on_error=lambda job, e: "错误")
+
+    async def run():
+        return await asyncio.wait_for(engine.run(["blocked", "1", "2"]), timeout=5)
+
+    results = asyncio.run(run())
+    # 页签无法重建：剩余任务按失败处理，run() 正常结束
+    assert sorted(job for job, _ in results) == ["1", "2", "blocked"]
+    assert all(result == "错误" for _, result in results)
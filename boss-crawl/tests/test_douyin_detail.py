@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip("playwright")
+from douyin_detail import find_user_json, parse_profile_json, sec_uid_from_url
+
+TARGET = "MS4wLjABAAAAtarget"
+
+RENDER_DATA = {
+    "app": {
+        # 当前登录用户
+        "user": {"info": {"nickname": "我自己", "secUid": "MS4wLjABAAAAviewer", "uid": "1"}},
+        "recommend": [{"nickname": "推荐账号", "secUid": "MS4wLjABAAAAother", "uid": "2"}],
+    },
+    "profile": {"user": {"user": {"nickname": "目标用户", "secUid": TARGET, "followerCount": 123456}}},
+}
+
+
+def test_sec_uid_from_profile_url():
+    assert sec_uid_from_url(f"https://www.douyin.com/user/{TARGET}?from_tab_name=main") == TARGET
+    assert sec_uid_from_url("https://www.douyin.com/video/123") is None
+    assert sec_uid_from_url(None) is None
+
+
+def test_find_user_json_picks_profile_being_crawled():
+    user = find_user_json(RENDER_DATA, TARGET)
+    assert user["nickname"] == "目标用户"
+    assert parse_profile_json(user, "link")["粉丝数"] == "12.3万"
+
+
+def test_find_user_json_rejects_other_accounts():
+    assert find_user_json(RENDER_DATA, "MS4wLjABAAAAmissing") is None
+    assert find_user_json(RENDER_DATA, None) is None
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("requests")
+from hybrid_fetcher import extract_class_text
+
+
+def test_missing_class_returns_none():
+    assert extract_class_text("<div class='a'>x</div>", "b") is None
+
+
+def test_nested_text_and_line_breaks():
+    html = "<div class='name'>Acme <span>Corp</span><p>Second</p></div><div>after</div>"
+    assert extract_class_text(html, "name") == "Acme Corp\nSecond"
+
+
+def test_self_closing_void_tags_inside_target():
+    html = "<div class='intro'><p>line1<br/>line2</p><p>line3</p></div><p>outside</p>"
+    assert extract_class_text(html, "intro") == "line1\nline2\nline3"
+
+
+def test_self_closing_void_tags_in_nested_divs():
+    html = "<div class='intro'><div>a<img src=\"x\"/></div><div>b</div><div>c</div></div><div>d</div>"
+    assert extract_class_text(html, "intro") == "a\nb\nc"
+
+
+def test_unclosed_void_tags_inside_target():
+    html = "<div class='intro'>a<br>b<img src=x>c</div><div>d</div>"
+    assert extract_class_text(html, "intro") == "a\nbc"
+
+
+def test_void_tag_next_to_target():
+    html = "<img class='intro' src='x'/><br/><div class='name'>Acme<br/>Inc</div><div>outside</div>"
+    assert extract_class_text(html, "name") == "Acme\nInc"
+
+
+def test_direct_only_skips_child_elements():
+    html = "<h1 class='name'>Acme<br/><span>hidden</span> Corp</h1>"
+    assert extract_class_text(html, "name", direct_only=True) == "AcmeCorp"
@@ -0,0 +1,58 @@
+import csv
+
+import pytest
+
+pytest.importorskip("playwright")
+from kuaishou import MISSING, LinkHarvester, author_from_api
+from state_store import StateStore
+
+FULL_USER = {
+    "user_id": "3xabc",
+    "user_name": "电影解说",
+    "photo_count": 120,
+    "fans_count": "12.3万",
+    "follow_count": 0,
+    "user_text": "每天一部好电影\n商务合作私信",
+}
+
+
+def test_author_from_api_maps_all_fields():
+    assert author_from_api(FULL_USER) == {
+        "主页链接": "https://www.kuaishou.com/profile/3xabc",
+        "名字": "电影解说",
+        "作品数": "120",
+        "粉丝数": "12.3万",
+        "关注数": "0",
+        "简介": "每天一部好电影 商务合作私信",
+    }
+
+
+def test_author_from_api_marks_missing_and_empty_bio():
+    user = {"userId": "3xdef", "userName": "影视", "fansCount": "1万", "userText": ""}
+    item = author_from_api(user)
+    assert item["作品数"] == MISSING and item["关注数"] == MISSING
+    assert item["简介"] == "无简介"  # 字段存在但为空：作者没有填写简介
+    assert author_from_api({"user_id": "x"})["简介"] == MISSING
+
+
+@pytest.mark.parametrize("field", ["user_name", "photo_count", "fans_count", "follow_count", "user_text"])
+def test_incomplete_api_author_is_left_for_detail_stage(tmp_path, monkeypatch, field):
+    monkeypatch.chdir(tmp_path)
+    user = {k: v for k, v in FULL_USER.items() if k != field}
+    with StateStore() as store:
+        harvester = LinkHarvester("电影解说", store)
+        harvester.add_api_author(user)
+        assert harvester.saved == 0
+        assert not store.is_done(harvester.site, "https://www.kuaishou.com/profile/3xabc")
+        assert store.pending(harvester.site) == ["https://www.kuaishou.com/profile/3xabc"]
+
+
+def test_complete_api_author_is_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with StateStore() as store:
+        harvester = LinkHarvester("电影解说", store)
+        harvester.add_api_author(FULL_USER)
+        assert harvester.saved == 1
+    with open(harvester.csv_filename, encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert rows[0]["粉丝数"] == "12.3万" and rows[0]["简介"] == "每天一部好电影 商务合作私信"
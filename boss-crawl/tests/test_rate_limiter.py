@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import AdaptiveRateLimiter
+
+
+def make_limiter(**kwargs):
+    options = {"rate": 60, "max_rate": 120, "jitter": 0, "cooldown": 30}
+    options.update(kwargs)
+    return AdaptiveRateLimiter(**options)
+
+
+def test_success_increases_rate_additively_up_to_max():
+    limiter = make_limiter()
+    limiter.success()
+    assert limiter.rate == pytest.approx(63)
+    for _ in range(100):
+        limiter.success()
+    assert limiter.rate == 120
+    assert limiter.successes == 101
+
+
+def test_failure_halves_rate_down_to_min():
+    limiter = make_limiter()
+    limiter.failure("timeout")
+    assert limiter.rate == 30
+    for _ in range(10):
+        limiter.failure("timeout")
+    assert limiter.rate == 6  # 默认下限为初始速率的1/10
+    assert limiter.failures == {"timeout": 11}
+
+
+def test_tokens_space_requests_at_current_rate():
+    limiter = make_limiter()
+    assert limiter._reserve() == 0  # burst=1，第一个请求不等待
+    assert limiter._reserve() == pytest.approx(1, abs=0.05)  # 60次/分钟 -> 间隔1秒
+    assert limiter._reserve() == pytest.approx(2, abs=0.05)  # 排在前一个预订之后
+
+
+def test_block_reasons_pause_all_requests():
+    limiter = make_limiter()
+    limiter._reserve()
+    limiter.failure("captcha")
+    assert limiter._reserve() == pytest.approx(30, abs=0.05)
+    limiter.failure("timeout")  # 非被封类原因只减速，不延长暂停
+    assert limiter._reserve() == pytest.approx(30, abs=0.05)
+
+
+@pytest.mark.parametrize("status, reason", [(429, "429"), (403, "403"), (503, "HTTP 503")])
+def test_record_status_failures(status, reason):
+    limiter = make_limiter()
+    limiter.record_status(status)
+    assert limiter.failures == {reason: 1}
+    assert limiter.rate == 30
+
+
+@pytest.mark.parametrize("status", [200, 404])
+def test_record_status_successes(status):
+    limiter = make_limiter()
+    limiter.record_status(status)
+    assert limiter.successes == 1
+
+
+def test_acquire_waits_for_token():
+    limiter = make_limiter(rate=600, max_rate=600)  # 间隔0.1秒
+
+    async def take(n):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(n):
+            await limiter.acquire()
+        return loop.time() - start
+
+    assert asyncio.run(take(3)) == pytest.approx(0.2, abs=0.08)
@@ -0,0 +1,65 @@
+import pytest
+
+from state_store import StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    with StateStore(str(tmp_path / "state.db")) as store:
+        yield store
+
+
+def test_pending_skips_done_keys_in_input_order(store):
+    store.add_jobs("boss", ["a", "b", "c"])
+    store.mark_done("boss", "b", "Acme")
+    store.mark_failed("boss", "c", "超时")
+    assert store.pending("boss") == ["a", "c"]
+    assert store.pending("boss", ["c", "b", "d", "a"]) == ["c", "d", "a"]
+
+
+def test_results_round_trip_as_json(store):
+    store.mark_done("douyin", "link1", {"名字": "张三", "粉丝数": "1.2万"})
+    store.mark_done("douyin", "link2", None)
+    assert store.get_result("douyin", "link1") == {"名字": "张三", "粉丝数": "1.2万"}
+    assert store.results("douyin") == [("link1", {"名字": "张三", "粉丝数": "1.2万"}), ("link2", None)]
+    assert store.get_result("douyin", "missing") is None
+
+
+def test_failed_then_done_accumulates_attempts(store):
+    store.mark_failed("boss", "a", "超时")
+    store.mark_failed("boss", "a", "超时")
+    store.mark_done("boss", "a", "Acme")
+    row = store.conn.execute("SELECT status, attempts FROM jobs WHERE site = 'boss' AND key = 'a'").fetchone()
+    assert row == ("done", 3)
+    assert store.summary("boss") == {"done": 1}
+
+
+def test_sites_are_independent(store):
+    store.mark_done("boss", "1", "Acme")
+    assert store.is_done("boss", "1")
+    assert not store.is_done("chan", "1")
+    assert store.done_keys("chan") == set()
+
+
+def test_resume_sees_only_committed_state(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = StateStore(path, commit_every=2, commit_interval=3600)
+    store.mark_done("boss", "a", "A")
+    store.mark_done("boss", "b", "B")  # 第2次写入触发提交
+    store.mark_done("boss", "c", "C")  # 未提交即"崩溃"
+    store.conn.close()
+
+    with StateStore(path) as resumed:
+        assert resumed.done_keys("boss") == {"a", "b"}
+
+
+def test_before_commit_runs_before_each_commit(tmp_path):
+    calls = []
+    with StateStore(str(tmp_path / "state.db"), commit_every=2, commit_interval=3600) as store:
+        store.before_commit(lambda: calls.append("flush"))
+        store.mark_done("boss", "a")
+        assert calls == []
+        store.mark_done("boss", "b")
+        assert len(calls) == 1
+        store.commit()  # 没有新的写入时不调用
+        assert len(calls) == 1
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from state_store import StateStore
+from xlsx_writer import CellJournal
+
+
+@pytest.fixture
+def excel_path(tmp_path):
+    path = str(tmp_path / "boss.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["ID", "公司"])
+    ws.append(["1", None])
+    ws.append(["2", None])
+    wb.save(path)
+    return path
+
+
+def read_column(path, column):
+    wb = load_workbook(path)
+    values = [row[0] for row in wb.active.iter_rows(min_row=2, min_col=column, max_col=column, values_only=True)]
+    wb.close()
+    return values
+
+
+def test_updates_are_buffered_until_threshold(excel_path):
+    journal = CellJournal(excel_path, flush_every=2, flush_interval=3600)
+    journal.set(2, 2, "Acme")
+    assert not os.path.exists(journal.journal_path)
+    journal.set(3, 2, "Globex")
+    assert journal.read_journal() == {(2, 2): "Acme", (3, 2): "Globex"}
+
+
+def test_merge_writes_cells_and_removes_journal(excel_path):
+    journal = CellJournal(excel_path, flush_every=10, flush_interval=3600)
+    journal.set(2, 2, "Acme")
+    journal.set(2, 2, "Acme Inc")  # 后写覆盖先写
+    journal.set(3, 2, "Globex")
+    assert journal.merge() == 2
+    assert read_column(excel_path, 2) == ["Acme Inc", "Globex"]
+    assert not os.path.exists(journal.journal_path)
+
+
+def test_leftover_journal_is_replayed_and_torn_line_ignored(excel_path):
+    journal = CellJournal(excel_path)
+    journal.set(2, 2, "Acme")
+    # 模拟崩溃：最后一行只写了一半
+    with open(journal.journal_path, "ab") as f:
+        f.write(b'[3, 2, "Glo')
+
+    restarted = CellJournal(excel_path)
+    restarted.set(3, 2, "Globex")
+    assert restarted.read_journal() == {(2, 2): "Acme", (3, 2): "Globex"}
+    restarted.merge()
+    assert read_column(excel_path, 2) == ["Acme", "Globex"]
+
+
+def test_store_commit_flushes_journal_first(excel_path, tmp_path):
+    with StateStore(str(tmp_path / "state.db"), commit_every=1) as store:
+        journal = CellJournal(excel_path, flush_every=100, flush_interval=3600, store=store)
+        journal.set(2, 2, "Acme")
+        assert journal.read_journal() == {}
+        store.mark_done("boss", "1", "Acme")  # 触发提交
+        assert journal.read_journal() == {(2, 2): "Acme"}
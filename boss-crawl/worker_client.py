@@ -0,0 +1,132 @@
+"""协调服务客户端 + 工作模式
+
+各脚本的 worker 模式通过 CoordinatorClient 从 coordinator.py 领取任务，
+用本机的 CrawlEngine 爬取后把结果逐条提交回协调服务；collect 模式用 collect_results
+把协调服务收到的结果写回本机的输出文件。
+"""
+import asyncio
+import json
+import os
+import socket
+import urllib.parse
+import urllib.request
+
+
+class CoordinatorClient:
+    """协调服务 HTTP 客户端"""
+
+    def __init__(self, base_url, worker=None, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+        self.timeout = timeout
+
+    def _request(self, path, body=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def enqueue(self, queue, jobs):
+        """提交任务，jobs 为 [{"key": ..., "data": ...}, ...]"""
+        return self._request("/enqueue", {"queue": queue, "jobs": jobs})["added"]
+
+    def lease(self, queue, count):
+        """领取最多 count 个任务，返回 (jobs, 剩余未完成数)"""
+        body = self._request("/lease", {"queue": queue, "worker": self.worker, "count": count})
+        return body["jobs"], body["remaining"]
+
+    def complete(self, queue, key, result):
+        """提交任务结果"""
+        self._request("/complete", {"queue": queue, "worker": self.worker, "key": key, "result": result})
+
+    def fail(self, queue, key, error):
+        """报告任务失败"""
+        self._request("/fail", {"queue": queue, "worker": self.worker, "key": key, "error": str(error)})
+
+    def status(self, queue):
+        """查询队列状态"""
+        return self._request(f"/status?queue={urllib.parse.quote(queue)}")
+
+    def results(self, queue):
+        """拉取所有已完成任务的 [(key, result), ...]"""
+        return [tuple(item) for item in self._request(f"/results?queue={urllib.parse.quote(queue)}")["results"]]
+
+
+def collect_results(client, queue, store, write):
+    """collect 模式：拉取协调服务的结果，写出本机尚未写入的部分，返回写入条数
+
+    store: 本机状态库，写入输出文件后记为完成，重复 collect 时跳过（不能与协调服务共用同一个文件）
+    write: def write(key, result)，写入输出文件；返回 False 表示跳过该结果（如ID不在表格中）
+    """
+    collected = 0
+    for key, result in client.results(queue):
+        if store.is_done(queue, key) or write(key, result) is False:
+            continue
+        store.mark_done(queue, key, result)
+        collected += 1
+    store.commit()
+    return collected
+
+
+async def run_worker(
+    engine,
+    client,
+    queue,
+    to_job,
+    job_key,
+    is_failure=None,
+    on_first_batch=None,
+    batch_size=None,
+    poll_interval=10,
+):
+    """工作模式主循环：领取任务 -> 引擎并发爬取 -> 逐条提交，直到队列清空
+
+    结果在线程中提交，HTTP 请求不阻塞事件循环里的其他页签；每批任务结束后等待本批提交完成再领取下一批。
+
+    to_job: 把协调服务的任务 {"key", "data"} 转成引擎任务
+    job_key: 从引擎任务取回协调服务的 key
+    is_failure: def is_failure(result) -> bool，为真时报告失败而不是提交结果
+    on_first_batch: async def on_first_batch(engine_jobs)，首批任务开始前调用一次（如用第一个链接登录）
+    """
+    batch_size = batch_size or engine.tab_count * 2
+    await engine.start()
+    print(f"工作进程 {client.worker} 已连接 {client.base_url}，队列：{queue}")
+
+    submissions = []
+
+    def submit(key, result, failed):
+        try:
+            if failed:
+                client.fail(queue, key, result)
+            else:
+                client.complete(queue, key, result)
+        except OSError as e:
+            # 提交失败时租约到期后任务会被重新分配
+            print(f"提交任务 {key} 失败：{str(e)[:50]}")
+
+    def on_result(job, result):
+        failed = result is None or bool(is_failure and is_failure(result))
+        submissions.append(asyncio.create_task(asyncio.to_thread(submit, job_key(job), result, failed)))
+
+    while True:
+        jobs, remaining = await asyncio.to_thread(client.lease, queue, batch_size)
+        if not jobs:
+            if remaining == 0:
+                print("队列已清空，工作进程退出")
+                return
+            # 其余任务仍在其他工作进程手中，等待完成或租约过期
+            await asyncio.sleep(poll_interval)
+            continue
+
+        print(f"领取 {len(jobs)} 个任务（队列剩余 {remaining} 个）")
+        engine_jobs = [to_job(job) for job in jobs]
+        if on_first_batch:
+            await on_first_batch(engine_jobs)
+            on_first_batch = None
+        await engine.run(engine_jobs, on_result=on_result)
+        await asyncio.gather(*submissions)
+        submissions.clear()
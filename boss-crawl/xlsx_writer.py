@@ -0,0 +1,97 @@
+"""xlsx 单元格回写层
+
+爬取过程中不再反复重写整个工作簿：每次更新先进入内存缓冲，达到数量或时间阈值时
+追加写入旁路日志（<xlsx>.journal，每行一条 JSON，写入后 fsync），运行结束时一次性
+合并进 xlsx 并删除日志。程序中途崩溃时日志仍在磁盘上，下次启动会先把它合并回去，
+因此崩溃安全性与原来"每行保存一次"相同，而每次落盘只是追加几十字节。
+
+与状态库（state_store.StateStore）配合时的写入顺序：结果先 set 进日志，引擎再把任务记为完成；
+传入 store 后状态库每次提交前都会先 flush 日志（追加 + fsync），因此状态库里提交的"已完成"
+任务一定已经写进了日志，崩溃后续爬跳过的行不会丢失。
+"""
+import json
+import os
+import time
+from openpyxl import load_workbook
+
+
+class CellJournal:
+    """缓冲单元格更新，落盘到旁路日志，结束时合并进 xlsx"""
+
+    def __init__(self, excel_path, flush_every=1, flush_interval=30, store=None):
+        """
+        excel_path: 目标 xlsx 文件
+        flush_every: 缓冲多少条更新写一次日志（1 表示每条都立即落盘）
+        flush_interval: 距上次落盘超过多少秒时，下一条更新会触发落盘
+        store: 记录同一批任务的 StateStore，其每次提交前先落盘日志
+        """
+        self.excel_path = excel_path
+        self.journal_path = f"{excel_path}.journal"
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.time()
+        if store:
+            store.before_commit(self.flush)
+
+    def set(self, row, column, value):
+        """记录一次单元格更新（row/column 为 Excel 行列号，1-based）"""
+        self.buffer.append([row, column, value])
+        if (
+            len(self.buffer) >= self.flush_every
+            or time.time() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """把缓冲中的更新追加写入日志并 fsync"""
+        if self.buffer:
+            with open(self.journal_path, "a+b") as f:
+                # 上次崩溃可能留下不完整的最后一行，先补换行，避免与新记录粘连
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                for update in self.buffer:
+                    f.write((json.dumps(update, ensure_ascii=False) + "\n").encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            self.buffer = []
+        self.last_flush = time.time()
+
+    def read_journal(self):
+        """读取日志中的全部更新，返回 {(row, column): value}（后写覆盖先写）"""
+        updates = {}
+        if not os.path.exists(self.journal_path):
+            return updates
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row, column, value = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能留下半行，忽略
+                    continue
+                updates[(row, column)] = value
+        return updates
+
+    def merge(self):
+        """把日志一次性合并进 xlsx（只修改记录过的单元格），成功后删除日志"""
+        self.flush()
+        updates = self.read_journal()
+        if not updates:
+            return 0
+
+        try:
+            wb = load_workbook(self.excel_path)
+            ws = wb.active
+            for (row, column), value in updates.items():
+                ws.cell(row=row, column=column).value = value
+            wb.save(self.excel_path)
+            wb.close()
+        except Exception as e:
+            print(f"合并日志到 {self.excel_path} 失败（日志已保留，下次运行会重新合并）: {str(e)}")
+            return 0
+
+        os.remove(self.journal_path)
+        print(f"已将 {len(updates)} 个单元格更新合并到 {self.excel_path}")
+        return len(updates)
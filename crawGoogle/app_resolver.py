@@ -0,0 +1,136 @@
+"""应用名称 -> 包名解析与缓存
+
+crawler.py 每次运行都要先在 Google Play 搜索 list.xlsx 中的每个应用名称，再请求详情页，
+请求数翻倍；而应用名称对应的包名几乎不会变化。AppIdCache 把规范化后的名称和包名保存到
+app_id_cache.json，在有效期内直接使用，跳过搜索；缓存的包名请求详情页返回 404 时由调用方
+invalidate 后重新搜索。AppStoreCrawler 也通过这里把应用名称解析为包名。
+
+查看/清除缓存：
+    python app_resolver.py list
+    python app_resolver.py remove 微信
+    python app_resolver.py clear
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+CACHE_FILE = "app_id_cache.json"
+CACHE_TTL_DAYS = 30  # 缓存有效期(天)，过期后重新搜索
+
+_PACKAGE_PATTERN = re.compile(r"^[A-Za-z][\w]*(\.[A-Za-z0-9_]+)+$")
+_DETAILS_LINK = re.compile(r'href="/store/apps/details\?id=([\w.]+)')
+
+
+def normalize_name(name):
+    """规范化应用名称：去掉标点、合并空白、忽略大小写"""
+    name = re.sub(r"[^\w\s]", "", str(name))
+    return " ".join(name.split()).casefold()
+
+
+def is_package_id(value):
+    """是否已经是包名（如 com.tencent.mm）"""
+    return bool(_PACKAGE_PATTERN.match(str(value).strip()))
+
+
+def search_url(app_name):
+    return f"https://play.google.com/store/search?q={quote(app_name)}&c=apps"
+
+
+def details_url(app_id):
+    return f"https://play.google.com/store/apps/details?id={app_id}"
+
+
+def parse_search_result(html):
+    """从搜索结果页中取第一个应用的包名，没有结果时返回 None"""
+    match = _DETAILS_LINK.search(html)
+    return match.group(1) if match else None
+
+
+async def search_app_id(fetcher, app_name, headers=None):
+    """通过 AsyncFetcher 搜索应用名称，返回第一个结果的包名"""
+    response = await fetcher.get(search_url(app_name), headers=headers)
+    if response.status_code != 200:
+        print(f"搜索 {app_name} 失败，状态码: {response.status_code}")
+        return None
+    return parse_search_result(response.text)
+
+
+class AppIdCache:
+    """应用名称 -> 包名 的磁盘缓存（带有效期）"""
+
+    def __init__(self, path=CACHE_FILE, ttl_days=CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"缓存文件 {path} 损坏，已忽略")
+
+    def get(self, name):
+        """返回缓存的包名；不存在或已过期时返回 None"""
+        key = normalize_name(name)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry["saved_at"] < self.ttl:
+                self.hits += 1
+                return entry["app_id"]
+            self.misses += 1
+            return None
+
+    def set(self, name, app_id):
+        """记录名称对应的包名"""
+        with self._lock:
+            self.entries[normalize_name(name)] = {"app_id": app_id, "name": str(name), "saved_at": time.time()}
+            self._dirty = True
+
+    def invalidate(self, name):
+        """删除名称的缓存（包名失效时调用）"""
+        with self._lock:
+            if self.entries.pop(normalize_name(name), None):
+                self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self.entries = {}
+            self._dirty = True
+
+    def save(self):
+        """有改动时写回磁盘（先写临时文件再替换，避免中断时损坏缓存）"""
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def report(self):
+        print(f"[包名缓存] 命中 {self.hits} 次，未命中 {self.misses} 次，共缓存 {len(self.entries)} 个应用")
+
+
+if __name__ == "__main__":
+    cache = AppIdCache()
+    if len(sys.argv) == 2 and sys.argv[1] == "list":
+        for entry in cache.entries.values():
+            saved = time.strftime("%Y-%m-%d", time.localtime(entry["saved_at"]))
+            print(f"  {entry['name']} -> {entry['app_id']}（{saved}）")
+    elif len(sys.argv) == 3 and sys.argv[1] == "remove":
+        cache.invalidate(sys.argv[2])
+        cache.save()
+    elif len(sys.argv) == 2 and sys.argv[1] == "clear":
+        cache.clear()
+        cache.save()
+    else:
+        print("用法：python app_resolver.py list | remove <应用名称> | clear")
@@ -1,10 +1,18 @@
 import requests
-from bs4 import BeautifulSoup
-import time
 import random
 import pandas as pd
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from fetch_engine import AsyncFetcher
+from http_cache import CachingAdapter, HttpCache
+from parser_backend import make_soup
+from play_data import extract_app_fields
+from app_resolver import AppIdCache, is_package_id, search_app_id
+
+CONCURRENCY = 6  # 并发模式下同时进行的请求数
+TARGET_RATE = 40  # 目标速率(次/分钟)，所有请求都发往play.google.com，即全局限速；响应正常时逐步提速
+MAX_RATE = 120  # 速率上限(次/分钟)；遇到超时/429/403/验证码时速率减半并暂停冷却
+HTTP_CACHE_DIR = "http_cache"  # 页面缓存目录
+HTTP_CACHE_TTL = 20 * 3600  # 缓存有效期(秒)，有效期内直接使用缓存，过期后发条件请求重新验证；每天运行时页面未变则只需304
 
 class AppStoreCrawler:
     def __init__(self):
@@ -25,12 +33,20 @@ class AppStoreCrawler:
             'Accept-Language': 'en-US,en;q=0.5',
             'Connection': 'keep-alive',
         }
+        # 重复运行时相同页面走磁盘缓存/条件请求
+        self.cache = HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL)
         self.session = requests.Session()
         retry = Retry(connect=3, backoff_factor=0.5)
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = CachingAdapter(self.cache, max_retries=retry, pool_connections=CONCURRENCY, pool_maxsize=CONCURRENCY)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
         
+        # 并发模式复用同一个Session的连接池
+        self.fetcher = AsyncFetcher(CONCURRENCY, TARGET_RATE, MAX_RATE, session=self.session, cache=self.cache)
+        
+        # 应用名称 -> 包名缓存，传入应用名称时先解析为包名
+        self.app_ids = AppIdCache()
+        
         # 加载简化的国家代码映射表（只包含常用国家）
         self.country_codes = self._load_country_codes()
         
@@ -70,113 +86,164 @@ class AppStoreCrawler:
             "ZA": "South Africa",
         }
     
-    def _get_random_delay(self):
-        """获取随机延迟时间，防止请求过于频繁"""
-        return random.uniform(2, 5)
-    
     def _get_random_user_agent(self):
         """获取随机的User-Agent"""
         return random.choice(self.user_agents)
     
-    def get_google_play_app_info(self, app_id, countries=None):
-        """获取Google Play应用在不同国家的上线信息"""
+    def resolve_app_ids(self, apps):
+        """把应用名称解析为包名（已是包名的原样返回），找不到的为None；结果按输入顺序返回
+        
+        未缓存的名称并发搜索，解析结果写入包名缓存
+        """
+        resolved = {app: app if is_package_id(app) else self.app_ids.get(app) for app in apps}
+        names = [app for app, app_id in resolved.items() if app_id is None]
+        if names:
+            async def search(name):
+                headers = {**self.headers, 'User-Agent': self._get_random_user_agent()}
+                return await search_app_id(self.fetcher, name, headers=headers)
+            
+            for name, app_id in zip(names, self.fetcher.run_all(search, names)):
+                if app_id:
+                    print(f"{name} -> {app_id}")
+                    self.app_ids.set(name, app_id)
+                else:
+                    print(f"未找到应用: {name}")
+                resolved[name] = app_id
+            self.app_ids.save()
+        return [resolved[app] for app in apps]
+    
+    def get_google_play_app_info(self, app_id, countries=None, concurrent=False):
+        """获取Google Play应用在不同国家的上线信息
+        
+        app_id: 包名或应用名称（应用名称通过包名缓存/搜索解析）
+        concurrent: 为True时各国家的请求并发发出，结果仍按countries的顺序返回
+        两种模式共用同一个自适应限速器控制请求速率
+        """
         if countries is None:
             countries = list(self.country_codes.keys())
+        
+        if concurrent:
+            return self.get_google_play_app_matrix([app_id], countries)[0]
+        
+        name, app_id = app_id, self.resolve_app_ids([app_id])[0]
+        if app_id is None:
+            return [self._error_result(country, None, f'未找到应用: {name}') for country in countries]
             
         results = []
         
+        limiter = self.fetcher.limiter("play.google.com")
         for country in countries:
-            time.sleep(self._get_random_delay())  # 添加随机延迟
+            url = self._details_url(app_id, country)
+            cached = self.cache.is_fresh(url)
+            if not cached:
+                limiter.wait()  # 由限速器控制请求间隔，有效期内的缓存不发请求
             
             # 每次请求使用不同的User-Agent
             self.headers['User-Agent'] = self._get_random_user_agent()
             
             try:
-                url = f"https://play.google.com/store/apps/details?id={app_id}&gl={country}"
-                response = self.session.get(url, headers=self.headers)
-                
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # 使用新的选择器获取应用名称
-                    title_element = soup.find('span', class_='AfwdI')
-                    
-                    if title_element:
-                        app_name = title_element.text.strip()
-                        
-                        # 使用新的选择器获取应用简介
-                        description_element = soup.find('div', class_='bARER')
-                        if description_element:
-                            # 截取简介的前50个字符作为预览
-                            description_preview = description_element.text.strip()[:50] + "..." if len(description_element.text.strip()) > 50 else description_element.text.strip()
-                            
-                            results.append({
-                                'country_code': country,
-                                'country_name': self.country_codes.get(country, country),
-                                'app_name': app_name,
-                                'description_preview': description_preview,
-                                'url': url,
-                                'available': True
-                            })
-                        else:
-                            results.append({
-                                'country_code': country,
-                                'country_name': self.country_codes.get(country, country),
-                                'app_name': app_name,
-                                'description_preview': '无法获取简介',
-                                'url': url,
-                                'available': True
-                            })
-                    else:
-                        # 检查是否是"App not found"页面
-                        not_found_element = soup.find('div', class_='bARER')
-                        if not_found_element and "找不到" in not_found_element.text:
-                            results.append({
-                                'country_code': country,
-                                'country_name': self.country_codes.get(country, country),
-                                'app_name': None,
-                                'description_preview': None,
-                                'url': url,
-                                'available': False,
-                                'error': '应用在该国不可用'
-                            })
-                        else:
-                            # 页面结构可能已更改，需要进一步分析
-                            results.append({
-                                'country_code': country,
-                                'country_name': self.country_codes.get(country, country),
-                                'app_name': None,
-                                'description_preview': None,
-                                'url': url,
-                                'available': False,
-                                'error': '无法解析页面结构'
-                            })
-                else:
-                    print(f"请求失败，状态码: {response.status_code}, 国家: {country}")
-                    results.append({
-                        'country_code': country,
-                        'country_name': self.country_codes.get(country, country),
-                        'app_name': None,
-                        'description_preview': None,
-                        'url': url,
-                        'available': False,
-                        'error': f"Status code: {response.status_code}"
-                    })
-                    
+                response = self.session.get(url, headers=self.headers, timeout=self.fetcher.timeout)
+                if not (cached and getattr(response, 'from_cache', False)):
+                    self.fetcher.record_response("play.google.com", response)
+                results.append(self._parse_country_response(country, url, response))
             except Exception as e:
+                if isinstance(e, requests.Timeout):
+                    limiter.failure("timeout")
                 print(f"发生错误: {str(e)}, 国家: {country}")
-                results.append({
-                    'country_code': country,
-                    'country_name': self.country_codes.get(country, country),
-                    'app_name': None,
-                    'description_preview': None,
-                    'url': url,
-                    'available': False,
-                    'error': str(e)
-                })
+                results.append(self._error_result(country, url, str(e)))
         
         return results
     
+    def get_google_play_app_matrix(self, app_ids, countries=None):
+        """并发获取多个应用在多个国家的上线信息
+        
+        所有 应用×国家 的请求共用一个连接池，并发数由CONCURRENCY控制，速率由TARGET_RATE/MAX_RATE自适应调整；
+        app_ids 中可以混用包名和应用名称；返回与输入顺序一致的二维列表：results[i][j] 对应 app_ids[i] 在 countries[j] 的结果
+        """
+        if countries is None:
+            countries = list(self.country_codes.keys())
+        app_ids = self.resolve_app_ids(app_ids)
+        pairs = [(app_id, country) for app_id in app_ids for country in countries]
+        
+        async def fetch(pair):
+            app_id, country = pair
+            if app_id is None:
+                return self._error_result(country, None, '未找到应用')
+            url = self._details_url(app_id, country)
+            # 每个请求单独选择User-Agent，不修改共享的self.headers
+            headers = {**self.headers, 'User-Agent': self._get_random_user_agent()}
+            try:
+                response = await self.fetcher.get(url, headers=headers)
+                return self._parse_country_response(country, url, response)
+            except Exception as e:
+                print(f"发生错误: {str(e)}, 应用: {app_id}, 国家: {country}")
+                return self._error_result(country, url, str(e))
+        
+        flat = self.fetcher.run_all(fetch, pairs)
+        return [flat[i * len(countries):(i + 1) * len(countries)] for i in range(len(app_ids))]
+    
+    def _details_url(self, app_id, country):
+        return f"https://play.google.com/store/apps/details?id={app_id}&gl={country}"
+    
+    def _error_result(self, country, url, error):
+        """请求失败或应用不可用时的结果"""
+        return {
+            'country_code': country,
+            'country_name': self.country_codes.get(country, country),
+            'app_name': None,
+            'description_preview': None,
+            'url': url,
+            'available': False,
+            'error': error
+        }
+    
+    def _available_result(self, country, url, app_name, description):
+        """应用在该国可用时的结果（简介截取前50个字符作为预览）"""
+        if description:
+            description = description.strip()
+            description_preview = description[:50] + "..." if len(description) > 50 else description
+        else:
+            description_preview = '无法获取简介'
+        return {
+            'country_code': country,
+            'country_name': self.country_codes.get(country, country),
+            'app_name': app_name,
+            'description_preview': description_preview,
+            'url': url,
+            'available': True
+        }
+    
+    def _parse_country_response(self, country, url, response):
+        """解析某个国家的应用详情页响应"""
+        if response.status_code != 200:
+            print(f"请求失败，状态码: {response.status_code}, 国家: {country}")
+            return self._error_result(country, url, f"Status code: {response.status_code}")
+        
+        # 优先从页面内嵌的 AF_initDataCallback 数据读取名称和简介，不构建DOM
+        fields = extract_app_fields(response.text)
+        if fields['title']:
+            return self._available_result(country, url, fields['title'], fields['description'])
+        
+        soup = make_soup(response.text)
+        
+        # 使用新的选择器获取应用名称
+        title_element = soup.find('span', class_='AfwdI')
+        
+        if title_element:
+            app_name = title_element.text.strip()
+            
+            # 使用新的选择器获取应用简介
+            description_element = soup.find('div', class_='bARER')
+            description = description_element.text if description_element else None
+            return self._available_result(country, url, app_name, description)
+        
+        # 检查是否是"App not found"页面
+        not_found_element = soup.find('div', class_='bARER')
+        if not_found_element and "找不到" in not_found_element.text:
+            return self._error_result(country, url, '应用在该国不可用')
+        # 页面结构可能已更改，需要进一步分析
+        return self._error_result(country, url, '无法解析页面结构')
+    
     def export_to_csv(self, results, filename):
         """将结果导出为CSV文件"""
         df = pd.DataFrame(results)
@@ -190,7 +257,8 @@ if __name__ == "__main__":
     # 示例：获取Google Play上微信的信息
     google_play_results = crawler.get_google_play_app_info(
         app_id="com.tencent.mm",
-        countries=["US", "CN", "JP", "KR", "GB", "DE", "FR"]
+        countries=["US", "CN", "JP", "KR", "GB", "DE", "FR"],
+        concurrent=True
     )
     
     # 打印结果
@@ -200,5 +268,7 @@ if __name__ == "__main__":
         app_info = f"{result['app_name']} - {result['description_preview']}" if result['available'] else "N/A"
         print(f"{result['country_name']}: {status} - {app_info}")
     
+    crawler.fetcher.report()
+    
     # 导出结果到CSV文件
     crawler.export_to_csv(google_play_results, "google_play_results.csv")    
\ No newline at end of file
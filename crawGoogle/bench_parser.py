@@ -0,0 +1,112 @@
+"""HTML 解析后端微基准
+
+对比各解析后端在保存下来的 Google Play 页面上的单页耗时（解析 + crawler.py / app_store_country_crawler.py
+中使用的选择器查询），用于确认切换到 lxml 后解析开销的变化；
+同时给出直接读取内嵌 AF_initDataCallback 数据（play_data.py，不构建DOM）的耗时作为对照。
+
+保存页面（每个应用一个详情页，写入 bench_pages/）：
+    python bench_parser.py save com.tencent.mm com.whatsapp
+运行基准（默认读取 bench_pages/ 下所有 .html，每个页面重复 5 轮）：
+    python bench_parser.py [页面目录] [轮数]
+"""
+import os
+import sys
+import time
+from fetch_engine import create_session
+from parser_backend import available_backends, make_soup
+from play_data import extract_app_fields
+
+PAGE_DIR = "bench_pages"
+ROUNDS = 5
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# 与爬虫中一致的选择器
+SELECTORS = [
+    "div.fd五星评分 div.TT9eCd",
+    "div.wVqUob span.htlgb:nth-child(2)",
+    "div.fd五星评分 a span",
+    "div.bARER",
+    "div.xg1aie",
+    "div.pSEeg",
+    "div.HhKIQc",
+    "span.AfwdI",
+]
+
+
+def save_pages(app_ids, page_dir=PAGE_DIR):
+    """下载应用详情页保存到 page_dir"""
+    os.makedirs(page_dir, exist_ok=True)
+    session = create_session(headers=HEADERS)
+    for app_id in app_ids:
+        url = f"https://play.google.com/store/apps/details?id={app_id}"
+        response = session.get(url, timeout=15)
+        if response.status_code != 200:
+            print(f"{app_id}: 请求失败，状态码 {response.status_code}")
+            continue
+        path = os.path.join(page_dir, f"{app_id}.html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"{app_id}: 已保存 {len(response.text) // 1024} KB -> {path}")
+    session.close()
+
+
+def load_pages(page_dir):
+    """读取目录下所有保存的页面"""
+    pages = []
+    for name in sorted(os.listdir(page_dir)):
+        if name.endswith(".html"):
+            with open(os.path.join(page_dir, name), "r", encoding="utf-8") as f:
+                pages.append(f.read())
+    return pages
+
+
+def parse_page(html, backend):
+    """解析页面并执行全部选择器查询"""
+    soup = make_soup(html, backend)
+    for selector in SELECTORS:
+        soup.select(selector)
+
+
+def bench(pages, backend, rounds):
+    """返回该后端的平均单页耗时(毫秒)；backend 为 "json" 时测试内嵌数据提取"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            if backend == "json":
+                extract_app_fields(html)
+            else:
+                parse_page(html, backend)
+    return (time.perf_counter() - start) / (rounds * len(pages)) * 1000
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "save":
+        save_pages(sys.argv[2:])
+        return
+
+    page_dir = sys.argv[1] if len(sys.argv) > 1 else PAGE_DIR
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else ROUNDS
+    if not os.path.isdir(page_dir):
+        print(f"页面目录 {page_dir} 不存在，请先运行 python bench_parser.py save <应用ID> ...")
+        return
+    pages = load_pages(page_dir)
+    if not pages:
+        print(f"页面目录 {page_dir} 中没有 .html 文件")
+        return
+
+    size_kb = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f"共 {len(pages)} 个页面（平均 {size_kb:.0f} KB），每个页面 {rounds} 轮")
+    timings = {backend: bench(pages, backend, rounds) for backend in available_backends() + ["json"]}
+    baseline = timings.get("html.parser")
+    for backend, ms in timings.items():
+        speedup = f"，为 html.parser 的 {baseline / ms:.1f} 倍速度" if baseline and backend != "html.parser" else ""
+        print(f"  {backend:12s} {ms:8.1f} 毫秒/页{speedup}")
+    if "lxml" not in timings:
+        print("未安装 lxml（pip install lxml），只测试了 html.parser")
+
+
+if __name__ == "__main__":
+    main()
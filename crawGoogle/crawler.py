@@ -1,14 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import pandas as pd
-import requests
-from bs4 import BeautifulSoup
 import re
-import time
+import asyncio
 import threading
 import os
-from urllib.parse import quote
-import random
+from fetch_engine import AsyncFetcher
+from http_cache import REVALIDATE_HEADERS, HttpCache
+from parser_backend import make_soup
+from play_data import extract_app_fields
+from app_resolver import AppIdCache, details_url, parse_search_result, search_url
+
+CONCURRENCY = 5  # 同时进行的请求数
+TARGET_RATE = 30  # 每个主机的目标速率(次/分钟)，响应正常时逐步提速
+MAX_RATE = 90  # 每个主机的速率上限(次/分钟)；遇到超时/429/403/验证码时速率减半并暂停冷却
+HTTP_CACHE_DIR = "http_cache"  # 页面缓存目录
+HTTP_CACHE_TTL = 12 * 3600  # 缓存有效期(秒)，有效期内直接使用缓存，过期后发条件请求重新验证
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7",
+}
 
 class GooglePlayCrawler:
     def __init__(self, root):
@@ -28,6 +39,14 @@ class GooglePlayCrawler:
         
         # 存储爬取结果
         self.results = []
+        
+        # 共用连接池的异步抓取器，重复运行时相同页面走磁盘缓存/条件请求
+        self.fetcher = AsyncFetcher(
+            CONCURRENCY, TARGET_RATE, MAX_RATE, headers=HEADERS, cache=HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_TTL)
+        )
+        
+        # 应用名称 -> 包名缓存，重复运行时跳过搜索
+        self.app_ids = AppIdCache()
     
     def create_widgets(self):
         # 标题
@@ -64,10 +83,20 @@ class GooglePlayCrawler:
         self.crawl_button.pack(side="right", padx=5)
     
     def log(self, message):
-        """向日志框添加消息"""
+        """向日志框添加消息（可在爬虫线程中调用，由界面线程执行）"""
+        self.root.after(0, self._append_log, message)
+    
+    def _append_log(self, message):
         self.log_text.insert(tk.END, message + "\n")
         self.log_text.see(tk.END)
     
+    def update_progress(self, done, total, text):
+        """更新进度条和状态（可在爬虫线程中调用，由界面线程执行）"""
+        def update():
+            self.progress["value"] = int(done / total * 100)
+            self.status_var.set(text)
+        self.root.after(0, update)
+    
     def start_crawling(self):
         """开始爬取数据的主函数"""
         # 检查文件是否存在
@@ -97,25 +126,23 @@ class GooglePlayCrawler:
             total_apps = len(app_names)
             self.log(f"找到 {total_apps} 个应用名称")
             
-            # 爬取每个应用的数据
-            self.results = []
-            for i, app_name in enumerate(app_names, 1):
-                self.status_var.set(f"正在爬取: {app_name} ({i}/{total_apps})")
-                self.progress["value"] = int(i / total_apps * 100)
-                
-                self.log(f"正在爬取: {app_name} ({i}/{total_apps})")
-                app_data = self.get_app_info(app_name)
-                
+            # 并发爬取每个应用的数据，每完成一个更新一次进度
+            done = 0
+            
+            def on_done(index, app_name, app_data):
+                nonlocal done
+                done += 1
+                self.update_progress(done, total_apps, f"已完成: {app_name} ({done}/{total_apps})")
                 if app_data:
-                    self.results.append(app_data)
                     self.log(f"成功获取: {app_name}")
                 else:
                     self.log(f"获取失败: {app_name}")
-                
-                # 随机延时，避免被封
-                delay = random.uniform(2, 5)
-                self.status_var.set(f"等待中 ({delay:.1f}秒)...")
-                time.sleep(delay)
+            
+            self.status_var.set(f"正在爬取 {total_apps} 个应用（并发 {CONCURRENCY}）...")
+            app_results = self.fetcher.run_all(self.fetch_app_info, app_names, on_done=on_done)
+            self.results = [app_data for app_data in app_results if app_data]
+            self.fetcher.report()
+            self.app_ids.report()
             
             # 将结果写入Excel
             self.status_var.set("正在写入Excel文件...")
@@ -132,10 +159,15 @@ class GooglePlayCrawler:
             self.status_var.set("爬取失败！")
             messagebox.showerror("错误", f"爬取失败: {str(e)}")
         finally:
+            self.app_ids.save()  # 出错时也保存已解析的包名
             self.crawl_button.config(state="normal")
     
     def get_app_info(self, app_name):
         """获取单个应用的信息"""
+        return asyncio.run(self.fetch_app_info(app_name))
+    
+    async def fetch_app_info(self, app_name):
+        """通过异步抓取器获取单个应用的信息"""
         self.log(f"正在获取 {app_name} 的信息...")
         
         # 检查应用名称是否为空
@@ -146,85 +178,109 @@ class GooglePlayCrawler:
         # 替换特殊字符
         app_name = re.sub(r"[^\w\s]", "", app_name)
         try:
-            # 搜索应用
-            search_url = f"https://play.google.com/store/search?q={quote(app_name)}&c=apps"
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept-Language": "en-US,en;q=0.9,zh-CN;q=0.8,zh;q=0.7",
-            }
+            # 先查包名缓存，未命中时才搜索应用
+            app_id = self.app_ids.get(app_name)
+            cached = app_id is not None
+            if not cached:
+                app_id = await self.search_app(app_name)
+                if not app_id:
+                    return None
             
-            # 获取搜索结果页面
-            search_response = requests.get(search_url, headers=headers)
-            if search_response.status_code != 200:
-                self.log(f"搜索请求失败，状态码: {search_response.status_code}")
-                return None
-            
-            search_soup = BeautifulSoup(search_response.text, "html.parser")
-            
-            # 查找应用链接
-            app_link = search_soup.select_one('a[href*="/store/apps/details?id="]')
-            if not app_link:
-                self.log("未找到应用链接")
-                return None
-            
-            app_url = "https://play.google.com" + app_link["href"]
-            
-            # 获取应用详情页面
-            app_response = requests.get(app_url, headers=headers)
+            # 获取应用详情页面（与搜索请求复用同一个keep-alive连接池）
+            app_response = await self.fetcher.get(details_url(app_id))
+            if app_response.status_code == 404 and cached:
+                # 缓存的包名已失效（应用下架或更换包名）：删除缓存后重新搜索一次，
+                # 搜索页和详情页都向服务器确认，不能用HTTP缓存中的旧页面
+                self.log(f"{app_name} 的缓存包名 {app_id} 已失效，重新搜索")
+                self.app_ids.invalidate(app_name)
+                app_id = await self.search_app(app_name, refresh=True)
+                if not app_id:
+                    return None
+                app_response = await self.fetcher.get(details_url(app_id), headers=REVALIDATE_HEADERS)
             if app_response.status_code != 200:
                 self.log(f"应用详情请求失败，状态码: {app_response.status_code}")
                 return None
             
-            app_soup = BeautifulSoup(app_response.text, "html.parser")
-            
-            # 提取评分
-            rating = app_soup.select_one('div.fd五星评分 div.TT9eCd')
-            rating = rating.text.strip() if rating else "N/A"
-            
-            # 提取下载数量
-            downloads = app_soup.select_one('div.wVqUob span.htlgb:nth-child(2)')
-            downloads = downloads.text.strip() if downloads else "N/A"
-            
-            # 提取评价数量
-            reviews = app_soup.select_one('div.fd五星评分 a span')
-            reviews = reviews.text.strip() if reviews else "N/A"
-            
-            # 提取应用简介 (div class="bARER")
-            description = app_soup.select_one('div.bARER')
-            description = description.text.strip() if description else "N/A"
-            
-            # 提取更新日期 (第三个 div class="xg1aie")
-            update_date_elements = app_soup.select('div.xg1aie')
-            update_date = update_date_elements[2].text.strip() if len(update_date_elements) >= 3 else "N/A"
-            
-            # 提取支持团队邮箱 (div class="pSEeg")
-            support_email = "N/A"
-            email_element = app_soup.select_one('div.pSEeg')
-            if email_element:
-                email_text = email_element.text.strip()
-                email_pattern = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
-                email_match = re.search(email_pattern, email_text)
-                support_email = email_match.group(0) if email_match else "N/A"
-            
-            # 提取开发者信息 (div class="HhKIQc")
-            developer_info = app_soup.select_one('div.HhKIQc')
-            developer_info = developer_info.text.strip() if developer_info else "N/A"
-            
-            # 返回结果
-            return {
+            # 优先从页面内嵌的 AF_initDataCallback 数据提取，缺失的字段再回退到DOM选择器
+            fields = extract_app_fields(app_response.text)
+            app_info = {
                 "应用名称": app_name,
-                "评分": rating,
-                "下载数量": downloads,
-                "评价数量": reviews,
-                "应用简介": description,
-                "更新日期": update_date,
-                "支持团队邮箱": support_email,
-                "开发者信息": developer_info
+                "评分": fields["score"],
+                "下载数量": fields["installs"],
+                "评价数量": fields["ratings"],
+                "应用简介": fields["description"],
+                "更新日期": fields["updated"],
+                "支持团队邮箱": fields["email"],
+                "开发者信息": fields["developer"],
             }
+            missing = [key for key, value in app_info.items() if value is None]
+            if missing:
+                self.log(f"{app_name} 内嵌数据缺少 {'、'.join(missing)}，使用页面元素提取")
+                app_info.update(self.parse_dom_fields(app_response.text, missing))
+            return app_info
             
         except Exception as e:
             self.log(f"获取 {app_name} 信息时出错: {str(e)}")
             return None
+    
+    async def search_app(self, app_name, refresh=False):
+        """在Google Play搜索应用名称，返回第一个结果的包名并写入缓存
+
+        refresh: 为True时搜索页不直接使用HTTP缓存，向服务器确认（缓存的包名失效后重新搜索时使用）
+        """
+        search_response = await self.fetcher.get(search_url(app_name), headers=REVALIDATE_HEADERS if refresh else None)
+        if search_response.status_code != 200:
+            self.log(f"搜索请求失败，状态码: {search_response.status_code}")
+            return None
+        
+        # 查找应用链接
+        app_id = parse_search_result(search_response.text)
+        if not app_id:
+            self.log("未找到应用链接")
+            return None
+        self.app_ids.set(app_name, app_id)
+        return app_id
+    
+    def parse_dom_fields(self, html, keys):
+        """从详情页DOM中提取 keys 中的字段（内嵌数据缺失时的回退）"""
+        app_soup = make_soup(html)
+        fields = {}
+        
+        # 提取评分
+        rating = app_soup.select_one('div.fd五星评分 div.TT9eCd')
+        fields["评分"] = rating.text.strip() if rating else "N/A"
+        
+        # 提取下载数量
+        downloads = app_soup.select_one('div.wVqUob span.htlgb:nth-child(2)')
+        fields["下载数量"] = downloads.text.strip() if downloads else "N/A"
+        
+        # 提取评价数量
+        reviews = app_soup.select_one('div.fd五星评分 a span')
+        fields["评价数量"] = reviews.text.strip() if reviews else "N/A"
+        
+        # 提取应用简介 (div class="bARER")
+        description = app_soup.select_one('div.bARER')
+        fields["应用简介"] = description.text.strip() if description else "N/A"
+        
+        # 提取更新日期 (第三个 div class="xg1aie")
+        update_date_elements = app_soup.select('div.xg1aie')
+        fields["更新日期"] = update_date_elements[2].text.strip() if len(update_date_elements) >= 3 else "N/A"
+        
+        # 提取支持团队邮箱 (div class="pSEeg")
+        fields["支持团队邮箱"] = "N/A"
+        email_element = app_soup.select_one('div.pSEeg')
+        if email_element:
+            email_text = email_element.text.strip()
+            email_pattern = r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"
+            email_match = re.search(email_pattern, email_text)
+            fields["支持团队邮箱"] = email_match.group(0) if email_match else "N/A"
+        
+        # 提取开发者信息 (div class="HhKIQc")
+        developer_info = app_soup.select_one('div.HhKIQc')
+        fields["开发者信息"] = developer_info.text.strip() if developer_info else "N/A"
+        
+        return {key: fields[key] for key in keys}
+    
     def write_to_excel(self, original_df, results):
         """将爬取结果写入Excel文件"""
         # 创建结果DataFrame
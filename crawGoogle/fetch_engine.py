@@ -0,0 +1,139 @@
+"""异步 HTTP 抓取引擎
+
+asyncio 负责调度，真正的请求在线程池中通过同一个 requests.Session 发出：
+- 并发上限：同时进行的请求数不超过 concurrency
+- 连接池：Session 按主机复用 keep-alive 连接，连接池大小与并发数一致
+- 按主机限速：每个主机一个自适应限速器，响应正常时逐步提速，超时/429/403/验证码时减速
+- 响应缓存（可选）：传入 http_cache.HttpCache 时有效期内的页面直接从磁盘返回，不占用限速配额
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from http_cache import CachingAdapter, must_revalidate
+from rate_limiter import AdaptiveRateLimiter
+
+
+def create_session(pool_size=10, headers=None, cache=None):
+    """创建带连接池和连接重试的 Session；传入 HttpCache 时 GET 请求经过条件请求缓存"""
+    session = requests.Session()
+    retry = Retry(connect=3, backoff_factor=0.5)
+    if cache:
+        adapter = CachingAdapter(cache, max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class AsyncFetcher:
+    """有并发上限和按主机节奏控制的异步抓取器"""
+
+    def __init__(self, concurrency=8, rate=30, max_rate=90, session=None, headers=None, timeout=15, cache=None):
+        """
+        concurrency: 同时进行的最大请求数
+        rate / max_rate: 每个主机的目标速率和速率上限(次/分钟)
+        session: 复用已有的 requests.Session（为空时新建带连接池的 Session）
+        headers: 每个请求默认附带的请求头
+        timeout: 单次请求超时(秒)
+        cache: http_cache.HttpCache，新建 Session 时挂上缓存；传入 session 时需已挂载 CachingAdapter
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_rate = max_rate
+        self.cache = cache
+        self.session = session or create_session(concurrency, cache=cache)
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._loop = None
+        self._semaphore = None
+        self._limiters = {}
+
+    def close(self):
+        """关闭线程池和连接池"""
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+    def _bind_loop(self):
+        """信号量属于创建它的事件循环，换了事件循环（如多次 run_all）时重新创建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    def limiter(self, host):
+        """返回主机对应的限速器（同步代码也可以直接调用其 wait()）"""
+        if host not in self._limiters:
+            self._limiters[host] = AdaptiveRateLimiter(self.rate, self.max_rate, name=host)
+        return self._limiters[host]
+
+    def record_response(self, host, response):
+        """按响应状态码和是否跳转到验证码页调整主机速率"""
+        if "/sorry/" in response.url:
+            self.limiter(host).failure("captcha")
+        else:
+            self.limiter(host).record_status(response.status_code)
+
+    def report(self):
+        """打印各主机的限速统计和缓存命中统计"""
+        for limiter in self._limiters.values():
+            limiter.report()
+        if self.cache:
+            self.cache.report()
+
+    async def get(self, url, headers=None, **kwargs):
+        """异步 GET，返回 requests.Response"""
+        self._bind_loop()
+        host = urlparse(url).netloc
+        headers = {**self.headers, **(headers or {})}
+        async with self._semaphore:
+            # 有效期内的缓存不发请求，不等待限速也不计入主机速率
+            cached = self.cache is not None and not must_revalidate(headers) and self.cache.is_fresh(url)
+            if not cached:
+                await self.limiter(host).acquire()
+            request = partial(
+                self.session.get,
+                url,
+                headers=headers,
+                timeout=kwargs.pop('timeout', self.timeout),
+                **kwargs
+            )
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(self.executor, request)
+            except requests.Timeout:
+                self.limiter(host).failure("timeout")
+                raise
+            if not (cached and getattr(response, "from_cache", False)):
+                self.record_response(host, response)
+            return response
+
+    async def map(self, func, items, on_done=None):
+        """并发执行 func(item)，结果按输入顺序返回
+
+        func: async def func(item) -> result
+        on_done: def on_done(index, item, result)，每完成一项立即回调（完成顺序），可用于更新进度
+        """
+        results = [None] * len(items)
+
+        async def run_one(index, item):
+            try:
+                results[index] = await func(item)
+            except Exception as e:
+                print(f"处理 {item} 时出错: {str(e)}")
+            if on_done:
+                on_done(index, item, results[index])
+
+        await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items)))
+        return results
+
+    def run_all(self, func, items, on_done=None):
+        """在当前线程中启动事件循环执行 map（供同步代码调用）"""
+        return asyncio.run(self.map(func, items, on_done))
@@ -0,0 +1,168 @@
+"""条件请求 HTTP 缓存
+
+AppStoreCrawler 和 GooglePlayCrawler 每次运行都会重新下载相同的页面（国家可用性检查每天对同一批应用
+重复执行）。CachingAdapter 挂到 requests.Session 上，对 GET 请求：
+- 缓存有效期（ttl）内直接返回磁盘上的响应，不发请求
+- 过期后带 If-None-Match / If-Modified-Since 发条件请求，服务器返回 304 时沿用缓存的正文
+- 200/404 响应的正文用 zlib 压缩后连同 ETag / Last-Modified 保存到 cache_dir
+有效期由脚本配置，不遵循页面的 Cache-Control（Google Play 页面一律声明 no-cache）；
+请求头带 Cache-Control: no-cache（REVALIDATE_HEADERS）时跳过有效期，总是向服务器确认，
+用于包名失效后重新搜索这类必须拿到最新页面的请求。
+运行结束时 report() 打印命中/重新验证/未命中次数和节省的流量、时间。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+CACHE_DIR = "http_cache"
+CACHE_TTL = 6 * 3600  # 默认有效期(秒)
+CACHEABLE_STATUS = (200, 404)  # 404 表示应用在该国不可用，同样值得缓存
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+REVALIDATE_HEADERS = {"Cache-Control": "no-cache"}  # 附带该请求头时不直接使用缓存
+
+
+def must_revalidate(headers):
+    """请求头是否要求向服务器确认（Cache-Control: no-cache）"""
+    return "no-cache" in (headers or {}).get("Cache-Control", "").lower()
+
+
+class HttpCache:
+    """磁盘上的响应缓存：每个URL一个元数据文件(.json)和一个压缩正文文件(.z)"""
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.stats = {"hit": 0, "revalidated": 0, "miss": 0, "stored": 0}
+        self.bytes_saved = 0
+        self.fetch_time = 0.0  # 未命中请求的总耗时，用于估算节省的时间
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def load(self, url):
+        """返回 (元数据, 正文)，没有缓存时返回 (None, None)"""
+        path = self._path(url)
+        try:
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(path + ".z", "rb") as f:
+                body = zlib.decompress(f.read())
+        except (OSError, ValueError, zlib.error):
+            return None, None
+        return meta, body
+
+    def is_fresh(self, url):
+        """缓存是否在有效期内（只读元数据，不解压正文）"""
+        try:
+            with open(self._path(url) + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return time.time() - meta["stored_at"] < self.ttl
+
+    def _write(self, path, data, mode):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def store(self, url, response):
+        """保存响应正文（压缩）和验证用的响应头"""
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {
+            "url": response.url,
+            "status": response.status_code,
+            "encoding": response.encoding,
+            "headers": {name: response.headers[name] for name in STORED_HEADERS if name in response.headers},
+            "stored_at": time.time(),
+        }
+        self._write(path + ".z", zlib.compress(response.content), "wb")
+        self._write(path + ".json", json.dumps(meta), "w")
+        self.count("stored")
+
+    def touch(self, url, meta, response):
+        """304 重新验证通过：更新保存时间和验证头"""
+        for name in ("ETag", "Last-Modified"):
+            if name in response.headers:
+                meta["headers"][name] = response.headers[name]
+        meta["stored_at"] = time.time()
+        self._write(self._path(url) + ".json", json.dumps(meta), "w")
+
+    def count(self, kind, body_size=0, elapsed=0.0):
+        with self._lock:
+            self.stats[kind] += 1
+            self.bytes_saved += body_size
+            self.fetch_time += elapsed
+
+    def report(self):
+        """打印命中统计和估算的节省量"""
+        hit, revalidated, miss = self.stats["hit"], self.stats["revalidated"], self.stats["miss"]
+        total = hit + revalidated + miss
+        if not total:
+            return
+        avg_fetch = self.fetch_time / miss if miss else 0.0
+        print(
+            f"[HTTP缓存] 共 {total} 次请求：命中 {hit} 次，304重新验证 {revalidated} 次，未命中 {miss} 次"
+            f"（命中率 {(hit + revalidated) / total:.0%}），节省下载 {self.bytes_saved / 1024 / 1024:.1f} MB，"
+            f"约节省 {hit * avg_fetch:.0f} 秒请求时间"
+        )
+
+
+class CachingAdapter(HTTPAdapter):
+    """带条件请求缓存的 HTTPAdapter，用法与 HTTPAdapter 相同，额外传入 HttpCache"""
+
+    def __init__(self, cache, **kwargs):
+        self.cache = cache
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+
+        url = request.url
+        meta, body = self.cache.load(url)
+        if meta and time.time() - meta["stored_at"] < self.cache.ttl and not must_revalidate(request.headers):
+            self.cache.count("hit", len(body))
+            return self._cached_response(request, meta, body)
+
+        if meta:
+            if "ETag" in meta["headers"]:
+                request.headers["If-None-Match"] = meta["headers"]["ETag"]
+            if "Last-Modified" in meta["headers"]:
+                request.headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        if response.status_code == 304 and meta:
+            self.cache.touch(url, meta, response)
+            self.cache.count("revalidated", len(body))
+            return self._cached_response(request, meta, body)
+
+        self.cache.count("miss", elapsed=time.monotonic() - start)
+        if response.status_code in CACHEABLE_STATUS and "/sorry/" not in response.url:
+            self.cache.store(url, response)
+        return response
+
+    def _cached_response(self, request, meta, body):
+        """用缓存内容构造 Response"""
+        response = Response()
+        response.status_code = meta["status"]
+        response.reason = "OK" if meta["status"] == 200 else "Not Found"
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = meta["encoding"]
+        response.url = meta["url"]
+        response.request = request
+        response._content = body
+        response.from_cache = True
+        return response
@@ -0,0 +1,37 @@
+"""HTML 解析后端
+
+Google Play 的详情页、搜索页有几百KB，BeautifulSoup 配合纯 Python 实现的 html.parser 解析，
+并发抓取时解析本身占满CPU。make_soup 优先使用 C 实现的 lxml（pip install lxml），
+未安装时自动回退到 html.parser；两种后端得到的都是 BeautifulSoup 对象，
+select / select_one / find 等写法和 CSS 选择器都不需要改。
+
+各后端在保存下来的页面上的解析耗时可以用 bench_parser.py 对比。
+"""
+from bs4 import BeautifulSoup
+from bs4.builder import builder_registry
+
+PARSER_BACKENDS = ["lxml", "html.parser"]  # 按优先级排列，取第一个已安装的
+PREFERRED_PARSER = None  # 指定后端名称时强制使用该后端（如 "html.parser"），为空时自动选择
+
+_default_backend = None
+
+
+def available_backends():
+    """返回已安装的解析后端"""
+    return [name for name in PARSER_BACKENDS if builder_registry.lookup(name) is not None]
+
+
+def default_backend():
+    """选择默认解析后端（只检测一次）"""
+    global _default_backend
+    if _default_backend is None:
+        if PREFERRED_PARSER and builder_registry.lookup(PREFERRED_PARSER) is not None:
+            _default_backend = PREFERRED_PARSER
+        else:
+            _default_backend = available_backends()[0]
+    return _default_backend
+
+
+def make_soup(markup, backend=None):
+    """用指定（默认自动选择）的后端解析HTML"""
+    return BeautifulSoup(markup, backend or default_backend())
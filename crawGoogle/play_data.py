@@ -0,0 +1,72 @@
+"""Google Play 页面内嵌数据提取
+
+Google Play 详情页把应用数据以 JSON 形式写在 AF_initDataCallback({key: 'ds:5', ..., data: [...]}) 脚本块中，
+DOM 里的 wVqUob / xg1aie / pSEeg 等 class 名经常随改版变化，而且为了几个字段构建整棵 DOM 树是
+每次查询中最慢的一步。这里用正则定位需要的脚本块，再用 json 的 C 解码器从 data: 处直接解码，
+不解析 HTML；按 FIELD_PATHS 中的路径取出字段，路径不存在的字段为 None，由调用方回退到 DOM 选择器。
+"""
+import json
+import re
+
+DETAILS_KEY = "ds:5"  # 详情页中应用数据所在的脚本块
+
+# 字段 -> 在 ds:5 数据中的路径
+FIELD_PATHS = {
+    "title": [1, 2, 0, 0],
+    "description": [1, 2, 72, 0, 1],
+    "installs": [1, 2, 13, 0],
+    "score": [1, 2, 51, 0, 1],
+    "ratings": [1, 2, 51, 2, 1],
+    "reviews": [1, 2, 51, 3, 1],
+    "developer": [1, 2, 68, 0],
+    "email": [1, 2, 69, 1, 0],
+    "updated": [1, 2, 145, 0, 0],
+}
+
+_BLOCK_PATTERN = re.compile(r"AF_initDataCallback\(\{key:\s*'(ds:\d+)'[^\[]*?data:")
+_decoder = json.JSONDecoder()
+
+
+def extract_blocks(html, keys=(DETAILS_KEY,)):
+    """返回 {脚本块key: 解码后的数据}，只解码 keys 中的脚本块（keys 为 None 时解码全部）"""
+    blocks = {}
+    for match in _BLOCK_PATTERN.finditer(html):
+        key = match.group(1)
+        if keys is not None and key not in keys:
+            continue
+        try:
+            blocks[key], _ = _decoder.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        if keys is not None and len(blocks) == len(keys):
+            break
+    return blocks
+
+
+def get_path(data, path):
+    """按下标路径取值，路径不存在时返回 None"""
+    for index in path:
+        if not isinstance(data, list) or index >= len(data):
+            return None
+        data = data[index]
+    return data
+
+
+def _strip_html(text):
+    """简介中带有 <br> 等标签，转为纯文本"""
+    text = re.sub(r"<br\s*/?>", "\n", text)
+    return re.sub(r"<[^>]+>", "", text).strip()
+
+
+def extract_app_fields(html):
+    """从详情页 HTML 中提取应用字段，返回 {字段: 值}；找不到的字段为 None"""
+    data = extract_blocks(html).get(DETAILS_KEY)
+    fields = {name: get_path(data, path) if data else None for name, path in FIELD_PATHS.items()}
+    if isinstance(fields["description"], str):
+        fields["description"] = _strip_html(fields["description"])
+    if isinstance(fields["score"], (int, float)):
+        fields["score"] = f"{fields['score']:.1f}"
+    for name in ("ratings", "reviews"):
+        if isinstance(fields[name], int):
+            fields[name] = str(fields[name])
+    return fields
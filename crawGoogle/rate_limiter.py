@@ -0,0 +1,119 @@
+"""自适应限速器（令牌桶 + AIMD）
+
+取代各脚本里写死的 random.uniform 等待：脚本只声明目标速率和上限速率（次/分钟），
+请求前向限速器取令牌；响应正常时速率按固定步长缓慢上升（加性增），
+遇到超时、HTTP 429/403 或验证码页面时速率立即减半（乘性减），
+被封类信号（429/403/验证码）还会让所有请求暂停一段冷却时间。
+
+同一个限速器可以同时被异步代码（await acquire()）和多线程同步代码（wait()）使用。
+
+本文件是 boss-crawl/rate_limiter.py 的副本（crawGoogle 是独立运行的工具，不依赖 boss-crawl 目录），
+修改时两份保持一致。
+"""
+import asyncio
+import random
+import threading
+import time
+
+BLOCK_REASONS = {"429", "403", "captcha"}  # 视为被封的失败原因，触发冷却暂停
+
+
+class AdaptiveRateLimiter:
+    """令牌桶限速器，速率按 AIMD 规则随响应情况自动调整"""
+
+    def __init__(
+        self,
+        rate,
+        max_rate,
+        min_rate=None,
+        burst=1,
+        increase=None,
+        decrease=0.5,
+        cooldown=60,
+        jitter=0.3,
+        name="",
+    ):
+        """
+        rate: 初始（目标）速率，次/分钟
+        max_rate: 速率上限，次/分钟
+        min_rate: 速率下限，次/分钟，默认为初始速率的1/10
+        burst: 令牌桶容量，允许的最大突发请求数
+        increase: 每次正常响应增加的速率(次/分钟)，默认为初始速率的5%
+        decrease: 失败时速率乘以的系数
+        cooldown: 遇到 429/403/验证码 后所有请求暂停的秒数
+        jitter: 每次等待额外增加的随机比例，避免请求间隔过于规律
+        """
+        self.rate = float(rate)
+        self.max_rate = float(max_rate)
+        self.min_rate = float(min_rate if min_rate is not None else rate / 10)
+        self.burst = burst
+        self.increase = float(increase if increase is not None else rate * 0.05)
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.jitter = jitter
+        self.name = name
+        self.successes = 0
+        self.failures = {}
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """预订一个令牌，返回需要等待的秒数（令牌不足时记为负数，后来者排在后面）"""
+        with self._lock:
+            now = time.monotonic()
+            per_second = self.rate / 60
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * per_second)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / per_second if self._tokens < 0 else 0.0
+            wait = max(wait, self._paused_until - now)
+        return wait * (1 + random.uniform(0, self.jitter)) if wait > 0 else 0.0
+
+    async def acquire(self):
+        """异步等待直到可以发出下一个请求"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def wait(self):
+        """同步等待直到可以发出下一个请求（线程安全）"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def success(self):
+        """记录一次正常响应：速率加性增加"""
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def failure(self, reason="error"):
+        """记录一次失败：速率乘性减少；被封类原因额外暂停 cooldown 秒"""
+        with self._lock:
+            self.failures[reason] = self.failures.get(reason, 0) + 1
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            if reason in BLOCK_REASONS:
+                self._paused_until = time.monotonic() + self.cooldown
+        pause = f"，暂停 {self.cooldown} 秒" if reason in BLOCK_REASONS else ""
+        print(f"[限速:{self.name}] {reason}，速率 {old_rate:.1f} -> {self.rate:.1f} 次/分钟{pause}")
+
+    def record_status(self, status):
+        """按 HTTP 状态码记录结果：429/403 视为被封，5xx 视为失败，其余视为正常"""
+        if status in (429, 403):
+            self.failure(str(status))
+        elif status >= 500:
+            self.failure(f"HTTP {status}")
+        else:
+            self.success()
+
+    def report(self):
+        """打印限速统计"""
+        failed = "，".join(f"{reason} {n}次" for reason, n in self.failures.items()) or "无"
+        print(
+            f"[限速:{self.name}] 当前速率 {self.rate:.1f} 次/分钟（上限 {self.max_rate:.0f}），"
+            f"正常 {self.successes} 次，失败：{failed}"
+        )
@@ -0,0 +1,51 @@
+import json
+import time
+
+from app_resolver import AppIdCache, is_package_id, normalize_name, parse_search_result
+
+
+def test_normalize_name_ignores_case_punctuation_and_spacing():
+    assert normalize_name("  WeChat!  Lite ") == normalize_name("wechat lite") == "wechat lite"
+    assert normalize_name("微信（国际版）") == "微信国际版"
+
+
+def test_is_package_id():
+    assert is_package_id("com.tencent.mm")
+    assert is_package_id(" com.whatsapp ")
+    assert not is_package_id("WeChat")
+    assert not is_package_id("1.2.3")
+
+
+def test_parse_search_result_takes_first_app():
+    html = '<a href="/store/apps/details?id=com.tencent.mm">微信</a><a href="/store/apps/details?id=com.x">x</a>'
+    assert parse_search_result(html) == "com.tencent.mm"
+    assert parse_search_result("<html>没有结果</html>") is None
+
+
+def test_cache_round_trip_and_counters(tmp_path):
+    path = str(tmp_path / "app_id_cache.json")
+    cache = AppIdCache(path)
+    assert cache.get("WeChat") is None
+    cache.set("WeChat", "com.tencent.mm")
+    cache.save()
+
+    reloaded = AppIdCache(path)
+    assert reloaded.get("wechat") == "com.tencent.mm"
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
+    reloaded.invalidate("WECHAT")
+    assert reloaded.get("WeChat") is None
+
+
+def test_expired_entries_are_misses(tmp_path):
+    path = tmp_path / "app_id_cache.json"
+    path.write_text(
+        json.dumps({"wechat": {"app_id": "com.tencent.mm", "name": "WeChat", "saved_at": time.time() - 31 * 86400}}),
+        encoding="utf-8",
+    )
+    assert AppIdCache(str(path), ttl_days=30).get("WeChat") is None
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path):
+    path = tmp_path / "app_id_cache.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert AppIdCache(str(path)).entries == {}
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from fetch_engine import AsyncFetcher, create_session
+from http_cache import REVALIDATE_HEADERS, HttpCache, must_revalidate
+
+URL = "https://play.google.com/store/apps/details?id=com.example&gl=US"
+
+
+class FakeServer:
+    """替换 HTTPAdapter.send，按顺序返回预设响应并记录收到的请求头"""
+
+    def __init__(self, monkeypatch):
+        self.responses = []
+        self.requests = []
+        server = self
+
+        def send(adapter, request, **kwargs):
+            server.requests.append(dict(request.headers))
+            status, body, headers = server.responses.pop(0)
+            response = requests.Response()
+            response.status_code = status
+            response._content = body
+            response.headers = CaseInsensitiveDict({"Content-Type": "text/html; charset=utf-8", **headers})
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            return response
+
+        monkeypatch.setattr(HTTPAdapter, "send", send)
+
+    def reply(self, status, body=b"", **headers):
+        self.responses.append((status, body, headers))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    return FakeServer(monkeypatch)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HttpCache(str(tmp_path / "http_cache"), ttl=3600)
+
+
+def test_fresh_hit_is_served_from_disk(server, cache):
+    session = create_session(cache=cache)
+    server.reply(200, "<html>微信</html>".encode("utf-8"), ETag='"v1"')
+    first = session.get(URL)
+    second = session.get(URL)
+    assert len(server.requests) == 1
+    assert second.text == first.text == "<html>微信</html>"
+    assert second.from_cache and second.status_code == 200
+    assert cache.stats == {"hit": 1, "revalidated": 0, "miss": 1, "stored": 1}
+
+
+def test_stale_entry_is_revalidated_with_validators(server, cache):
+    session = create_session(cache=cache)
+    server.reply(200, b"<html>v1</html>", ETag='"v1"', **{"Last-Modified": "Mon, 01 Sep 2025 00:00:00 GMT"})
+    session.get(URL)
+    cache.ttl = 0
+    server.reply(304, ETag='"v1"')
+    response = session.get(URL)
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert server.requests[1]["If-Modified-Since"] == "Mon, 01 Sep 2025 00:00:00 GMT"
+    assert response.status_code == 200 and response.text == "<html>v1</html>"
+    assert cache.stats["revalidated"] == 1
+    # 304 刷新了保存时间
+    cache.ttl = 3600
+    assert cache.is_fresh(URL)
+
+
+def test_changed_page_replaces_entry(server, cache):
+    session = create_session(cache=cache)
+    server.reply(200, b"v1", ETag='"v1"')
+    session.get(URL)
+    cache.ttl = 0
+    server.reply(200, b"v2", ETag='"v2"')
+    assert session.get(URL).text == "v2"
+    meta, body = cache.load(URL)
+    assert body == b"v2" and meta["headers"]["ETag"] == '"v2"'
+
+
+def test_not_found_is_cached_but_errors_and_captcha_are_not(server, cache):
+    session = create_session(cache=cache)
+    server.reply(404, b"not found")
+    session.get(URL)
+    assert cache.load(URL)[0]["status"] == 404
+    server.reply(503, b"busy")
+    session.get(URL + "x")
+    assert cache.load(URL + "x") == (None, None)
+    captcha_url = "https://www.google.com/sorry/index?continue=x"
+    server.reply(200, b"captcha")
+    session.get(captcha_url)
+    assert cache.load(captcha_url) == (None, None)
+
+
+def test_no_cache_header_skips_fresh_entry(server, cache):
+    session = create_session(cache=cache)
+    server.reply(200, b"old", ETag='"v1"')
+    session.get(URL)
+    server.reply(200, b"new", ETag='"v2"')
+    assert session.get(URL, headers=REVALIDATE_HEADERS).text == "new"
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert must_revalidate({"Cache-Control": "No-Cache"})
+    assert not must_revalidate(None)
+
+
+def test_fetcher_skips_limiter_for_fresh_hits(server, cache):
+    fetcher = AsyncFetcher(concurrency=2, rate=600, max_rate=600, cache=cache)
+    server.reply(200, b"page", ETag='"v1"')
+
+    async def fetch_twice():
+        await fetcher.get(URL)
+        start = time.monotonic()
+        response = await fetcher.get(URL)
+        return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(fetch_twice())
+    fetcher.close()
+    assert response.from_cache and elapsed < 0.05  # 没有等待限速令牌
+    assert fetcher.limiter("play.google.com").successes == 1  # 只有真实请求计入速率
@@ -0,0 +1,80 @@
+import json
+
+from play_data import DETAILS_KEY, FIELD_PATHS, extract_app_fields, extract_blocks, get_path
+
+VALUES = {
+    "title": "WeChat",
+    "description": "Connect with friends<br>Free calls<b>!</b>",
+    "installs": "1,000,000,000+",
+    "score": 3.9123,
+    "ratings": 1234567,
+    "reviews": 89012,
+    "developer": "WeChat International Pte. Ltd.",
+    "email": "help@wechat.com",
+    "updated": "Sep 1, 2025",
+}
+
+
+def set_path(data, path, value):
+    """按下标路径写入值，中间层不足时补齐为列表"""
+    for index in path[:-1]:
+        while len(data) <= index:
+            data.append([])
+        data = data[index]
+    while len(data) <= path[-1]:
+        data.append(None)
+    data[path[-1]] = value
+
+
+def details_page(values=VALUES):
+    data = []
+    for name, value in values.items():
+        set_path(data, FIELD_PATHS[name], value)
+    # 与真实页面一致：其他脚本块在前，data 后面还有 sideChannel 等字段，字符串中含有 ] 和 })
+    return (
+        "<html><head><script>AF_initDataCallback({key: 'ds:4', hash: '1', data:[[\"x]})\"]], sideChannel: {}});"
+        f"</script><script>AF_initDataCallback({{key: '{DETAILS_KEY}', hash: '7', data:{json.dumps(data)}, "
+        "sideChannel: {}});</script></head><body><h1>WeChat</h1></body></html>"
+    )
+
+
+def test_extract_app_fields_formats_values():
+    assert extract_app_fields(details_page()) == {
+        "title": "WeChat",
+        "description": "Connect with friends\nFree calls!",
+        "installs": "1,000,000,000+",
+        "score": "3.9",
+        "ratings": "1234567",
+        "reviews": "89012",
+        "developer": "WeChat International Pte. Ltd.",
+        "email": "help@wechat.com",
+        "updated": "Sep 1, 2025",
+    }
+
+
+def test_missing_fields_are_none():
+    fields = extract_app_fields(details_page({"title": "WeChat", "score": 4}))
+    assert fields["title"] == "WeChat" and fields["score"] == "4.0"
+    assert fields["email"] is None and fields["description"] is None
+
+
+def test_page_without_embedded_data():
+    assert set(extract_app_fields("<html><body>no data</body></html>").values()) == {None}
+
+
+def test_extract_blocks_selects_keys():
+    html = details_page()
+    assert set(extract_blocks(html)) == {DETAILS_KEY}
+    assert set(extract_blocks(html, keys=None)) == {"ds:4", DETAILS_KEY}
+    assert extract_blocks(html, keys=("ds:4",))["ds:4"] == [["x]})"]]
+
+
+def test_malformed_block_is_skipped():
+    assert extract_blocks("AF_initDataCallback({key: 'ds:5', data:[1, 2,", keys=None) == {}
+
+
+def test_get_path_stops_at_missing_index():
+    assert get_path([[1, [2, 3]]], [0, 1, 1]) == 3
+    assert get_path([[1]], [0, 5]) is None
+    assert get_path([[1]], [0, 0, 0]) is None
+    assert get_path(None, [0]) is None